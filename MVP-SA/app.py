@@ -1,35 +1,190 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
+import io
+import functools
+import multiprocessing
 import uuid
+import time
+import atexit
+import threading
+import re
+import subprocess
+import sys
 from datetime import datetime
 
 # Import your services - UPDATED IMPORT
-from services.file_processor import FileProcessor
+from services.file_processor import FileProcessor, LazyText, UnsupportedFormatError
 from services.question_generator import QuestionGenerator
 from services.eye_tracker import EyeTracker  # Use no-camera version
+from services.tracking_buffer import decode_frame, columns_from_rows
 from services.answer_rater import AnswerRater
+from services.rating_cache import RatingCache
+from services.batch_rescorer import BatchRescorer
+from services.rating_combiner import make_combiner_config
 from services.data_manager import DataManager
+from services.session_writer import SessionWriter
+from services.session_store import InMemorySessionStore, SQLiteSessionStore
+from services.llm_client import LLMClient
+from services.job_queue import JobQueue, QueueFullError
+from services.cache import LRUCache
+from services.batch_screener import BatchScreener
 
 app = Flask(__name__)
 CORS(app)
 
 # Initialize services
-file_processor = FileProcessor()
-question_generator = QuestionGenerator()
-eye_tracker = EyeTracker()  # This won't access camera anymore
-answer_rater = AnswerRater()
-data_manager = DataManager()
+llm_client = LLMClient(
+    pool_maxsize=int(os.environ.get('LLM_POOL_SIZE', 16)),
+    connect_timeout=float(os.environ.get('LLM_CONNECT_TIMEOUT', 5)),
+    read_timeout=float(os.environ.get('LLM_READ_TIMEOUT', 120)),
+    max_concurrent_per_host=int(os.environ.get('LLM_MAX_CONCURRENT_PER_HOST', 16)),
+    # Account limits shared by every caller; 0 disables a limit
+    requests_per_minute=int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 50)),
+    tokens_per_minute=int(os.environ.get('LLM_TOKENS_PER_MINUTE', 0)),
+    batch_reserve=float(os.environ.get('LLM_BATCH_RESERVE', 0.2)),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', 4)),
+    max_wait=float(os.environ.get('LLM_MAX_WAIT', 60))
+)
+data_manager = DataManager(
+    tracking_fsync_interval=float(os.environ.get('TRACKING_FSYNC_INTERVAL', 1)),
+    tracking_fsync_bytes=int(os.environ.get('TRACKING_FSYNC_BYTES', 256 * 1024))
+)
+session_writer = SessionWriter(
+    data_manager,
+    flush_interval=float(os.environ.get('SESSION_FLUSH_INTERVAL', 0.5)),
+    compact_after=int(os.environ.get('SESSION_COMPACT_AFTER', 50))
+)
+atexit.register(session_writer.flush)
+question_cache = LRUCache(
+    max_entries=int(os.environ.get('QUESTION_CACHE_SIZE', 256)),
+    ttl_seconds=float(os.environ.get('QUESTION_CACHE_TTL', 7 * 24 * 3600)),
+    disk_dir=os.path.join(data_manager.base_dir, 'question_cache')
+    if os.environ.get('QUESTION_CACHE_DISK', 'true').lower() == 'true' else None,
+    name="question cache"
+)
+text_cache = LRUCache(
+    max_entries=int(os.environ.get('TEXT_CACHE_ENTRIES', 2048)),
+    max_bytes=int(os.environ.get('TEXT_CACHE_BYTES', 64 * 1024 * 1024)),
+    size_fn=lambda entry: len(entry['text']),
+    disk_dir=os.path.join(data_manager.base_dir, 'text_cache')
+    if os.environ.get('TEXT_CACHE_DISK', 'true').lower() == 'true' else None,
+    compress=True,
+    name="text cache"
+)
+file_processor = FileProcessor(text_cache=text_cache)
+question_generator = QuestionGenerator(llm_client=llm_client, cache=question_cache)
+eye_tracker = EyeTracker(
+    persist_fn=data_manager.save_tracking_data,
+    persist_batch_size=int(os.environ.get('TRACKING_PERSIST_BATCH', 50)),
+    persist_interval=float(os.environ.get('TRACKING_PERSIST_INTERVAL', 5)),
+    idle_timeout=float(os.environ.get('TRACKING_IDLE_TIMEOUT', 30 * 60)),
+    close_fn=data_manager.close_tracking_log
+)  # This won't access camera anymore
+MAX_TRACKING_BATCH = int(os.environ.get('MAX_TRACKING_BATCH', 1000))
+RATING_CACHE_SIZE = int(os.environ.get('RATING_CACHE_SIZE', 2000))
+rating_cache = RatingCache(
+    max_entries=RATING_CACHE_SIZE,
+    similarity_threshold=float(os.environ.get('RATING_CACHE_SIMILARITY', 0.8)),
+    ttl_seconds=int(os.environ.get('RATING_CACHE_TTL', 7 * 24 * 3600))
+) if RATING_CACHE_SIZE > 0 else None
+answer_rater = AnswerRater(
+    llm_client=llm_client,
+    min_words=int(os.environ.get('PRESCORE_MIN_WORDS', 5)),
+    max_repetition=float(os.environ.get('PRESCORE_MAX_REPETITION', 0.3)),
+    rating_cache=rating_cache,
+    # JSON overrides of rating_combiner.DEFAULT_COMBINER_CONFIG
+    combiner_config=json.loads(os.environ['COMBINER_CONFIG']) if os.environ.get('COMBINER_CONFIG') else None
+)
+# Spawned worker processes (PDF extraction) re-import this module; only the server runs startup work
+IS_SERVER_PROCESS = multiprocessing.parent_process() is None
+# Load NLP models before the first rating: 'background' (default), 'sync' or 'off'
+NLP_WARMUP = os.environ.get('NLP_WARMUP', 'background').lower() if IS_SERVER_PROCESS else 'off'
+if NLP_WARMUP == 'sync':
+    answer_rater.warm_up()
+elif NLP_WARMUP == 'background':
+    threading.Thread(target=answer_rater.warm_up, name="nlp-warmup", daemon=True).start()
+batch_screener = BatchScreener(
+    file_processor,
+    question_generator,
+    extract_workers=int(os.environ.get('BATCH_EXTRACT_WORKERS', 4)),
+    generate_workers=int(os.environ.get('BATCH_GENERATE_WORKERS', 4))
+)
+MAX_BATCH_RESUMES = int(os.environ.get('MAX_BATCH_RESUMES', 100))
 
-# Global storage for active sessions
-active_sessions = {}
+# Bounded worker pool for asynchronous answer scoring
+rating_queue = JobQueue(
+    num_workers=int(os.environ.get('RATING_WORKERS', 4)),
+    max_queue_size=int(os.environ.get('RATING_QUEUE_SIZE', 200)),
+    name="rating"
+)
+ASYNC_SCORING = os.environ.get('ASYNC_SCORING', 'false').lower() == 'true'
+# Deferred scoring stores answers unrated and rates them in batches at end-interview
+DEFERRED_SCORING = os.environ.get('DEFERRED_SCORING', 'false').lower() == 'true'
+DEFERRED_BATCH_SIZE = int(os.environ.get('DEFERRED_BATCH_SIZE', 10))
+
+# Session storage: process-local by default, or SQLite shared by every worker process
+if os.environ.get('SESSION_STORE', 'memory').lower() == 'sqlite':
+    active_sessions = SQLiteSessionStore(
+        os.environ.get('SESSION_DB_PATH', os.path.join(data_manager.base_dir, 'sessions.db'))
+    )
+else:
+    active_sessions = InMemorySessionStore(
+        writer=session_writer,
+        loader=session_writer.load,
+        max_sessions=int(os.environ.get('SESSION_CACHE_SIZE', 500)),
+        max_bytes=int(os.environ.get('SESSION_CACHE_BYTES', 256 * 1024 * 1024)),
+        size_fn=lambda session: session_writer.serialized_size(session['session_id']),
+        idle_ttl=float(os.environ.get('SESSION_IDLE_TTL', 60 * 60)),
+        on_evict=lambda session_id, reason: _release_session(session_id, reason)
+    )
+# Lazy full-text handles for uploaded documents, keyed by session
+document_handles = {}
+# Re-scoring without API calls runs as a separate process; this instance only reads its progress
+batch_rescorer = BatchRescorer(
+    data_manager,
+    answer_rater,
+    session_store=active_sessions if isinstance(active_sessions, SQLiteSessionStore) else None
+)
+rescore_processes = {}
+# Runs that re-rate through the API stay in this process so their calls go through
+# llm_client's rate limiter at batch priority, behind live ratings; run_id -> (thread, rescorer)
+rescore_threads = {}
+
+def _release_session(session_id, reason):
+    """Free per-process resources of a session dropped from the session cache"""
+    document_handles.pop(session_id, None)
+    if reason == 'idle':
+        # Idle for the whole TTL means the interview was abandoned
+        eye_tracker.stop_tracking(session_id)
+
+# Resume tracking for interviews that were in flight when the server stopped
+for recovered_session_id in active_sessions.session_ids(status='interview_active') if IS_SERVER_PROCESS else []:
+    eye_tracker.start_tracking(recovered_session_id)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Runtime performance counters"""
+    return jsonify({
+        "llm_client": llm_client.get_stats(),
+        "rating_queue": rating_queue.get_stats(),
+        "answer_rater": answer_rater.get_stats(),
+        "rating_cache": rating_cache.get_stats() if rating_cache else None,
+        "question_cache": question_cache.get_stats(),
+        "file_processor": file_processor.get_stats(),
+        "text_cache": text_cache.get_stats(),
+        "eye_tracker": eye_tracker.get_stats(),
+        "session_writer": session_writer.get_stats(),
+        "session_store": active_sessions.get_stats(),
+        "timestamp": datetime.now().isoformat()
+    })
+
 @app.route('/api/upload-files', methods=['POST'])
 def upload_files():
     """Upload and process resume and job description files"""
@@ -42,19 +197,37 @@ def upload_files():
         
         print(f"Processing files: {resume_file.filename}, {jd_file.filename}")
         
-        # Process files
-        resume_text = file_processor.extract_text_from_pdf(resume_file)
-        jd_text = file_processor.extract_text_from_pdf(jd_file)
+        try:
+            resume_format = file_processor.detect_format(resume_file)
+            jd_format = file_processor.detect_format(jd_file)
+        except UnsupportedFormatError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        session_id = str(uuid.uuid4())
         
-        print(f"Extracted resume text length: {len(resume_text)}")
-        print(f"Extracted JD text length: {len(jd_text)}")
+        # Keep the originals once on disk; only the prompt budget is extracted now
+        resume_path = data_manager.save_upload(session_id, 'resume', resume_file, resume_format)
+        jd_path = data_manager.save_upload(session_id, 'jd', jd_file, jd_format)
+        
+        # Process files concurrently, stopping once the prompt budgets are filled
+        resume_doc, jd_doc = file_processor.extract_concurrently([
+            (file_processor.extract_lazily, resume_path, question_generator.RESUME_CHAR_LIMIT),
+            (file_processor.extract_lazily, jd_path, question_generator.JD_CHAR_LIMIT)
+        ])
+        document_handles[session_id] = {'resume': resume_doc, 'jd': jd_doc}
+        
+        print(f"Extracted resume text length: {len(resume_doc)}")
+        print(f"Extracted JD text length: {len(jd_doc)}")
         
         # Create session
-        session_id = str(uuid.uuid4())
         session_data = {
             "session_id": session_id,
-            "resume_text": resume_text,
-            "jd_text": jd_text,
+            "resume_text": resume_doc.text,
+            "jd_text": jd_doc.text,
+            "documents": {
+                "resume": {"path": resume_path, "complete": resume_doc.complete},
+                "jd": {"path": jd_path, "complete": jd_doc.complete}
+            },
             "created_at": datetime.now().isoformat(),
             "questions": [],
             "answers": [],
@@ -63,12 +236,13 @@ def upload_files():
         }
         
         active_sessions[session_id] = session_data
-        data_manager.save_session(session_data)
         
         return jsonify({
             "session_id": session_id,
-            "resume_length": len(resume_text),
-            "jd_length": len(jd_text),
+            "resume_length": len(resume_doc),
+            "jd_length": len(jd_doc),
+            "resume_truncated": not resume_doc.complete,
+            "jd_truncated": not jd_doc.complete,
             "status": "success"
         })
         
@@ -76,6 +250,41 @@ def upload_files():
         print(f"Error in upload_files: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/session-document/<session_id>/<kind>', methods=['GET'])
+def get_session_document(session_id, kind):
+    """Return the full text of an uploaded document, extracting it on first request"""
+    try:
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
+        if session_id not in active_sessions:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        document = _get_document_handle(active_sessions[session_id], kind)
+        if document is None:
+            return jsonify({"error": "Document not available"}), 404
+        
+        full_text = document.full_text()
+        return jsonify({
+            "session_id": session_id,
+            "kind": kind,
+            "text": full_text,
+            "length": len(full_text)
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _get_document_handle(session, kind):
+    """Get the lazy text handle for a session document, rebuilding it after a restart"""
+    handles = document_handles.setdefault(session['session_id'], {})
+    if kind not in handles:
+        info = session.get('documents', {}).get(kind)
+        if not info or not os.path.exists(info['path']):
+            return None
+        text = session['resume_text'] if kind == 'resume' else session['jd_text']
+        handles[kind] = LazyText(text, info['complete'], functools.partial(file_processor.load_full_text, info['path']))
+    return handles[kind]
+
 @app.route('/api/generate-questions', methods=['POST'])
 def generate_questions():
     """Generate interview questions using Claude API"""
@@ -85,11 +294,24 @@ def generate_questions():
         
         print(f"Generating questions for session: {session_id}")
         
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if not session_id or session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
         session = active_sessions[session_id]
         
+        if data.get('stream'):
+            # Questions are delivered by the stream endpoint; reset here so reconnecting to it keeps them
+            session['questions'] = []
+            session['questions_pending'] = True
+            session['status'] = 'generating_questions'
+            active_sessions[session_id] = session
+            return jsonify({
+                "stream_url": f"/api/generate-questions/{session_id}/stream",
+                "status": "generating_questions"
+            }), 202
+        
         print(f"Resume text length: {len(session['resume_text'])}")
         print(f"JD text length: {len(session['jd_text'])}")
         
@@ -105,7 +327,6 @@ def generate_questions():
         session['questions'] = questions
         session['status'] = 'questions_generated'
         active_sessions[session_id] = session
-        data_manager.save_session(session)
         
         return jsonify({
             "questions": questions,
@@ -117,6 +338,132 @@ def generate_questions():
         print(f"Error in generate_questions: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/generate-questions/<session_id>/stream', methods=['GET'])
+def stream_generate_questions(session_id):
+    """Push a session's questions as server-sent events as soon as each one is parsed
+    
+    Generation is started by POST /api/generate-questions with "stream".
+    Questions already stored are sent first, so a reconnecting client
+    only waits for the ones still being generated.
+    """
+    if not data_manager.is_valid_session_id(session_id):
+        return jsonify({"error": "Session not found"}), 404
+    if session_id not in active_sessions:
+        return jsonify({"error": "Invalid session ID"}), 400
+    
+    session = active_sessions[session_id]
+    delivered = list(session['questions'])
+    
+    def generate():
+        count = 0
+        for question in delivered:
+            yield f"event: question\ndata: {json.dumps({'index': count, 'question': question})}\n\n"
+            count += 1
+        
+        if session.get('questions_pending'):
+            try:
+                for position, question in enumerate(question_generator.generate_questions_stream(
+                        resume_text=session['resume_text'],
+                        jd_text=session['jd_text'])):
+                    if position < len(delivered):
+                        continue  # Sent before the client reconnected
+                    # Store each question right away so the interview can start on the first one
+                    active_sessions.update(session_id, lambda stored: stored['questions'].append(question))
+                    yield f"event: question\ndata: {json.dumps({'index': count, 'question': question})}\n\n"
+                    count += 1
+            except Exception as e:
+                print(f"Error in stream_generate_questions: {str(e)}")
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                return
+            
+            def finish(stored):
+                stored['questions_pending'] = False
+                # The interview may already have started on the first questions
+                if stored['status'] == 'generating_questions':
+                    stored['status'] = 'questions_generated'
+            
+            active_sessions.update(session_id, finish)
+            print(f"Generated {count} questions")
+        
+        yield f"event: done\ndata: {json.dumps({'total_questions': count, 'status': 'success'})}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/batch-generate-questions', methods=['POST'])
+def batch_generate_questions():
+    """Screen many resumes against one job description, streaming results as NDJSON"""
+    try:
+        resume_uploads = request.files.getlist('resumes')
+        if 'job_description' not in request.files or not resume_uploads:
+            return jsonify({"error": "A job description and at least one resume are required"}), 400
+        
+        if len(resume_uploads) > MAX_BATCH_RESUMES:
+            return jsonify({"error": f"At most {MAX_BATCH_RESUMES} resumes per batch"}), 400
+        
+        num_questions = int(request.form.get('num_questions', 10))
+        
+        # Process the JD once for the whole batch
+        try:
+            jd_text = file_processor.extract_text(request.files['job_description'],
+                                                  max_chars=question_generator.JD_CHAR_LIMIT)
+        except UnsupportedFormatError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Buffer uploads so extraction can run after the request body is consumed
+        resume_files = [(f.filename, io.BytesIO(f.read())) for f in resume_uploads]
+        
+        print(f"Batch screening {len(resume_files)} resumes, JD text length: {len(jd_text)}")
+        
+    except Exception as e:
+        print(f"Error in batch_generate_questions: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        started = time.time()
+        succeeded = 0
+        yield json.dumps({"event": "batch_started", "total": len(resume_files), "jd_length": len(jd_text)}) + "\n"
+        
+        for result in batch_screener.screen(jd_text, resume_files, num_questions=num_questions):
+            line = {"event": "result", "index": result['index'], "filename": result['filename']}
+            
+            if result['error']:
+                line.update({"status": "error", "error": result['error']})
+            else:
+                session_id = str(uuid.uuid4())
+                session_data = {
+                    "session_id": session_id,
+                    "resume_text": result['resume_text'],
+                    "jd_text": jd_text,
+                    "created_at": datetime.now().isoformat(),
+                    "questions": result['questions'],
+                    "answers": [],
+                    "tracking_data": [],
+                    "status": "questions_generated"
+                }
+                active_sessions[session_id] = session_data
+                succeeded += 1
+                
+                line.update({
+                    "status": "success",
+                    "session_id": session_id,
+                    "resume_length": len(result['resume_text']),
+                    "questions": result['questions'],
+                    "total_questions": len(result['questions'])
+                })
+            
+            yield json.dumps(line, default=str) + "\n"
+        
+        yield json.dumps({
+            "event": "batch_completed",
+            "succeeded": succeeded,
+            "failed": len(resume_files) - succeeded,
+            "elapsed_ms": round((time.time() - started) * 1000, 1)
+        }) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/start-interview', methods=['POST'])
 def start_interview():
     """Start the interview session"""
@@ -124,6 +471,8 @@ def start_interview():
         data = request.get_json()
         session_id = data.get('session_id')
         
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if not session_id or session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
@@ -135,7 +484,6 @@ def start_interview():
         eye_tracker.start_tracking(session_id)
         
         active_sessions[session_id] = session
-        data_manager.save_session(session)
         
         print(f"✅ Interview started for session: {session_id}")
         
@@ -159,6 +507,8 @@ def submit_answer():
         
         print(f"Submitting answer for session {session_id}, question {question_index}")
         
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if not session_id or session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
@@ -169,41 +519,140 @@ def submit_answer():
         
         question = session['questions'][question_index]
         
-        print(f"Rating answer: {answer_text[:100]}...")
-        
-        # Rate the answer - NO API KEY PARAMETER NEEDED
-        rating = answer_rater.rate_answer(
-            question=question,
-            answer=answer_text
-        )
-        
         # Get tracking data for this question
-        tracking_data = eye_tracker.get_question_tracking_data(session_id, question_index)
-        
-        # Store answer
-        answer_data = {
-            "question_index": question_index,
-            "question": question['question'],
-            "answer": answer_text,
-            "rating": rating,
-            "tracking_data": tracking_data,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        session['answers'].append(answer_data)
-        active_sessions[session_id] = session
-        data_manager.save_session(session)
-        
-        return jsonify({
-            "rating": rating,
-            "tracking_summary": eye_tracker.get_tracking_summary(tracking_data),
-            "status": "success"
-        })
+        tracking_data, tracking_moments = eye_tracker.get_question_tracking(session_id, question_index)
+        
+        if data.get('deferred', DEFERRED_SCORING):
+            # Store the answer unrated; end-interview scores all of them together
+            _store_answer(session_id, question_index, question, answer_text, None,
+                          tracking_data, tracking_moments, rating_status='deferred')
+            return jsonify({
+                "rating": None,
+                "tracking_summary": eye_tracker.summary_from_moments(tracking_moments),
+                "status": "deferred"
+            })
+        
+        if data.get('async', ASYNC_SCORING):
+            # Enqueue the rating and return immediately
+            try:
+                job_id = rating_queue.submit(
+                    _rate_and_store_answer, session, question_index, question, answer_text,
+                    tracking_data, tracking_moments, tag=session_id
+                )
+            except QueueFullError as e:
+                return jsonify({"error": str(e)}), 503
+            
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "queue_depth": rating_queue.get_stats()['queue_depth']
+            }), 202
+        
+        return jsonify(_rate_and_store_answer(session, question_index, question, answer_text,
+                                              tracking_data, tracking_moments))
         
     except Exception as e:
         print(f"Error in submit_answer: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def _rate_and_store_answer(session, question_index, question, answer_text, tracking_data, tracking_moments):
+    """Rate an answer, store it on the session and return the submit-answer payload"""
+    print(f"Rating answer: {answer_text[:100]}...")
+    
+    # Rate the answer - NO API KEY PARAMETER NEEDED
+    rating = answer_rater.rate_answer(
+        question=question,
+        answer=answer_text
+    )
+    
+    _store_answer(session['session_id'], question_index, question, answer_text, rating,
+                  tracking_data, tracking_moments)
+    
+    return {
+        "rating": rating,
+        "tracking_summary": eye_tracker.summary_from_moments(tracking_moments),
+        "status": "success"
+    }
+
+def _store_answer(session_id, question_index, question, answer_text, rating, tracking_data, tracking_moments, **extra):
+    """Append an answer record to a session"""
+    answer_data = {
+        "question_index": question_index,
+        "question": question['question'],
+        "answer": answer_text,
+        "rating": rating,
+        "tracking_data": tracking_data,
+        "tracking_moments": tracking_moments,
+        "timestamp": datetime.now().isoformat()
+    }
+    answer_data.update(extra)
+    
+    active_sessions.update(session_id, lambda stored: stored['answers'].append(answer_data))
+
+def _rate_deferred_answers(session_id, session):
+    """Rate every deferred answer of a session in batched calls and store the ratings"""
+    deferred = [index for index, answer in enumerate(session['answers'])
+                if answer.get('rating_status') == 'deferred']
+    if not deferred:
+        return session
+    
+    items = []
+    for index in deferred:
+        answer = session['answers'][index]
+        items.append((session['questions'][answer['question_index']], answer['answer']))
+    ratings = dict(zip(deferred, answer_rater.rate_answers(items, batch_size=DEFERRED_BATCH_SIZE)))
+    
+    def apply_ratings(stored):
+        # Replace the answer records rather than editing them so the change is persisted
+        stored['answers'] = [
+            dict(answer, rating=ratings[index], rating_status='rated') if index in ratings else answer
+            for index, answer in enumerate(stored['answers'])
+        ]
+    
+    return active_sessions.update(session_id, apply_ratings)
+
+@app.route('/api/rating-result/<job_id>', methods=['GET'])
+def get_rating_result(job_id):
+    """Poll for the result of an asynchronous answer rating"""
+    job = rating_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Invalid job ID"}), 404
+    
+    return jsonify(_rating_job_payload(job))
+
+@app.route('/api/rating-result/<job_id>/stream', methods=['GET'])
+def stream_rating_result(job_id):
+    """Stream the result of an asynchronous answer rating as server-sent events"""
+    if rating_queue.get_job(job_id) is None:
+        return jsonify({"error": "Invalid job ID"}), 404
+    
+    def generate():
+        while True:
+            job = rating_queue.wait_for_job(job_id, timeout=15)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Invalid job ID'})}\n\n"
+                return
+            if job['status'] in ('completed', 'failed'):
+                yield f"event: result\ndata: {json.dumps(_rating_job_payload(job), default=str)}\n\n"
+                return
+            # Heartbeat keeps proxies from closing the idle connection
+            yield f"event: status\ndata: {json.dumps({'job_id': job_id, 'status': job['status']})}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _rating_job_payload(job):
+    """Build the client-facing view of a rating job"""
+    payload = {"job_id": job['job_id'], "status": job['status']}
+    if job['status'] == 'completed':
+        payload.update(job['result'])
+        payload['status'] = 'success'
+    elif job['status'] == 'failed':
+        payload['error'] = job['error']
+    if job['finished_at']:
+        payload['latency_ms'] = round((job['finished_at'] - job['submitted_at']) * 1000, 1)
+    return payload
+
 @app.route('/api/end-interview', methods=['POST'])
 def end_interview():
     """End the interview and generate final results"""
@@ -211,22 +660,28 @@ def end_interview():
         data = request.get_json()
         session_id = data.get('session_id')
         
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if not session_id or session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
-        session = active_sessions[session_id]
-        session['status'] = 'interview_completed'
-        session['interview_ended_at'] = datetime.now().isoformat()
+        # Let queued ratings for this session land before scoring the interview
+        if not rating_queue.wait_for_tag(session_id, timeout=120):
+            print(f"Warning: ratings still pending for session {session_id}")
         
-        # Stop eye tracking simulation
-        eye_tracker.stop_tracking(session_id)
+        _rate_deferred_answers(session_id, active_sessions[session_id])
         
-        # Generate final results
-        results = data_manager.generate_final_results(session)
-        session['final_results'] = results
+        def finish(stored):
+            # Scored inside the update so answers stored by another worker are included
+            stored['status'] = 'interview_completed'
+            stored['interview_ended_at'] = datetime.now().isoformat()
+            stored['final_results'] = data_manager.generate_final_results(stored)
         
-        active_sessions[session_id] = session
-        data_manager.save_session(session)
+        session = active_sessions.update(session_id, finish)
+        results = session['final_results']
+        
+        # Stop eye tracking simulation once the session no longer reads as active
+        eye_tracker.stop_tracking(session_id)
         
         print(f"✅ Interview ended for session: {session_id}")
         
@@ -243,6 +698,8 @@ def end_interview():
 def get_tracking_data(session_id):
     """Get real-time tracking data"""
     try:
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
@@ -256,10 +713,165 @@ def get_tracking_data(session_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/tracking-samples/<session_id>', methods=['POST'])
+def ingest_tracking_samples(session_id):
+    """Accept a batch of client-measured tracking samples
+    
+    The body is either JSON {"samples": [[timestamp, eye_contact,
+    face_visibility, yaw, pitch, blink], ...]} or, with Content-Type
+    application/octet-stream, a binary frame of packed 25-byte records.
+    """
+    try:
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
+        if session_id not in active_sessions:
+            return jsonify({"error": "Invalid session ID"}), 400
+        
+        try:
+            if request.mimetype == 'application/octet-stream':
+                columns = decode_frame(request.get_data())
+            else:
+                data = request.get_json()
+                columns = columns_from_rows(data.get('samples', []))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({"error": f"Malformed tracking samples: {str(e)}"}), 400
+        
+        received = len(columns['timestamp'])
+        if received > MAX_TRACKING_BATCH:
+            return jsonify({"error": f"At most {MAX_TRACKING_BATCH} samples per batch"}), 413
+        
+        # Tracking only (re)starts for interviews in progress, e.g. on another worker or after
+        # an idle stop; late batches for ended interviews must not revive it
+        in_progress = active_sessions[session_id].get('status') == 'interview_active'
+        accepted = eye_tracker.ingest_samples(session_id, columns, start=in_progress)
+        if accepted is None:
+            return jsonify({"error": "Interview is not in progress"}), 409
+        
+        return jsonify({
+            "received": received,
+            "accepted": accepted,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        print(f"Error in ingest_tracking_samples: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/rescore', methods=['POST'])
+def start_rescore():
+    """Start re-scoring archived sessions in the background
+    
+    Body (all optional): {"run_id", "rerate_ai", "status", "limit",
+    "session_ids", "workers", "ai_concurrency", "ai_per_minute"}. Starting
+    a run_id again resumes it from its checkpoint. With "combine_only",
+    only the combiner is re-applied to stored ratings using "config";
+    the run reports score changes and writes copies only if "write" is set.
+    Runs with "rerate_ai" share this server's LLM rate limits; the
+    others make no API calls and run in a separate process.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        run_id = str(data.get('run_id') or datetime.now().strftime("%Y%m%d_%H%M%S"))
+        if not re.match(r'^[A-Za-z0-9_.-]+$', run_id):
+            return jsonify({"error": "run_id may only contain letters, digits, '.', '_' and '-'"}), 400
+        
+        process = rescore_processes.get(run_id)
+        thread, _ = rescore_threads.get(run_id, (None, None))
+        if (process is not None and process.poll() is None) or (thread is not None and thread.is_alive()):
+            return jsonify({"error": f"Rescore run {run_id} is already running"}), 409
+        
+        if data.get('config'):
+            try:
+                make_combiner_config(data['config'])
+            except Exception as e:
+                return jsonify({"error": str(e)}), 400
+        
+        # Archived sessions must include every queued change before they are read
+        session_writer.flush()
+        
+        if data.get('rerate_ai') and not data.get('combine_only'):
+            try:
+                options = {key: cast(data[key]) for key, cast in
+                           (('workers', int), ('ai_concurrency', int), ('ai_per_minute', float))
+                           if data.get(key) is not None}
+                limit = int(data['limit']) if data.get('limit') is not None else None
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid rescore option: {str(e)}"}), 400
+            
+            rater = answer_rater
+            if data.get('config'):
+                rater = AnswerRater(llm_client=llm_client, min_words=answer_rater.min_words,
+                                    max_repetition=answer_rater.max_repetition, combiner_config=data['config'])
+            rescorer = BatchRescorer(data_manager, rater, session_store=batch_rescorer.session_store, **options)
+            thread = threading.Thread(
+                target=_run_rescore, args=(rescorer, run_id),
+                kwargs={'rerate_ai': True, 'session_ids': [str(session_id) for session_id in data['session_ids']]
+                        if data.get('session_ids') else None, 'status': data.get('status'), 'limit': limit},
+                name=f"rescore-{run_id}", daemon=True)
+            rescore_threads[run_id] = (thread, rescorer)
+            rescore_processes.pop(run_id, None)
+            thread.start()
+            print(f"Started rescore run {run_id} in process")
+            return jsonify({"run_id": run_id, "status": "started"}), 202
+        
+        command = [sys.executable, '-m', 'services.batch_rescorer', '--run-id', run_id]
+        if data.get('combine_only'):
+            command.append('--combine-only')
+            if data.get('write'):
+                command.append('--write')
+        if data.get('config'):
+            command += ['--config', json.dumps(data['config'])]
+        for key in ('status', 'limit', 'workers'):
+            if data.get(key) is not None:
+                command += [f"--{key.replace('_', '-')}", str(data[key])]
+        command += [str(session_id) for session_id in data.get('session_ids') or []]
+        
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                          env.get('PYTHONPATH')]))
+        rescore_processes[run_id] = subprocess.Popen(command, cwd=os.getcwd(), env=env)
+        rescore_threads.pop(run_id, None)
+        print(f"Started rescore run {run_id}")
+        
+        return jsonify({"run_id": run_id, "status": "started"}), 202
+        
+    except Exception as e:
+        print(f"Error in start_rescore: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def _run_rescore(rescorer, run_id, **kwargs):
+    """Thread target for an in-process rescore run"""
+    try:
+        rescorer.run(run_id, **kwargs)
+    except Exception as e:
+        print(f"Error in rescore run {run_id}: {str(e)}")
+
+@app.route('/api/rescore/<run_id>', methods=['GET'])
+def get_rescore_progress(run_id):
+    """Report the counters of a re-scoring run"""
+    if not re.match(r'^[A-Za-z0-9_.-]+$', run_id):
+        return jsonify({"error": "Invalid run ID"}), 400
+    
+    process = rescore_processes.get(run_id)
+    thread, rescorer = rescore_threads.get(run_id, (None, batch_rescorer))
+    progress = rescorer.get_progress(run_id)
+    if progress is None and process is None and thread is None:
+        return jsonify({"error": "Unknown rescore run"}), 404
+    
+    progress = progress or {"run_id": run_id, "state": "starting"}
+    if process is not None:
+        exit_code = process.poll()
+        progress['process'] = 'running' if exit_code is None else f"exited with code {exit_code}"
+    elif thread is not None:
+        progress['process'] = 'running' if thread.is_alive() else 'exited'
+    return jsonify(progress)
+
 @app.route('/api/export-results/<session_id>', methods=['GET'])
 def export_results(session_id):
     """Export interview results as JSON file"""
     try:
+        if not data_manager.is_valid_session_id(session_id):
+            return jsonify({"error": "Session not found"}), 404
         if session_id not in active_sessions:
             return jsonify({"error": "Invalid session ID"}), 400
         
@@ -1,36 +1,82 @@
-import requests
 import json
 import re
-from textstat import flesch_reading_ease, flesch_kincaid_grade
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from services.llm_client import get_llm_client
+from services import nlp_resources
+from services.rating_combiner import combine_score, make_combiner_config
 
-try:
-    nltk.download('vader_lexicon', quiet=True)
-    nltk.download('punkt', quiet=True)
-except:
-    pass
+# Whole answers that say nothing beyond declining the question
+NON_ANSWER_PATTERN = re.compile(
+    r"^(?:(?:i|we)\s+(?:really\s+)?(?:do\s*n[o']?t|dont|have\s+no)\s+(?:know|idea|remember|understand)(?:\s+(?:the\s+answer|this|that|it))?"
+    r"|(?:i\s*(?:'m|am)\s+)?not\s+sure|no\s+idea|idk|n/?a|none|nothing|pass|skip|next(?:\s+question)?"
+    r"|no\s+comment|(?:i\s+)?(?:can't|cannot)\s+(?:answer|say)(?:\s+(?:this|that))?)"
+    r"(?:\s*(?:,|\.|!|\?|sorry|really|honestly|to\s+be\s+honest))*$",
+    re.IGNORECASE
+)
+
+# Phrases that raise or lower the confidence score, matched against the lowercased answer
+CONFIDENCE_INDICATORS = (
+    "confident", "certain", "sure", "definitely", "absolutely",
+    "clearly", "obviously", "undoubtedly", "experience shows",
+    "I know", "I'm experienced", "I've successfully"
+)
+
+UNCERTAINTY_INDICATORS = (
+    "maybe", "perhaps", "possibly", "might", "could be",
+    "I think", "I guess", "not sure", "uncertain", "probably"
+)
 
 class AnswerRater:
-    def __init__(self):
-        self.api_base_url = "https://api.anthropic.com/v1/messages"
+    def __init__(self, llm_client=None, min_words=5, max_repetition=0.3, rating_cache=None, combiner_config=None,
+                 rerate_timeout=30.0):
+        self.llm_client = llm_client or get_llm_client()
+        # Overall limit on re-rating the answers a batched response left out
+        self.rerate_timeout = rerate_timeout
+        # Weights _combine_ratings applies; see rating_combiner.DEFAULT_COMBINER_CONFIG
+        self.combiner_config = make_combiner_config(combiner_config)
+        # Optional RatingCache of AI ratings for repeated and near-duplicate answers
+        self.rating_cache = rating_cache
+        # Local pre-scoring: answers below min_words, or whose distinct-word
+        # ratio is under max_repetition, are rated without calling the API
+        self.min_words = min_words
+        self.max_repetition = max_repetition
+        self._stats_lock = threading.Lock()
+        self._stats = {'answers_rated': 0, 'short_circuited': 0, 'reasons': {}}
+        self.api_base_url = self.llm_client.api_base_url
+        self.model = 'claude-3-5-sonnet-20241022'
         # API key is hardcoded here
         self.api_key = "sk-ant-REDACTED"
-        try:
-            self.sentiment_analyzer = SentimentIntensityAnalyzer()
-        except:
-            self.sentiment_analyzer = None
+    
+    @property
+    def sentiment_analyzer(self):
+        """Shared VADER analyzer, loaded on first use"""
+        return nlp_resources.get_sentiment_analyzer()
+    
+    def warm_up(self, download=True):
+        """Load the NLP models up front instead of on the first rating"""
+        nlp_resources.warm_up(download=download)
     
     def rate_answer(self, question, answer):
         """Rate an answer using multiple criteria"""
+        local_rating = self._pre_score(question, answer)
+        if local_rating is not None:
+            return local_rating
+        return self._rate_remote(question, answer)
+    
+    def _rate_remote(self, question, answer):
+        """Rate an answer through the API, falling back to a length-based score"""
         try:
             print(f"Rating answer: {answer[:50]}...")
             
-            ai_rating = self._get_ai_rating(question, answer)
+            ai_rating = self._cached_ai_rating(question, answer)
+            if ai_rating is None:
+                ai_rating = self._get_ai_rating(question, answer)
+                if self.rating_cache is not None:
+                    self.rating_cache.set(question, answer, ai_rating)
             
-
-            linguistic_metrics = self._calculate_linguistic_metrics(answer)
-            sentiment_metrics = self._calculate_sentiment_metrics(answer)
+            linguistic_metrics, sentiment_metrics = self._calculate_metrics(answer)
             
             final_rating = self._combine_ratings(ai_rating, linguistic_metrics, sentiment_metrics)
             
@@ -43,6 +89,232 @@ class AnswerRater:
             # Fallback rating
             return self._get_fallback_rating(question, answer)
     
+    def rate_answers(self, items, batch_size=10):
+        """Rate several (question, answer) pairs with one API call per batch_size answers
+        
+        Returns ratings in the same order and schema as rate_answer. Answers
+        the batched response does not cover are rated individually, in
+        parallel and within rerate_timeout overall. When a batched call
+        fails outright the client has already exhausted its retries, so its
+        answers get the fallback rating instead of one more call each.
+        """
+        ratings = [self._pre_score(question, answer) for question, answer in items]
+        ai_ratings_by_index = {}
+        for i, rating in enumerate(ratings):
+            if rating is None:
+                cached = self._cached_ai_rating(*items[i])
+                if cached is not None:
+                    ai_ratings_by_index[i] = cached
+        remote = [i for i, rating in enumerate(ratings) if rating is None and i not in ai_ratings_by_index]
+        batches = [remote[i:i + batch_size] for i in range(0, len(remote), batch_size)]
+        
+        rerate = []
+        if batches:
+            with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+                ai_batches = list(pool.map(self._request_ai_ratings, [[items[i] for i in batch] for batch in batches]))
+            
+            for batch, ai_ratings in zip(batches, ai_batches):
+                if ai_ratings is None:
+                    for i in batch:
+                        ratings[i] = self._get_fallback_rating(*items[i])
+                    continue
+                for i, ai_rating in zip(batch, ai_ratings):
+                    if ai_rating is None:
+                        rerate.append(i)
+                        continue
+                    if self.rating_cache is not None:
+                        self.rating_cache.set(items[i][0], items[i][1], ai_rating)
+                    ai_ratings_by_index[i] = ai_rating
+        
+        if rerate:
+            pool = ThreadPoolExecutor(max_workers=min(len(rerate), 8))
+            futures = {i: pool.submit(self._rate_remote, *items[i]) for i in rerate}
+            deadline = time.monotonic() + self.rerate_timeout
+            for i, future in futures.items():
+                try:
+                    ratings[i] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeoutError:
+                    print(f"Re-rating answer {i} timed out, using fallback rating")
+                    ratings[i] = self._get_fallback_rating(*items[i])
+            # Calls still running finish in the background; nobody waits on them
+            pool.shutdown(wait=False, cancel_futures=True)
+        
+        for i, ai_rating in ai_ratings_by_index.items():
+            question, answer = items[i]
+            try:
+                linguistic_metrics, sentiment_metrics = self._calculate_metrics(answer)
+                ratings[i] = self._combine_ratings(ai_rating, linguistic_metrics, sentiment_metrics)
+            except Exception as e:
+                print(f"Error combining batched rating: {str(e)}")
+                ratings[i] = self._get_fallback_rating(question, answer)
+        
+        print(f"Rated {len(items)} answers, {len(remote)} in {len(batches)} batched call(s)")
+        return ratings
+    
+    def _cached_ai_rating(self, question, answer):
+        """AI rating of an identical or near-identical earlier answer, or None"""
+        if self.rating_cache is None:
+            return None
+        ai_rating, match = self.rating_cache.get(question, answer)
+        if ai_rating is not None:
+            # Linguistic and sentiment metrics are still computed for this answer
+            ai_rating['cache_match'] = match
+        return ai_rating
+    
+    def _pre_score(self, question, answer):
+        """Rate clearly degenerate answers locally; None means the answer needs the API
+        
+        Only cheap checks run on every answer. Metrics are computed for
+        the few answers that are short-circuited, so the returned rating
+        has the same shape as an API-backed one.
+        """
+        text = (answer or "").strip()
+        words = text.split()
+        
+        reason = None
+        if not words:
+            reason = 'empty'
+        elif NON_ANSWER_PATTERN.match(text):
+            reason = 'non_answer'
+        elif len(words) < self.min_words:
+            reason = 'too_short'
+        elif len(words) >= 10 and len(set(word.lower() for word in words)) / len(words) < self.max_repetition:
+            reason = 'repetitive'
+        elif not re.search(r"[^\W\d_]{2}", text):  # Two letters in a row, in any script
+            reason = 'no_words'
+        
+        with self._stats_lock:
+            self._stats['answers_rated'] += 1
+            if reason is None:
+                return None
+            self._stats['short_circuited'] += 1
+            self._stats['reasons'][reason] = self._stats['reasons'].get(reason, 0) + 1
+        
+        linguistic_metrics, sentiment_metrics = self._calculate_metrics(text, words)
+        if reason in ('empty', 'non_answer', 'no_words'):
+            score, feedback = 1, "No substantive answer was given to this question."
+        elif reason == 'repetitive':
+            score, feedback = 2, "The answer repeats the same few words without addressing the question."
+        else:
+            score, feedback = 2, f"The answer is only {len(words)} word(s) long, too brief to evaluate."
+        
+        rating = self._local_rating(score, feedback, linguistic_metrics, sentiment_metrics)
+        rating['rating_source'] = 'local'
+        rating['local_reason'] = reason
+        return rating
+    
+    def _local_rating(self, score, feedback, linguistic_metrics, sentiment_metrics):
+        """Build a rating in the API schema from a locally determined score"""
+        return {
+            "overall_score": score,
+            "final_score": score,
+            "detailed_scores": {
+                "relevance": score,
+                "technical_accuracy": score,
+                "clarity": score,
+                "completeness": score,
+                "examples": score,
+                "depth": score
+            },
+            "strengths": [],
+            "improvements": ["Answer the question directly", "Include specific examples from your experience"],
+            "feedback": feedback,
+            "confidence": 0.9,
+            "linguistic_metrics": linguistic_metrics,
+            "sentiment_metrics": sentiment_metrics,
+            "adjustments": {"word_count": 0, "readability": 0, "confidence": 0}
+        }
+    
+    def get_stats(self):
+        """Return how many answers were rated locally instead of through the API"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['reasons'] = dict(self._stats['reasons'])
+        stats['short_circuit_fraction'] = round(stats['short_circuited'] / stats['answers_rated'], 3) \
+            if stats['answers_rated'] else 0
+        stats['min_words'] = self.min_words
+        stats['nlp'] = nlp_resources.get_stats()
+        return stats
+    
+    def _get_ai_ratings(self, batch):
+        """Get ratings for a batch of answers from one Claude call; None marks an answer left unrated"""
+        ai_ratings = self._request_ai_ratings(batch)
+        return [None] * len(batch) if ai_ratings is None else ai_ratings
+    
+    def _request_ai_ratings(self, batch):
+        """Like _get_ai_ratings, but None instead of a list when the call itself failed"""
+        sections = []
+        for number, (question, answer) in enumerate(batch, 1):
+            sections.append(f"""
+        ANSWER {number}
+        QUESTION: {question['question']}
+        QUESTION TYPE: {question.get('type', 'general')}
+        EXPECTED POINTS: {', '.join(question.get('expected_points', []))}
+        CANDIDATE ANSWER: {answer}
+        """)
+        
+        prompt = f"""
+        Rate each of the following {len(batch)} interview answers independently on a scale of 1-10 considering multiple criteria:
+        {''.join(sections)}
+        For every answer, evaluate based on:
+        1. RELEVANCE (1-10): How well does the answer address the question?
+        2. TECHNICAL ACCURACY (1-10): Correctness of technical information (if applicable)
+        3. CLARITY (1-10): How clear and well-structured is the communication?
+        4. COMPLETENESS (1-10): Does the answer cover all important aspects?
+        5. EXAMPLES (1-10): Quality and relevance of examples provided
+        6. DEPTH (1-10): Level of insight and understanding demonstrated
+        
+        Also provide for every answer:
+        - Overall score (1-10)
+        - Top 3 strengths
+        - Top 3 areas for improvement
+        - Specific feedback for the candidate
+        
+        Return a JSON array with exactly {len(batch)} objects, one per answer in order:
+        [
+            {{
+                "answer_number": N,
+                "overall_score": X,
+                "detailed_scores": {{
+                    "relevance": X,
+                    "technical_accuracy": X,
+                    "clarity": X,
+                    "completeness": X,
+                    "examples": X,
+                    "depth": X
+                }},
+                "strengths": ["strength1", "strength2", "strength3"],
+                "improvements": ["improvement1", "improvement2", "improvement3"],
+                "feedback": "Detailed feedback paragraph",
+                "confidence": X
+            }}
+        ]
+        """
+        
+        try:
+            response = self._call_claude_api(prompt, max_tokens=min(8000, 1000 * len(batch) + 500))
+            return self._parse_ai_ratings(response, len(batch))
+        except Exception as e:
+            print(f"Batched AI rating failed: {str(e)}")
+            return None
+    
+    def _parse_ai_ratings(self, response, count):
+        """Split a batched rating response back into per-answer ratings"""
+        json_match = re.search(r'\[[\s\S]*\]', response)
+        if not json_match:
+            raise Exception("No JSON array found in batched rating response")
+        
+        ratings = [None] * count
+        parsed = json.loads(json_match.group(0))
+        for position, rating in enumerate(parsed):
+            if not isinstance(rating, dict) or not isinstance(rating.get('overall_score'), (int, float)):
+                continue
+            number = rating.pop('answer_number', position + 1)
+            index = number - 1 if isinstance(number, int) and 1 <= number <= count else position
+            if index < count and ratings[index] is None:
+                ratings[index] = rating
+        return ratings
+    
     def _get_ai_rating(self, question, answer):
         """Get rating from Claude API using self.api_key"""
         prompt = f"""
@@ -93,37 +365,15 @@ class AnswerRater:
             print(f"AI rating API call failed: {str(e)}")
             raise Exception(f"AI rating failed: {str(e)}")
     
-    def _call_claude_api(self, prompt):
-        """Make API call to Claude using self.api_key"""
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': self.api_key,
-            'anthropic-version': '2023-06-01'
-        }
-        
-        payload = {
-            'model': 'claude-3-5-sonnet-20241022',
-            'max_tokens': 2000,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ]
-        }
-        
+    def _call_claude_api(self, prompt, max_tokens=2000):
+        """Make API call to Claude through the shared pooled client"""
         print(f"Making API call for rating...")
-        print(f"Using API key: {self.api_key[:20]}...")
-        
-        response = requests.post(self.api_base_url, headers=headers, json=payload)
-        
-        print(f"Rating API response status: {response.status_code}")  # Debug
-        
-        if response.status_code != 200:
-            print(f"Rating API Error: {response.text}")  # Debug
-            raise Exception(f"API request failed with status {response.status_code}")
         
-        return response.json()['content'][0]['text']
+        try:
+            return self.llm_client.create_message(prompt, api_key=self.api_key, max_tokens=max_tokens, model=self.model)
+        except Exception as e:
+            print(f"Rating API Error: {str(e)}")  # Debug
+            raise
     
     def _parse_ai_rating(self, response):
         """Parse AI rating response"""
@@ -165,7 +415,14 @@ class AnswerRater:
             print(f"Parse error in rating: {str(e)}")  # Debug
             raise Exception(f"Failed to parse AI rating: {str(e)}")
     
-    def _calculate_linguistic_metrics(self, answer):
+    def _calculate_metrics(self, answer, words=None):
+        """Compute linguistic and sentiment metrics, splitting the answer into words once"""
+        if words is None:
+            words = answer.split() if answer else []
+        return (self._calculate_linguistic_metrics(answer, words),
+                self._calculate_sentiment_metrics(answer))
+    
+    def _calculate_linguistic_metrics(self, answer, words=None):
         """Calculate linguistic quality metrics"""
         if not answer or len(answer.strip()) == 0:
             return {
@@ -176,17 +433,26 @@ class AnswerRater:
                 "avg_sentence_length": 0
             }
         
-        word_count = len(answer.split())
-        sentences = answer.split('.')
-        sentence_count = len([s for s in sentences if s.strip()])
+        word_count = len(words if words is not None else answer.split())
+        sentence_count = sum(1 for s in answer.split('.') if s.strip())
         avg_sentence_length = word_count / max(sentence_count, 1)
         
-        try:
-            readability = flesch_reading_ease(answer)
-            grade_level = flesch_kincaid_grade(answer)
-        except:
-            readability = 50  # Average readability
-            grade_level = 10   # High school level
+        readability_metrics = nlp_resources.get_readability()
+        if readability_metrics is None:
+            # cmudict is not available (see nlp_resources); the combiner skips the readability adjustment
+            readability = None
+            grade_level = None
+        else:
+            # textstat memoizes its word, sentence and syllable counts per text,
+            # so the grade level reuses the counts taken for reading ease
+            flesch_reading_ease, flesch_kincaid_grade = readability_metrics
+            try:
+                readability = flesch_reading_ease(answer)
+                grade_level = flesch_kincaid_grade(answer)
+            except Exception as e:
+                print(f"Readability metrics failed: {str(e)}")
+                readability = None
+                grade_level = None
         
         return {
             "word_count": word_count,
@@ -219,20 +485,9 @@ class AnswerRater:
                 sentiment = "neutral"
             
             # Calculate confidence based on sentence structure and word choice
-            confidence_indicators = [
-                "confident", "certain", "sure", "definitely", "absolutely",
-                "clearly", "obviously", "undoubtedly", "experience shows",
-                "I know", "I'm experienced", "I've successfully"
-            ]
-            
-            uncertainty_indicators = [
-                "maybe", "perhaps", "possibly", "might", "could be",
-                "I think", "I guess", "not sure", "uncertain", "probably"
-            ]
-            
             answer_lower = answer.lower()
-            confidence_count = sum(1 for phrase in confidence_indicators if phrase in answer_lower)
-            uncertainty_count = sum(1 for phrase in uncertainty_indicators if phrase in answer_lower)
+            confidence_count = sum(1 for phrase in CONFIDENCE_INDICATORS if phrase in answer_lower)
+            uncertainty_count = sum(1 for phrase in UNCERTAINTY_INDICATORS if phrase in answer_lower)
             
             # Base confidence on sentiment compound score and linguistic indicators
             base_confidence = abs(scores['compound'])
@@ -256,38 +511,14 @@ class AnswerRater:
             }
     
     def _combine_ratings(self, ai_rating, linguistic_metrics, sentiment_metrics):
-        """Combine all ratings into final score"""
-        # Base score from AI
-        base_score = ai_rating['overall_score']
-        
-        # Adjustments based on linguistic metrics
-        word_count = linguistic_metrics['word_count']
-        readability = linguistic_metrics['readability_score']
-        
-        # Word count adjustment (optimal range: 50-200 words)
-        if word_count < 20:
-            word_count_adjustment = -1.0  # Too short
-        elif word_count < 50:
-            word_count_adjustment = -0.5
-        elif 50 <= word_count <= 200:
-            word_count_adjustment = 0.0   # Optimal
-        elif word_count <= 300:
-            word_count_adjustment = -0.2
-        else:
-            word_count_adjustment = -0.5  # Too long
-        
-        # Readability adjustment (target: 30-70 range)
-        if 30 <= readability <= 70:
-            readability_adjustment = 0.2
-        else:
-            readability_adjustment = 0.0
-        
-        # Confidence adjustment
-        confidence_adjustment = (sentiment_metrics['confidence_score'] - 0.5) * 0.5
-        
-        # Calculate final score
-        final_score = base_score + word_count_adjustment + readability_adjustment + confidence_adjustment
-        final_score = max(1, min(10, final_score))
+        """Combine all ratings into final score, weighted by self.combiner_config"""
+        final_score, word_count_adjustment, readability_adjustment, confidence_adjustment = combine_score(
+            self.combiner_config,
+            ai_rating['overall_score'],
+            linguistic_metrics['word_count'],
+            linguistic_metrics['readability_score'],
+            sentiment_metrics['confidence_score']
+        )
         
         # Add linguistic and sentiment data to the rating
         ai_rating['final_score'] = round(final_score, 1)
@@ -305,7 +536,9 @@ class AnswerRater:
         """Provide fallback rating when AI rating fails"""
         print("Using fallback rating")  # Debug
         
-        word_count = len(answer.split()) if answer else 0
+        words = answer.split() if answer else []
+        word_count = len(words)
+        linguistic_metrics, sentiment_metrics = self._calculate_metrics(answer, words)
         
         # Simple scoring based on answer length and basic criteria
         if word_count == 0:
@@ -334,7 +567,8 @@ class AnswerRater:
             "improvements": ["Could add more detail", "Include specific examples"],
             "feedback": f"Answer provided with {word_count} words. Consider expanding with more specific details and examples.",
             "confidence": 0.5,
-            "linguistic_metrics": self._calculate_linguistic_metrics(answer),
-            "sentiment_metrics": self._calculate_sentiment_metrics(answer),
-            "adjustments": {"word_count": 0, "readability": 0, "confidence": 0}
+            "linguistic_metrics": linguistic_metrics,
+            "sentiment_metrics": sentiment_metrics,
+            "adjustments": {"word_count": 0, "readability": 0, "confidence": 0},
+            "rating_source": "fallback"
         }
\ No newline at end of file
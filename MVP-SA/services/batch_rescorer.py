@@ -0,0 +1,487 @@
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from services.llm_client import llm_priority, PRIORITY_BATCH
+from services.rate_limiter import PriorityRateLimiter
+from services.rating_combiner import ratings_to_columns, combine_columns, rating_source
+
+# Fields _combine_ratings adds on top of the AI rating
+COMBINED_FIELDS = ('final_score', 'linguistic_metrics', 'sentiment_metrics', 'adjustments', 'cache_match')
+
+_worker_rater = None
+
+def _init_worker(min_words, max_repetition):
+    """Build one AnswerRater per worker process and load its NLP models"""
+    global _worker_rater
+    from services.answer_rater import AnswerRater
+    _worker_rater = AnswerRater(min_words=min_words, max_repetition=max_repetition)
+    _worker_rater.warm_up(download=False)  # The server fetches missing NLTK data at startup
+
+def _local_metrics(items):
+    """Pre-score and compute metrics for (question, answer) pairs in a worker process"""
+    results = []
+    for question, answer in items:
+        local_rating = _worker_rater._pre_score(question, answer)
+        if local_rating is not None:
+            results.append({'local_rating': local_rating})
+            continue
+        linguistic_metrics, sentiment_metrics = _worker_rater._calculate_metrics(answer)
+        results.append({'linguistic_metrics': linguistic_metrics, 'sentiment_metrics': sentiment_metrics})
+    return results
+
+class BatchRescorer:
+    """Re-score archived sessions after a change to the rating weights or rubric
+    
+    Session files are streamed from the sessions directory with at most
+    max_in_flight loaded at once. Local metrics are recomputed in a
+    process pool. The AI part of each rating is reused as stored unless
+    rerate_ai is set, in which case each session's answers are re-rated in
+    one batched call, with at most ai_concurrency calls in flight and
+    ai_per_minute calls started per minute. Results go to
+    {session_id}.rescored.json next to the original, which is never
+    modified. Finished sessions are appended to a per-run checkpoint, so a
+    run started again with the same run_id resumes where it stopped.
+    
+    With the SQLite session backend there are no session files; pass the
+    store as session_store and sessions are read from it instead.
+    """
+    
+    def __init__(self, data_manager, answer_rater, workers=None, ai_concurrency=2, ai_per_minute=30,
+                 ai_batch_size=10, max_in_flight=None, progress_interval=1.0, session_store=None):
+        self.data_manager = data_manager
+        self.answer_rater = answer_rater
+        self.session_store = session_store
+        self.workers = workers or os.cpu_count() or 1
+        self.ai_concurrency = ai_concurrency
+        self.ai_batch_size = ai_batch_size
+        self.max_in_flight = max_in_flight or self.workers * 4
+        # Per-run cap on top of the LLM client's own limits
+        self.rate_limiter = PriorityRateLimiter(requests_per_minute=ai_per_minute, batch_reserve=0.0)
+        self.progress_interval = progress_interval
+        self.sessions_dir = os.path.join(data_manager.base_dir, 'sessions')
+        self.checkpoint_dir = os.path.join(data_manager.base_dir, 'rescore')
+        self._lock = threading.Lock()
+        self._runs = {}
+        self._progress_saved_at = {}
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+    
+    def iter_session_ids(self, status=None):
+        """Yield ids of archived sessions without listing the whole directory up front"""
+        if self.session_store is not None:
+            yield from self.session_store.session_ids(status=status)
+            return
+        with os.scandir(self.sessions_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith('.json') or name.endswith('.rescored.json'):
+                    continue
+                session_id = name[:-len('.json')]
+                if not self.data_manager.is_valid_session_id(session_id):
+                    continue
+                if status is not None:
+                    session = self._load_session(session_id)
+                    if session is None or session.get('status') != status:
+                        continue
+                yield session_id
+    
+    def _load_session(self, session_id):
+        """Read a session from the store if one was given, else from its file"""
+        if self.session_store is not None:
+            return self.session_store.get(session_id)
+        return self.data_manager.load_session(session_id)
+    
+    def _checkpoint_path(self, run_id):
+        """Path of the file listing the sessions a run has finished"""
+        return os.path.join(self.checkpoint_dir, f"{run_id}.checkpoint")
+    
+    def _load_checkpoint(self, run_id):
+        """Ids of sessions already finished by a run"""
+        filepath = self._checkpoint_path(run_id)
+        if not os.path.exists(filepath):
+            return set()
+        with open(filepath, 'r') as f:
+            return {line.strip() for line in f if line.endswith('\n') and line.strip()}
+    
+    def _rescored_path(self, session_id):
+        """Path of the re-scored copy written next to a session's file"""
+        return os.path.join(self.sessions_dir, f"{session_id}.rescored.json")
+    
+    def _progress_path(self, run_id):
+        """Path of the JSON file a run reports its counters in"""
+        return os.path.join(self.checkpoint_dir, f"{run_id}.progress.json")
+    
+    def get_progress(self, run_id):
+        """Counters for a run, from this process or the run's progress file; None if unknown"""
+        with self._lock:
+            progress = self._runs.get(run_id)
+            if progress is not None:
+                return copy.deepcopy(progress)
+        try:
+            with open(self._progress_path(run_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _update(self, run_id, **increments):
+        """Add to a run's counters and report them at most once per progress_interval"""
+        with self._lock:
+            progress = self._runs[run_id]
+            for key, value in increments.items():
+                progress[key] += value
+        self._save_progress(run_id)
+    
+    def _save_progress(self, run_id, force=False):
+        """Write a run's counters for other processes, such as the API, to read"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._progress_saved_at.get(run_id, 0) < self.progress_interval:
+                return
+            self._progress_saved_at[run_id] = now
+            payload = json.dumps(self._runs[run_id], default=str)
+        filepath = self._progress_path(run_id)
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, filepath)
+        except OSError as e:
+            print(f"Warning: Failed to save rescore progress: {str(e)}")
+    
+    def run(self, run_id, rerate_ai=False, session_ids=None, status=None, limit=None):
+        """Re-score sessions and return the run's counters"""
+        done = self._load_checkpoint(run_id)
+        with self._lock:
+            self._runs[run_id] = {
+                'run_id': run_id,
+                'rerate_ai': rerate_ai,
+                'state': 'running',
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'resumed_from': len(done),
+                'sessions_rescored': 0,
+                'sessions_skipped': 0,
+                'sessions_failed': 0,
+                'answers_rescored': 0,
+                'answers_unchanged': 0,
+                'ai_calls': 0,
+                'score_change_total': 0.0
+            }
+        self._save_progress(run_id, force=True)
+        print(f"Rescore run {run_id} starting; {len(done)} session(s) already done")
+        
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        checkpoint_lock = threading.Lock()
+        context = multiprocessing.get_context('spawn')  # The server process runs threads; never fork it
+        
+        with open(self._checkpoint_path(run_id), 'a') as checkpoint, \
+                ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                    initargs=(self.answer_rater.min_words, self.answer_rater.max_repetition)) as pool, \
+                ThreadPoolExecutor(max_workers=self.ai_concurrency) as finishers:
+            
+            def finish(session, future):
+                try:
+                    self._finish_session(run_id, session, future.result(), rerate_ai)
+                    with checkpoint_lock:
+                        checkpoint.write(session['session_id'] + "\n")
+                        checkpoint.flush()
+                except Exception as e:
+                    print(f"Error rescoring session {session['session_id']}: {str(e)}")
+                    self._update(run_id, sessions_failed=1)
+                finally:
+                    in_flight.release()
+            
+            try:
+                self._submit_sessions(run_id, done, session_ids, status, limit, pool, finishers, finish, in_flight)
+            except Exception as e:
+                print(f"Error in rescore run {run_id}: {str(e)}")
+                with self._lock:
+                    self._runs[run_id]['state'] = 'failed'
+            
+            # Every submitted session holds a slot until it is finished
+            for _ in range(self.max_in_flight):
+                in_flight.acquire()
+            
+            with checkpoint_lock:
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+        
+        with self._lock:
+            progress = self._runs[run_id]
+            if progress['state'] == 'running':
+                progress['state'] = 'finished'
+            progress['finished_at'] = datetime.now().isoformat()
+            rescored = progress['answers_rescored']
+            progress['mean_abs_score_change'] = round(progress['score_change_total'] / rescored, 3) if rescored else 0
+            result = copy.deepcopy(progress)
+        self._save_progress(run_id, force=True)
+        print(f"Rescore run {run_id} {result['state']}: {result['sessions_rescored']} rescored, "
+              f"{result['sessions_failed']} failed, {result['sessions_skipped']} skipped")
+        return result
+    
+    def _submit_sessions(self, run_id, done, session_ids, status, limit, pool, finishers, finish, in_flight):
+        """Load sessions one at a time and hand their answers to the process pool"""
+        submitted = 0
+        for session_id in (session_ids if session_ids is not None else self.iter_session_ids(status)):
+            if session_id in done:
+                self._update(run_id, sessions_skipped=1)
+                continue
+            if limit is not None and submitted >= limit:
+                break
+            
+            in_flight.acquire()
+            try:
+                session = self._load_session(session_id)
+            except Exception as e:
+                print(f"Error loading session {session_id}: {str(e)}")
+                session = None
+            if not session or not session.get('answers'):
+                in_flight.release()
+                self._update(run_id, sessions_skipped=1)
+                continue
+            
+            try:
+                items = [(self._question_for(session, answer), answer.get('answer', ''))
+                         for answer in session['answers']]
+                future = pool.submit(_local_metrics, items)
+                # Callbacks run on the pool's result thread, so hand finishing off to the thread pool
+                future.add_done_callback(
+                    lambda f, session=session: finishers.submit(finish, session, f))
+            except Exception as e:
+                # e.g. BrokenProcessPool once a worker failed to start; no callback will free the slot
+                print(f"Error submitting session {session_id}: {str(e)}")
+                in_flight.release()
+                self._update(run_id, sessions_failed=1)
+                continue
+            submitted += 1
+    
+    def _question_for(self, session, answer):
+        """The question dict an answer was given to"""
+        questions = session.get('questions') or []
+        index = answer.get('question_index')
+        if isinstance(index, int) and 0 <= index < len(questions):
+            return questions[index]
+        return {'question': answer.get('question', '')}
+    
+    def _finish_session(self, run_id, session, local_results, rerate_ai):
+        """Combine local metrics with the AI ratings and write the re-scored copy"""
+        answers = session['answers']
+        ai_ratings = [None] * len(answers)
+        
+        if rerate_ai:
+            remote = [i for i, result in enumerate(local_results) if 'local_rating' not in result]
+            for start in range(0, len(remote), self.ai_batch_size):
+                batch = remote[start:start + self.ai_batch_size]
+                self.rate_limiter.acquire(PRIORITY_BATCH)
+                self._update(run_id, ai_calls=1)
+                with llm_priority(PRIORITY_BATCH):
+                    batch_ratings = self.answer_rater._get_ai_ratings(
+                        [(self._question_for(session, answers[i]), answers[i].get('answer', '')) for i in batch])
+                for i, ai_rating in zip(batch, batch_ratings):
+                    ai_ratings[i] = ai_rating
+        
+        rescored_answers = []
+        rescored = unchanged = 0
+        change_total = 0.0
+        for i, (answer, result) in enumerate(zip(answers, local_results)):
+            old_rating = answer.get('rating')
+            if 'local_rating' in result:
+                rating = result['local_rating']
+            else:
+                ai_rating = ai_ratings[i]
+                if ai_rating is None and old_rating and rating_source(old_rating) == 'ai':
+                    ai_rating = {key: value for key, value in old_rating.items() if key not in COMBINED_FIELDS}
+                if ai_rating is None or 'overall_score' not in ai_rating:
+                    # Only rated locally or by the fallback, and not re-rated now; keep what is stored
+                    rescored_answers.append(answer)
+                    unchanged += 1
+                    continue
+                rating = self.answer_rater._combine_ratings(
+                    ai_rating, result['linguistic_metrics'], result['sentiment_metrics'])
+            
+            if old_rating and 'final_score' in old_rating:
+                change_total += abs(rating['final_score'] - old_rating['final_score'])
+            rescored_answers.append(dict(answer, rating=rating, rating_status='rated'))
+            rescored += 1
+        
+        self._write_rescored(session, rescored_answers, {
+            'run_id': run_id,
+            'mode': 'rerate_ai' if rerate_ai else 'local',
+            'answers_rescored': rescored
+        })
+        self._update(run_id, sessions_rescored=1, answers_rescored=rescored,
+                     answers_unchanged=unchanged, score_change_total=change_total)
+    
+    def _write_rescored(self, session, rescored_answers, details):
+        """Write a session's re-scored copy, with final results regenerated, next to the original"""
+        rescored_session = dict(session, answers=rescored_answers)
+        if session.get('final_results'):
+            rescored_session['final_results'] = self.data_manager.generate_final_results(rescored_session, save=False)
+        rescored_session['rescore'] = dict(details, rescored_at=datetime.now().isoformat())
+        
+        filepath = self._rescored_path(session['session_id'])
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(rescored_session, f, default=str)
+        os.replace(tmp_path, filepath)
+    
+    def recombine(self, run_id, combiner_config, write=False, session_ids=None, status=None, limit=None):
+        """Re-apply a combiner config to the stored ratings of every session in one vectorized pass
+        
+        No API calls are made and no NLP metrics are recomputed: the AI
+        score and metrics each rating already carries are fed through
+        rating_combiner.combine_columns. Only the ratings are kept in
+        memory. Returns a report of how scores would move; with write,
+        sessions are loaded a second time and their re-scored copies
+        written next to the originals.
+        """
+        timings = {}
+        start = time.perf_counter()
+        session_order = []
+        answer_counts = []
+        ratings = []
+        skipped = 0
+        for session_id in (session_ids if session_ids is not None else self.iter_session_ids(status)):
+            if limit is not None and len(session_order) >= limit:
+                break
+            try:
+                session = self._load_session(session_id)
+            except Exception as e:
+                print(f"Error loading session {session_id}: {str(e)}")
+                session = None
+            if not session or not session.get('answers'):
+                skipped += 1
+                continue
+            session_order.append(session_id)
+            answer_counts.append(len(session['answers']))
+            ratings.extend(answer.get('rating') for answer in session['answers'])
+        timings['load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        
+        start = time.perf_counter()
+        columns = ratings_to_columns(ratings)
+        final, word_count_adjustment, readability_adjustment, confidence_adjustment = \
+            combine_columns(combiner_config, columns)
+        # Python's round(), not np.round, so scores match what _combine_ratings stores
+        final_list = final.tolist()
+        new_scores = np.array([round(score, 1) for score in final_list])
+        old_scores = columns['final_score']
+        combinable = columns['combinable']
+        scored = np.array([bool(rating) and 'final_score' in rating for rating in ratings], dtype=np.bool_)
+        changes = np.abs(new_scores - old_scores)[combinable]
+        
+        # Per-session means of the scored answers, as generate_final_results computes them
+        owners = np.repeat(np.arange(len(session_order)), answer_counts)
+        scored_counts = np.bincount(owners, weights=scored, minlength=len(session_order))
+        has_scores = scored_counts > 0
+        old_overall = np.bincount(owners, weights=np.where(scored, old_scores, 0), minlength=len(session_order))
+        new_overall = np.bincount(owners, weights=np.where(scored, new_scores, 0), minlength=len(session_order))
+        old_overall = old_overall[has_scores] / scored_counts[has_scores]
+        new_overall = new_overall[has_scores] / scored_counts[has_scores]
+        timings['combine_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        
+        bins = np.arange(1, 11)  # Integer score buckets [1, 2), ..., [8, 9), [9, 10]
+        report = {
+            'run_id': run_id,
+            'mode': 'combine_only',
+            'state': 'finished',
+            'written': write,
+            'combiner_config': combiner_config,
+            'sessions': len(session_order),
+            'sessions_skipped': skipped,
+            'answers': len(ratings),
+            'answers_recombined': int(combinable.sum()),
+            'answers_changed': int(np.count_nonzero(changes >= 0.05)),
+            'mean_abs_score_change': round(float(changes.mean()), 3) if len(changes) else 0,
+            'max_abs_score_change': round(float(changes.max()), 1) if len(changes) else 0,
+            'mean_score_before': round(float(old_scores[scored].mean()), 3) if scored.any() else 0,
+            'mean_score_after': round(float(new_scores[scored].mean()), 3) if scored.any() else 0,
+            'mean_abs_session_change': round(float(np.abs(new_overall - old_overall).mean()), 3) if len(old_overall) else 0,
+            'score_histogram_before': np.histogram(old_scores[scored], bins=bins)[0].tolist(),
+            'score_histogram_after': np.histogram(new_scores[scored], bins=bins)[0].tolist(),
+            'timings': timings
+        }
+        
+        if write:
+            start = time.perf_counter()
+            adjustments = list(zip(word_count_adjustment.tolist(), readability_adjustment.tolist(),
+                                   confidence_adjustment.tolist()))
+            offset = 0
+            for session_id, count in zip(session_order, answer_counts):
+                session = self._load_session(session_id)
+                rescored_answers = []
+                rescored = 0
+                for i, answer in enumerate(session['answers'][:count]):
+                    index = offset + i
+                    if combinable[index]:
+                        rescored += 1
+                        word_count, readability, confidence = adjustments[index]
+                        rating = dict(answer['rating'], final_score=float(new_scores[index]), adjustments={
+                            'word_count': word_count, 'readability': readability, 'confidence': confidence})
+                        answer = dict(answer, rating=rating)
+                    rescored_answers.append(answer)
+                offset += count
+                self._write_rescored(session, rescored_answers + session['answers'][count:], {
+                    'run_id': run_id,
+                    'mode': 'combine_only',
+                    'answers_rescored': rescored
+                })
+            timings['write_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        
+        with self._lock:
+            self._runs[run_id] = report
+        self._save_progress(run_id, force=True)
+        print(f"Recombined {report['answers_recombined']} answers across {report['sessions']} sessions "
+              f"in {timings['load_ms'] + timings['combine_ms']} ms")
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score archived interview sessions")
+    parser.add_argument('--run-id', default=datetime.now().strftime("%Y%m%d_%H%M%S"),
+                        help="reuse a run id to resume an interrupted run")
+    parser.add_argument('--rerate-ai', action='store_true', help="re-run the AI rating instead of reusing it")
+    parser.add_argument('--combine-only', action='store_true',
+                        help="only re-apply the combiner to stored ratings; reports unless --write is given")
+    parser.add_argument('--write', action='store_true', help="with --combine-only, write the re-scored copies")
+    parser.add_argument('--config', help="combiner settings as JSON, e.g. '{\"readability_bonus\": 0.3}'")
+    parser.add_argument('--status', help="only sessions with this status, e.g. completed")
+    parser.add_argument('--limit', type=int, help="stop after this many sessions")
+    parser.add_argument('--workers', type=int, help="processes computing local metrics")
+    parser.add_argument('--ai-concurrency', type=int, default=2)
+    parser.add_argument('--ai-per-minute', type=float, default=30)
+    parser.add_argument('session_ids', nargs='*', help="specific sessions; all of them by default")
+    args = parser.parse_args()
+    
+    from services.data_manager import DataManager
+    from services.answer_rater import AnswerRater
+    from services.llm_client import LLMClient
+    from services.session_store import SQLiteSessionStore
+    data_manager = DataManager()
+    session_store = None
+    # Same settings as app.py, whose environment the API-started runs inherit
+    if os.environ.get('SESSION_STORE', 'memory').lower() == 'sqlite':
+        session_store = SQLiteSessionStore(
+            os.environ.get('SESSION_DB_PATH', os.path.join(data_manager.base_dir, 'sessions.db')))
+    # The API runs --rerate-ai in the server process behind its limiter; a run started
+    # by hand at least keeps to the same account limits
+    llm_client = LLMClient(requests_per_minute=int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 50)),
+                           tokens_per_minute=int(os.environ.get('LLM_TOKENS_PER_MINUTE', 0)))
+    answer_rater = AnswerRater(llm_client=llm_client, combiner_config=json.loads(args.config) if args.config else None)
+    rescorer = BatchRescorer(data_manager, answer_rater, workers=args.workers,
+                             ai_concurrency=args.ai_concurrency, ai_per_minute=args.ai_per_minute,
+                             session_store=session_store)
+    if args.combine_only:
+        result = rescorer.recombine(args.run_id, answer_rater.combiner_config, write=args.write,
+                                    session_ids=args.session_ids or None, status=args.status, limit=args.limit)
+    else:
+        result = rescorer.run(args.run_id, rerate_ai=args.rerate_ai, session_ids=args.session_ids or None,
+                              status=args.status, limit=args.limit)
+    print(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
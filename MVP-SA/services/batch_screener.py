@@ -0,0 +1,63 @@
+import functools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from services.llm_client import llm_priority, PRIORITY_BATCH
+
+class BatchScreener:
+    """Generate question sets for many resumes against a single job description"""
+    
+    def __init__(self, file_processor, question_generator, extract_workers=4, generate_workers=4):
+        self.file_processor = file_processor
+        self.question_generator = question_generator
+        self.extract_workers = extract_workers
+        self.generate_workers = generate_workers
+    
+    def screen(self, jd_text, resume_files, num_questions=10):
+        """Yield one result per resume, in completion order
+        
+        resume_files is a list of (filename, file_like) pairs. Extraction
+        runs on one pool and hands each resume to a bounded generation
+        pool as soon as its text is ready.
+        """
+        finished = queue.Queue()
+        
+        def generate(index, filename, resume_text):
+            try:
+                # Bulk screening yields to live interviews for API capacity
+                with llm_priority(PRIORITY_BATCH):
+                    questions = self.question_generator.generate_questions(
+                        resume_text=resume_text,
+                        jd_text=jd_text,
+                        num_questions=num_questions
+                    )
+                finished.put({
+                    "index": index,
+                    "filename": filename,
+                    "resume_text": resume_text,
+                    "questions": questions,
+                    "error": None
+                })
+            except Exception as e:
+                finished.put({"index": index, "filename": filename, "error": str(e)})
+        
+        def extracted(index, filename, future):
+            try:
+                resume_text = future.result()
+            except Exception as e:
+                finished.put({"index": index, "filename": filename, "error": str(e)})
+                return
+            try:
+                generate_pool.submit(generate, index, filename, resume_text)
+            except RuntimeError as e:
+                # Pool already shut down because the consumer went away
+                finished.put({"index": index, "filename": filename, "error": str(e)})
+        
+        with ThreadPoolExecutor(max_workers=self.extract_workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=self.generate_workers) as generate_pool:
+            for index, (filename, resume_file) in enumerate(resume_files):
+                future = extract_pool.submit(self.file_processor.extract_text, resume_file,
+                                             self.question_generator.RESUME_CHAR_LIMIT)
+                future.add_done_callback(functools.partial(extracted, index, filename))
+            
+            for _ in range(len(resume_files)):
+                yield finished.get()
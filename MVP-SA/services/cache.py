@@ -0,0 +1,262 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+def make_cache_key(*parts):
+    """Build a content-addressed cache key from the given parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+def make_file_digest(file, chunk_size=1024 * 1024):
+    """SHA-256 of a file object's contents, leaving the read position at the start"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with TTL and an optional on-disk JSON tier
+    
+    The memory tier is bounded by entry count and, when size_fn is given,
+    by the total size it reports. The disk tier is bounded the same way,
+    by max_disk_entries and by max_disk_bytes of file size, which default
+    to the memory limits. Its least recently used files are removed, and
+    the directory is swept for expired and stale files on startup.
+    compress stores the disk tier as gzip.
+    """
+    
+    def __init__(self, max_entries=256, ttl_seconds=None, disk_dir=None, name="cache",
+                 max_bytes=None, size_fn=None, compress=False, max_disk_entries=None, max_disk_bytes=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self.compress = compress
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None else max_entries
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_index = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'disk_evictions': 0,
+            'expirations': 0,
+            'writes': 0
+        }
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._sweep_disk()
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry['stored_at'], now):
+                    self._remove_from_memory(key)
+                    self._stats['expirations'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    if key in self._disk_index:
+                        self._disk_index.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return copy.deepcopy(entry['value'])
+        
+        entry = self._read_disk(key)
+        if entry is not None:
+            if self._is_expired(entry['stored_at'], now):
+                self._delete_disk(key)
+                with self._lock:
+                    self._stats['expirations'] += 1
+            else:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                    if key in self._disk_index:
+                        self._disk_index.move_to_end(key)
+                    self._store_in_memory(key, entry['value'], entry['stored_at'])
+                return copy.deepcopy(entry['value'])
+        
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+    
+    def set(self, key, value):
+        """Store a value in memory and, if enabled, on disk"""
+        stored_at = time.time()
+        with self._lock:
+            self._store_in_memory(key, copy.deepcopy(value), stored_at)
+            self._stats['writes'] += 1
+        self._write_disk(key, value, stored_at)
+    
+    def _store_in_memory(self, key, value, stored_at):
+        """Insert an entry and evict the least recently used ones beyond capacity"""
+        if key in self._entries:
+            self._remove_from_memory(key)
+        size = self.size_fn(value) if self.size_fn else 0
+        self._entries[key] = {'value': value, 'stored_at': stored_at, 'size': size}
+        self._bytes += size
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            oldest_key = next(iter(self._entries))
+            self._remove_from_memory(oldest_key)
+            self._stats['evictions'] += 1
+    
+    def _remove_from_memory(self, key):
+        """Drop an entry from the memory tier and release its size"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+    
+    def _is_expired(self, stored_at, now):
+        """Check an entry's age against the TTL"""
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+    
+    def _disk_suffix(self):
+        return ".json.gz" if self.compress else ".json"
+    
+    def _disk_path(self, key):
+        """Path of the on-disk entry for a key"""
+        return os.path.join(self.disk_dir, f"{key}{self._disk_suffix()}")
+    
+    def _sweep_disk(self):
+        """Index the disk tier oldest first, dropping expired entries and leftover temp files"""
+        now = time.time()
+        suffix = self._disk_suffix()
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                    if entry.name.endswith('.tmp'):
+                        # A writer that died mid-write; live ones finish within seconds
+                        if now - stat.st_mtime > 3600:
+                            os.remove(entry.path)
+                        continue
+                    if not entry.name.endswith(suffix):
+                        continue
+                    if self._is_expired(stat.st_mtime, now):
+                        os.remove(entry.path)
+                        self._stats['expirations'] += 1
+                        continue
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, entry.name[:-len(suffix)], stat.st_size))
+        
+        with self._lock:
+            for _, key, size in sorted(files):
+                self._disk_index[key] = size
+                self._disk_bytes += size
+            evicted = self._evict_disk()
+        self._remove_disk_files(evicted)
+    
+    def _evict_disk(self):
+        """Unindex least recently used disk entries beyond the limits; returns their keys"""
+        evicted = []
+        while len(self._disk_index) > 1 and (
+                len(self._disk_index) > self.max_disk_entries or
+                (self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes)):
+            key, size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= size
+            self._stats['disk_evictions'] += 1
+            evicted.append(key)
+        return evicted
+    
+    def _remove_disk_files(self, keys):
+        """Delete the files of evicted disk entries"""
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+    
+    def _open_disk(self, filepath, mode):
+        """Open a disk-tier file, transparently gzipped when compression is on"""
+        if self.compress:
+            return gzip.open(filepath, mode + 't', encoding='utf-8', compresslevel=6)
+        return open(filepath, mode)
+    
+    def _read_disk(self, key):
+        """Load an entry from the disk tier"""
+        if not self.disk_dir:
+            return None
+        filepath = self._disk_path(key)
+        try:
+            if os.path.exists(filepath):
+                with self._open_disk(filepath, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Warning: Failed to read {self.name} entry: {str(e)}")
+        return None
+    
+    def _write_disk(self, key, value, stored_at):
+        """Persist an entry to the disk tier atomically"""
+        if not self.disk_dir:
+            return
+        filepath = self._disk_path(key)
+        tmp_path = None
+        try:
+            # A unique temp name per write, so concurrent writers of one key never share a file
+            with tempfile.NamedTemporaryFile(dir=self.disk_dir, suffix='.tmp', delete=False) as tmp:
+                tmp_path = tmp.name
+            with self._open_disk(tmp_path, 'w') as f:
+                json.dump({'stored_at': stored_at, 'value': value}, f, default=str)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, filepath)
+        except Exception as e:
+            print(f"Warning: Failed to write {self.name} entry: {str(e)}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        
+        with self._lock:
+            self._disk_bytes += size - self._disk_index.pop(key, 0)
+            self._disk_index[key] = size
+            evicted = self._evict_disk()
+        self._remove_disk_files(evicted)
+    
+    def _delete_disk(self, key):
+        """Remove an expired entry from the disk tier"""
+        with self._lock:
+            self._disk_bytes -= self._disk_index.pop(key, 0)
+        self._remove_disk_files([key])
+    
+    def get_stats(self):
+        """Return hit/miss statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['memory_bytes'] = self._bytes
+            stats['disk_entries'] = len(self._disk_index)
+            stats['disk_bytes'] = self._disk_bytes
+        
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = round(hits / lookups, 3) if lookups else 0
+        stats['max_entries'] = self.max_entries
+        stats['max_bytes'] = self.max_bytes
+        stats['max_disk_entries'] = self.max_disk_entries
+        stats['max_disk_bytes'] = self.max_disk_bytes
+        stats['ttl_seconds'] = self.ttl_seconds
+        stats['disk_enabled'] = bool(self.disk_dir)
+        return stats
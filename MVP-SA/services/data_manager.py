@@ -1,12 +1,25 @@
 import os
 import json
+import mmap
+import re
+import threading
+import time
 from datetime import datetime
 import shutil
+from services.tracking_stats import columns_from_records, compute_moments, merge_moments, summarize_moments
+
+# Session ids are the str(uuid.uuid4()) values app.py issues
+SESSION_ID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, tracking_fsync_interval=1.0, tracking_fsync_bytes=256 * 1024):
         self.base_dir = "interview_data"
         self.exports_dir = "exports"
+        # Tracking log appends are fsynced at most once per interval or byte threshold
+        self.tracking_fsync_interval = tracking_fsync_interval
+        self.tracking_fsync_bytes = tracking_fsync_bytes
+        self._tracking_sync_state = {}
+        self._tracking_lock = threading.Lock()
         self._ensure_directories()
     
     def _ensure_directories(self):
@@ -15,55 +28,197 @@ class DataManager:
         os.makedirs(self.exports_dir, exist_ok=True)
         
         # Create subdirectories
-        subdirs = ['sessions', 'tracking_data', 'audio_recordings', 'results']
+        subdirs = ['sessions', 'tracking_data', 'audio_recordings', 'results', 'uploads']
         for subdir in subdirs:
             os.makedirs(os.path.join(self.base_dir, subdir), exist_ok=True)
     
+    def is_valid_session_id(self, session_id):
+        """Whether an id has the format the app issues, so it is safe to use in file names"""
+        return isinstance(session_id, str) and SESSION_ID_PATTERN.fullmatch(session_id) is not None
+    
+    def _session_path(self, session_id):
+        """Path of a session's snapshot file"""
+        if not self.is_valid_session_id(session_id):
+            raise Exception(f"Invalid session ID: {session_id!r}")
+        return os.path.join(self.base_dir, 'sessions', f"{session_id}.json")
+    
+    def _session_journal_path(self, session_id):
+        """Path of the change journal applied on top of a session's snapshot"""
+        if not self.is_valid_session_id(session_id):
+            raise Exception(f"Invalid session ID: {session_id!r}")
+        return os.path.join(self.base_dir, 'sessions', f"{session_id}.journal")
+    
     def save_session(self, session_data):
         """Save session data to file"""
-        session_id = session_data['session_id']
-        filename = f"{session_id}.json"
-        filepath = os.path.join(self.base_dir, 'sessions', filename)
+        try:
+            payload = json.dumps(session_data, default=str).encode('utf-8')
+        except Exception as e:
+            raise Exception(f"Failed to save session: {str(e)}")
+        self.write_session_snapshot(session_data['session_id'], payload)
+    
+    def write_session_snapshot(self, session_id, payload):
+        """Atomically replace a session's snapshot and drop the journal it supersedes"""
+        filepath = self._session_path(session_id)
+        tmp_path = f"{filepath}.tmp"
         
         try:
-            with open(filepath, 'w') as f:
-                json.dump(session_data, f, indent=2, default=str)
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+            
+            # A crash before this point leaves journal records the snapshot's
+            # _journal_seq already covers; load_session skips them
+            journal_path = self._session_journal_path(session_id)
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
         except Exception as e:
             raise Exception(f"Failed to save session: {str(e)}")
     
+    def append_session_journal(self, session_id, payload):
+        """Durably append change records to a session's journal"""
+        try:
+            with open(self._session_journal_path(session_id), 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            raise Exception(f"Failed to append session journal: {str(e)}")
+    
     def load_session(self, session_id):
-        """Load session data from file"""
-        filename = f"{session_id}.json"
-        filepath = os.path.join(self.base_dir, 'sessions', filename)
+        """Load session data from file, replaying journaled changes on top of the snapshot"""
+        if not self.is_valid_session_id(session_id):
+            return None
+        filepath = self._session_path(session_id)
         
         try:
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            else:
+            if not os.path.exists(filepath):
                 return None
+            with open(filepath, 'r') as f:
+                session_data = json.load(f)
+            
+            snapshot_seq = session_data.pop('_journal_seq', 0)
+            journal_path = self._session_journal_path(session_id)
+            if os.path.exists(journal_path):
+                with open(journal_path, 'rb') as f:
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # Torn by a crash mid-append
+                        record = json.loads(line)
+                        if record['seq'] <= snapshot_seq:
+                            continue
+                        session_data.update(record['set'])
+                        for key in record['unset']:
+                            session_data.pop(key, None)
+                        session_data.setdefault('answers', []).extend(record['answers'])
+            return session_data
         except Exception as e:
             raise Exception(f"Failed to load session: {str(e)}")
     
+    def _tracking_log_path(self, session_id):
+        """Path of a session's append-only tracking log"""
+        return os.path.join(self.base_dir, 'tracking_data', f"{session_id}_tracking.ndjson")
+    
     def save_tracking_data(self, session_id, tracking_data):
-        """Save tracking data separately for large datasets"""
-        filename = f"{session_id}_tracking.json"
-        filepath = os.path.join(self.base_dir, 'tracking_data', filename)
+        """Append tracking samples to the session's newline-delimited JSON log
+        
+        Each call costs O(len(tracking_data)) however long the log already
+        is. Writes always reach the OS; fsync is batched per session.
+        """
+        if not tracking_data:
+            return
+        payload = "".join(json.dumps(sample, separators=(',', ':'), default=str) + "\n"
+                          for sample in tracking_data).encode('utf-8')
         
         try:
-            # Append to existing file or create new
-            existing_data = []
-            if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    existing_data = json.load(f)
-            
-            existing_data.extend(tracking_data)
-            
-            with open(filepath, 'w') as f:
-                json.dump(existing_data, f, default=str)
+            with self._tracking_lock:
+                filepath = self._tracking_log_path(session_id)
+                state = self._tracking_sync_state.get(session_id)
+                if state is None:
+                    state = {'unsynced_bytes': 0, 'last_sync': time.monotonic()}
+                    self._tracking_sync_state[session_id] = state
+                    if self._has_torn_tail(filepath):
+                        # Terminate a line cut short by a crash so new samples parse
+                        payload = b"\n" + payload
+                with open(filepath, 'ab') as f:
+                    f.write(payload)
+                    f.flush()
+                    state['unsynced_bytes'] += len(payload)
+                    if (state['unsynced_bytes'] >= self.tracking_fsync_bytes or
+                            time.monotonic() - state['last_sync'] >= self.tracking_fsync_interval):
+                        os.fsync(f.fileno())
+                        state['unsynced_bytes'] = 0
+                        state['last_sync'] = time.monotonic()
         except Exception as e:
             raise Exception(f"Failed to save tracking data: {str(e)}")
     
+    def _has_torn_tail(self, filepath):
+        """Check whether a log's last line is missing its newline"""
+        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            return False
+        with open(filepath, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    
+    def close_tracking_log(self, session_id):
+        """Fsync any tracking samples still only in the page cache"""
+        with self._tracking_lock:
+            state = self._tracking_sync_state.pop(session_id, None)
+            filepath = self._tracking_log_path(session_id)
+            if state is None or not state['unsynced_bytes'] or not os.path.exists(filepath):
+                return
+            try:
+                with open(filepath, 'ab') as f:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                raise Exception(f"Failed to sync tracking data: {str(e)}")
+    
+    def iter_tracking_data(self, session_id):
+        """Stream a session's tracking samples back one at a time via mmap
+        
+        Samples in a legacy {session}_tracking.json array come first. Lines
+        torn by a crash mid-append are skipped.
+        """
+        legacy_path = os.path.join(self.base_dir, 'tracking_data', f"{session_id}_tracking.json")
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r') as f:
+                yield from json.load(f)
+        
+        filepath = self._tracking_log_path(session_id)
+        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
+            return
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            for line in iter(log.readline, b''):
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    sample = json.loads(line)
+                except ValueError:
+                    print(f"Warning: Skipping corrupt tracking sample for session {session_id}")
+                    continue
+                yield sample
+    
+    def load_tracking_data(self, session_id):
+        """Load all tracking samples saved for a session"""
+        try:
+            return list(self.iter_tracking_data(session_id))
+        except Exception as e:
+            raise Exception(f"Failed to load tracking data: {str(e)}")
+    
+    def save_upload(self, session_id, kind, file, extension='pdf'):
+        """Store an uploaded document once so its full text can be extracted on demand"""
+        filename = f"{session_id}_{kind}.{extension}"
+        filepath = os.path.join(self.base_dir, 'uploads', filename)
+        
+        try:
+            file.seek(0)
+            with open(filepath, 'wb') as f:
+                shutil.copyfileobj(file, f, length=1024 * 1024)
+            return filepath
+        except Exception as e:
+            raise Exception(f"Failed to save upload: {str(e)}")
+    
     def save_audio_recording(self, session_id, question_index, audio_data):
         """Save audio recording"""
         filename = f"{session_id}_q{question_index}.wav"
@@ -76,8 +231,8 @@ class DataManager:
         except Exception as e:
             raise Exception(f"Failed to save audio: {str(e)}")
     
-    def generate_final_results(self, session_data):
-        """Generate comprehensive final results"""
+    def generate_final_results(self, session_data, save=True):
+        """Generate comprehensive final results, saving them under results/ unless save is False"""
         answers = session_data.get('answers', [])
         
         if not answers:
@@ -160,18 +315,24 @@ class DataManager:
         }
         
         # Save detailed results
-        self._save_detailed_results(session_data['session_id'], results)
+        if save:
+            self._save_detailed_results(session_data['session_id'], results)
         
         return results
     
     def _analyze_tracking_data(self, answers):
         """Analyze tracking data across all answers"""
-        all_tracking_data = []
+        # Answers rated live carry their moments; older ones are reduced from samples
+        answer_moments = []
         for answer in answers:
-            if 'tracking_data' in answer:
-                all_tracking_data.extend(answer['tracking_data'])
+            if answer.get('tracking_moments'):
+                answer_moments.append(answer['tracking_moments'])
+            elif answer.get('tracking_data'):
+                answer_moments.append(compute_moments(columns_from_records(answer['tracking_data'])))
         
-        if not all_tracking_data:
+        stats = summarize_moments(merge_moments(answer_moments))
+        
+        if stats['count'] == 0:
             return {
                 "avg_eye_contact": 0,
                 "avg_face_visibility": 0,
@@ -179,33 +340,20 @@ class DataManager:
                 "head_movement_stability": "unknown"
             }
         
-        # Calculate averages
-        eye_contact_scores = [d.get('eye_contact_score', 0) for d in all_tracking_data]
-        face_visibility_scores = [d.get('face_visibility', 0) for d in all_tracking_data]
-        blinks = [d.get('blink_detected', False) for d in all_tracking_data]
-        
         return {
-            "avg_eye_contact": round(sum(eye_contact_scores) / len(eye_contact_scores), 1),
-            "avg_face_visibility": round(sum(face_visibility_scores) / len(face_visibility_scores), 1),
-            "total_blinks": sum(blinks),
-            "blink_rate_per_minute": round(sum(blinks) / (len(all_tracking_data) / 600), 1),  # Assuming 10 FPS
-            "head_movement_stability": self._analyze_head_movement(all_tracking_data)
+            "avg_eye_contact": round(stats['eye_contact_mean'], 1),
+            "avg_face_visibility": round(stats['face_visibility_mean'], 1),
+            "total_blinks": stats['blinks'],
+            "blink_rate_per_minute": round(stats['blinks'] / (stats['count'] / 600), 1),  # Assuming 10 FPS
+            "head_movement_stability": self._analyze_head_movement(stats)
         }
     
-    def _analyze_head_movement(self, tracking_data):
+    def _analyze_head_movement(self, stats):
         """Analyze head movement stability"""
-        head_poses = [d.get('head_pose', {}) for d in tracking_data if 'head_pose' in d]
-        if not head_poses:
+        if not stats['head_pose_count']:
             return "unknown"
         
-        yaw_values = [p.get('yaw', 0) for p in head_poses]
-        pitch_values = [p.get('pitch', 0) for p in head_poses]
-        
-        import numpy as np
-        yaw_std = np.std(yaw_values)
-        pitch_std = np.std(pitch_values)
-        
-        avg_movement = (yaw_std + pitch_std) / 2
+        avg_movement = (stats['yaw_std'] + stats['pitch_std']) / 2
         
         if avg_movement < 5:
             return "very_stable"
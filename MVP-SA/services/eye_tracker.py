@@ -1,69 +1,253 @@
 # services/eye_tracker_no_camera.py - Modified Eye Tracker (No Camera Access)
 import threading
 import time
-from collections import deque
 import math
 import random
+import numpy as np
+from services.tracking_buffer import TrackingRingBuffer
+from services.tracking_stats import columns_from_records, compute_moments, summarize_moments
 
 class EyeTracker:
     """Eye tracker that simulates data without accessing camera directly"""
     
-    def __init__(self):
+    def __init__(self, tick_interval=1.0, persist_fn=None, persist_batch_size=50, persist_interval=5.0,
+                 idle_timeout=None, close_fn=None):
         # Active tracking sessions
         self.tracking_sessions = {}
-        self.tracking_threads = {}
+        self.tick_interval = tick_interval
+        # Sessions nobody has read from or pushed to for this long are stopped
+        self.idle_timeout = idle_timeout
         
-    def start_tracking(self, session_id):
-        """Start eye tracking simulation for a session"""
-        if session_id in self.tracking_sessions:
-            return  # Already tracking
-        
-        print(f"🎯 Starting tracking simulation for session: {session_id}")
+        # Client-pushed samples are handed to persist_fn(session_id, records) in batches
+        self.persist_fn = persist_fn
+        self.persist_batch_size = persist_batch_size
+        self.persist_interval = persist_interval
+        # close_fn(session_id) releases persistence state once a session stops, however it stops
+        self.close_fn = close_fn
         
-        self.tracking_sessions[session_id] = {
-            'active': True,
-            'data': deque(maxlen=1000),  # Keep last 1000 data points
-            'current_question': 0,
-            'question_data': {}
+        # One scheduler thread ticks every session; the lock guards the session table
+        self._lock = threading.RLock()
+        self._scheduler_thread = None
+        self._stats = {
+            'samples_ingested': 0,
+            'samples_dropped': 0,
+            'samples_persisted': 0,
+            'persist_batches': 0,
+            'persist_failures': 0,
+            'idle_stops': 0
         }
         
-        # Start tracking simulation thread
-        thread = threading.Thread(target=self._tracking_simulation_loop, args=(session_id,))
-        thread.daemon = True
-        thread.start()
-        self.tracking_threads[session_id] = thread
+    def start_tracking(self, session_id):
+        """Start eye tracking simulation for a session"""
+        with self._lock:
+            if session_id in self.tracking_sessions:
+                return  # Already tracking
+            
+            print(f"🎯 Starting tracking simulation for session: {session_id}")
+            
+            self.tracking_sessions[session_id] = {
+                'active': True,
+                'source': 'simulated',
+                'data': TrackingRingBuffer(capacity=1000),  # Keep last 1000 data points
+                'pending': [],  # Client samples not yet persisted
+                'pending_count': 0,
+                'last_persist': time.monotonic(),
+                'last_seen': time.monotonic(),
+                'current_question': 0,
+                'question_data': {},
+                'base_eye_contact': 75,  # Base eye contact percentage
+                'base_face_visibility': 85  # Base face visibility
+            }
+            
+            self._ensure_scheduler()
     
     def stop_tracking(self, session_id):
         """Stop eye tracking for a session"""
-        if session_id in self.tracking_sessions:
-            self.tracking_sessions[session_id]['active'] = False
-            del self.tracking_sessions[session_id]
-            print(f"🛑 Stopped tracking for session: {session_id}")
+        with self._lock:
+            session = self.tracking_sessions.pop(session_id, None)
+            batch = self._take_pending(session) if session is not None else None
         
-        if session_id in self.tracking_threads:
-            del self.tracking_threads[session_id]
+        if session is not None:
+            session['active'] = False
+            if batch:
+                self._persist_batch(session_id, batch)
+            if self.close_fn is not None:
+                try:
+                    self.close_fn(session_id)
+                except Exception as e:
+                    print(f"Error closing tracking data for {session_id}: {str(e)}")
+            print(f"🛑 Stopped tracking for session: {session_id}")
     
-    def _tracking_simulation_loop(self, session_id):
-        """Simulate tracking data without camera access"""
-        base_eye_contact = 75  # Base eye contact percentage
-        base_face_visibility = 85  # Base face visibility
+    def ingest_samples(self, session_id, columns, start=False):
+        """Append a batch of client-measured samples and queue them for persistence
+        
+        columns holds one array per TRACKING_COLUMNS name. The first client
+        batch replaces the simulation for the session. Client clocks are not
+        trusted: the first batch fixes an offset that puts its newest sample
+        at receive time, and later batches reuse it. Samples older than the
+        buffer's newest one are dropped so timestamps stay sorted for
+        window(). Returns the number accepted, or None when the session is
+        not being tracked and start is False.
+        """
+        received = len(columns['timestamp'])
+        columns = self._clean_samples(columns)
+        received_at = time.time()
         
-        while session_id in self.tracking_sessions and self.tracking_sessions[session_id]['active']:
-            # Generate realistic tracking data
-            tracking_data = self._generate_simulated_metrics(base_eye_contact, base_face_visibility)
-            tracking_data['timestamp'] = time.time()
+        if start:
+            self.start_tracking(session_id)
+        with self._lock:
+            session = self.tracking_sessions.get(session_id)
+            if session is None:
+                return None
+            session['last_seen'] = time.monotonic()
+            if not len(columns['timestamp']):
+                self._stats['samples_dropped'] += received
+                return 0
             
-            # Store data
-            self.tracking_sessions[session_id]['data'].append(tracking_data)
+            if session['source'] != 'client':
+                # Discard simulated samples so summaries only see real data
+                session['source'] = 'client'
+                session['data'] = TrackingRingBuffer(capacity=session['data'].capacity)
+                session['clock_offset'] = received_at - columns['timestamp'][-1]
+            columns['timestamp'] = columns['timestamp'] + session['clock_offset']
             
-            # Slightly vary the base values for realism
-            base_eye_contact += random.uniform(-2, 2)
-            base_eye_contact = max(60, min(95, base_eye_contact))  # Keep in realistic range
+            last_timestamp = session['data'].last_timestamp
+            if last_timestamp is not None:
+                keep = columns['timestamp'] >= last_timestamp
+                if not keep.all():
+                    columns = {name: values[keep] for name, values in columns.items()}
             
-            base_face_visibility += random.uniform(-1, 1)
-            base_face_visibility = max(75, min(100, base_face_visibility))
+            accepted = len(columns['timestamp'])
+            session['data'].extend(columns)
+            if self.persist_fn is not None and accepted:
+                session['pending'].append(columns)
+                session['pending_count'] += accepted
+            self._stats['samples_ingested'] += accepted
+            self._stats['samples_dropped'] += received - accepted
+        
+        return accepted
+    
+    def _clean_samples(self, columns):
+        """Order a batch by timestamp, drop non-finite samples and clamp percentages"""
+        columns = {name: np.asarray(columns[name]) for name in TrackingRingBuffer.COLUMN_NAMES}
+        finite = np.ones(len(columns['timestamp']), dtype=np.bool_)
+        for name in ('timestamp', 'eye_contact', 'face_visibility', 'yaw', 'pitch'):
+            finite &= np.isfinite(columns[name])
+        order = np.argsort(columns['timestamp'][finite], kind='stable')
+        columns = {name: values[finite][order] for name, values in columns.items()}
+        columns['eye_contact'] = np.clip(columns['eye_contact'], 0, 100)
+        columns['face_visibility'] = np.clip(columns['face_visibility'], 0, 100)
+        return columns
+    
+    def _take_pending(self, session):
+        """Detach a session's unpersisted samples; call with the lock held"""
+        batch = session['pending']
+        session['pending'] = []
+        session['pending_count'] = 0
+        session['last_persist'] = time.monotonic()
+        return batch
+    
+    def _persist_batch(self, session_id, batch):
+        """Write one batch of client samples through persist_fn"""
+        records = []
+        for columns in batch:
+            records.extend(TrackingRingBuffer.to_records(columns))
+        try:
+            self.persist_fn(session_id, records)
+        except Exception as e:
+            print(f"Error persisting tracking data for {session_id}: {str(e)}")
+            with self._lock:
+                self._stats['persist_failures'] += 1
+                session = self.tracking_sessions.get(session_id)
+                if session is not None:
+                    # Keep the samples so the next flush retries them
+                    session['pending'][:0] = batch
+                    session['pending_count'] += len(records)
+            return
+        with self._lock:
+            self._stats['samples_persisted'] += len(records)
+            self._stats['persist_batches'] += 1
+    
+    def flush_pending(self, force=False):
+        """Persist pending client samples for sessions whose batch is full or old enough"""
+        if self.persist_fn is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            batches = [
+                (session_id, self._take_pending(session))
+                for session_id, session in self.tracking_sessions.items()
+                if session['pending_count'] and (
+                    force or
+                    session['pending_count'] >= self.persist_batch_size or
+                    now - session['last_persist'] >= self.persist_interval)
+            ]
+        
+        # File writes happen outside the lock so ingestion is never blocked on disk
+        for session_id, batch in batches:
+            self._persist_batch(session_id, batch)
+    
+    def _ensure_scheduler(self):
+        """Start the shared scheduler thread on first use"""
+        if self._scheduler_thread is None or not self._scheduler_thread.is_alive():
+            self._scheduler_thread = threading.Thread(target=self._scheduler_loop, name="eye-tracker-scheduler")
+            self._scheduler_thread.daemon = True
+            self._scheduler_thread.start()
+    
+    def _scheduler_loop(self):
+        """Tick all active sessions on a fixed cadence from a single thread"""
+        next_tick = time.monotonic()
+        while True:
+            try:
+                self._tick_all_sessions()
+                self.flush_pending()
+                self._stop_idle_sessions()
+            except Exception as e:
+                print(f"Error in tracking scheduler: {str(e)}")
             
-            time.sleep(1)  # Update every second
+            # Schedule against the clock so a slow tick doesn't accumulate drift
+            next_tick += self.tick_interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+    
+    def _tick_all_sessions(self):
+        """Simulate tracking data for every active session in one batch"""
+        timestamp = time.time()
+        with self._lock:
+            for session in self.tracking_sessions.values():
+                if session['source'] == 'simulated':
+                    self._tick_session(session, timestamp)
+    
+    def _stop_idle_sessions(self):
+        """Stop tracking for abandoned interviews that are no longer polled or fed"""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle = [session_id for session_id, session in self.tracking_sessions.items()
+                    if now - session['last_seen'] > self.idle_timeout]
+            self._stats['idle_stops'] += len(idle)
+        for session_id in idle:
+            self.stop_tracking(session_id)
+    
+    def _tick_session(self, session, timestamp):
+        """Simulate tracking data without camera access"""
+        # Generate realistic tracking data
+        tracking_data = self._generate_simulated_metrics(session['base_eye_contact'], session['base_face_visibility'])
+        tracking_data['timestamp'] = timestamp
+        
+        # Store data
+        session['data'].append_sample(tracking_data)
+        
+        # Slightly vary the base values for realism
+        base_eye_contact = session['base_eye_contact'] + random.uniform(-2, 2)
+        session['base_eye_contact'] = max(60, min(95, base_eye_contact))  # Keep in realistic range
+        
+        base_face_visibility = session['base_face_visibility'] + random.uniform(-1, 1)
+        session['base_face_visibility'] = max(75, min(100, base_face_visibility))
     
     def _generate_simulated_metrics(self, base_eye_contact, base_face_visibility):
         """Generate realistic simulated tracking metrics"""
@@ -99,37 +283,76 @@ class EyeTracker:
     
     def get_current_tracking_data(self, session_id):
         """Get current tracking data for a session"""
-        if session_id not in self.tracking_sessions:
-            return None
-        
-        data = list(self.tracking_sessions[session_id]['data'])
+        with self._lock:
+            if session_id not in self.tracking_sessions:
+                return None
+            
+            # Return the last 10 data points
+            session = self.tracking_sessions[session_id]
+            session['last_seen'] = time.monotonic()
+            data = TrackingRingBuffer.to_records(session['data'].tail(10))
         if not data:
             return None
         
-        # Return the last 10 data points
-        return data[-10:]
+        return data
     
     def get_question_tracking_data(self, session_id, question_index):
         """Get tracking data for a specific question"""
-        if session_id not in self.tracking_sessions:
-            return []
-        
-        # Mark the start of a new question
-        current_time = time.time()
-        self.tracking_sessions[session_id]['question_data'][question_index] = {
-            'start_time': current_time,
-            'data': []
-        }
-        
-        # Get data from the last 2 minutes (typical question duration)
-        all_data = list(self.tracking_sessions[session_id]['data'])
-        question_data = [d for d in all_data if current_time - d.get('timestamp', 0) <= 120]
-        
+        question_data, _ = self.get_question_tracking(session_id, question_index)
         return question_data
     
+    def get_question_tracking(self, session_id, question_index):
+        """Get tracking samples for a question together with their summary moments"""
+        with self._lock:
+            if session_id not in self.tracking_sessions:
+                return [], None
+            
+            # Mark the start of a new question
+            current_time = time.time()
+            self.tracking_sessions[session_id]['last_seen'] = time.monotonic()
+            self.tracking_sessions[session_id]['question_data'][question_index] = {
+                'start_time': current_time,
+                'data': []
+            }
+            
+            # Get data from the last 2 minutes (typical question duration)
+            window = self.tracking_sessions[session_id]['data'].window(current_time - 120)
+            question_data = TrackingRingBuffer.to_records(window)
+            moments = compute_moments(window)
+        
+        return question_data, moments
+    
+    def get_stats(self):
+        """Return scheduler and session counts"""
+        with self._lock:
+            active_sessions = len(self.tracking_sessions)
+            buffered_samples = sum(len(session['data']) for session in self.tracking_sessions.values())
+            buffer_bytes = sum(session['data'].nbytes for session in self.tracking_sessions.values())
+            client_sessions = sum(1 for session in self.tracking_sessions.values() if session['source'] == 'client')
+            pending_samples = sum(session['pending_count'] for session in self.tracking_sessions.values())
+            stats = dict(self._stats)
+        stats.update({
+            'active_sessions': active_sessions,
+            'client_sessions': client_sessions,
+            'pending_samples': pending_samples,
+            'buffered_samples': buffered_samples,
+            'buffer_bytes': buffer_bytes,
+            'scheduler_threads': 1 if self._scheduler_thread is not None and self._scheduler_thread.is_alive() else 0,
+            'tick_interval': self.tick_interval
+        })
+        return stats
+    
     def get_tracking_summary(self, tracking_data):
         """Generate summary statistics from tracking data"""
-        if not tracking_data:
+        # tracking_data may be sample dicts or ring-buffer column views
+        columns = tracking_data if isinstance(tracking_data, dict) else columns_from_records(tracking_data or [])
+        return self.summary_from_moments(compute_moments(columns))
+    
+    def summary_from_moments(self, moments):
+        """Generate summary statistics from precomputed tracking moments"""
+        stats = summarize_moments(moments) if moments else None
+        
+        if not stats or stats['count'] == 0:
             return {
                 'avg_eye_contact': 0,
                 'avg_face_visibility': 0,
@@ -137,22 +360,16 @@ class EyeTracker:
                 'head_movement': 'stable'
             }
         
-        # Calculate averages
-        avg_eye_contact = sum(d.get('eye_contact_score', 0) for d in tracking_data) / len(tracking_data)
-        avg_face_visibility = sum(d.get('face_visibility', 0) for d in tracking_data) / len(tracking_data)
+        avg_eye_contact = stats['eye_contact_mean']
+        avg_face_visibility = stats['face_visibility_mean']
         
         # Calculate blink rate (blinks per minute)
-        blinks = sum(1 for d in tracking_data if d.get('blink_detected', False))
-        duration_minutes = len(tracking_data) / 60  # 1 second intervals
-        blink_rate = blinks / max(duration_minutes, 1)
+        duration_minutes = stats['duration_seconds'] / 60
+        blink_rate = stats['blinks'] / max(duration_minutes, 1)
         
         # Analyze head movement
-        head_poses = [d.get('head_pose', {}) for d in tracking_data]
-        yaw_values = [p.get('yaw', 0) for p in head_poses if p]
-        
-        if yaw_values:
-            import numpy as np
-            yaw_variance = np.var(yaw_values)
+        if stats['head_pose_count']:
+            yaw_variance = stats['yaw_var']
             
             if yaw_variance < 25:
                 head_movement = 'stable'
@@ -1,55 +1,330 @@
 import PyPDF2
+import codecs
 import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from docx import Document
 import fitz  # PyMuPDF for better PDF processing
+from services.cache import make_file_digest
+
+class UnsupportedFormatError(Exception):
+    """Raised when an upload is not a PDF, DOCX or UTF-8 text document"""
+    pass
+
+def _extract_page_range(pdf_path, start, stop):
+    """Extract text for pages [start, stop) in a worker process"""
+    pdf_document = fitz.open(pdf_path)
+    try:
+        return "".join(pdf_document.load_page(i).get_text() for i in range(start, stop))
+    finally:
+        pdf_document.close()
+
+class LazyText:
+    """Budgeted text prefix whose full document text is only extracted on demand"""
+    
+    def __init__(self, text, complete, loader):
+        self.text = text
+        self.complete = complete
+        self._loader = loader
+        self._full_text = text if complete else None
+        self._lock = threading.Lock()
+    
+    def full_text(self):
+        """Return the whole document text, extracting the remaining pages on first use"""
+        with self._lock:
+            if self._full_text is None:
+                self._full_text = self._loader()
+            return self._full_text
+    
+    def __str__(self):
+        return self.text
+    
+    def __len__(self):
+        return len(self.text)
 
 class FileProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, spool_threshold_bytes=8 * 1024 * 1024, parallel_page_threshold=60,
+                 pages_per_chunk=20, max_process_workers=None, max_thread_workers=4, text_cache=None):
+        self.spool_threshold_bytes = spool_threshold_bytes
+        self.parallel_page_threshold = parallel_page_threshold
+        self.pages_per_chunk = pages_per_chunk
+        self.text_cache = text_cache
+        self.max_process_workers = max_process_workers or min(4, os.cpu_count() or 1)
+        # Created up front and spawned, never forked: the server's threads may hold locks at fork time
+        self._process_pool = ProcessPoolExecutor(max_workers=self.max_process_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        self._thread_pool = ThreadPoolExecutor(max_workers=max_thread_workers)
+        self._stats_lock = threading.Lock()
+        self._backend_stats = {}
+    
+    def detect_format(self, file):
+        """Identify a document's format from its magic bytes: 'pdf', 'docx' or 'txt'"""
+        file.seek(0)
+        head = file.read(2048)
+        file.seek(0)
+        
+        # The PDF header may be preceded by junk, but must be in the first 1024 bytes
+        if b'%PDF-' in head[:1024]:
+            return 'pdf'
+        
+        if head.startswith(b'PK\x03\x04'):
+            # Only the zip central directory is read here, not the document body
+            try:
+                with zipfile.ZipFile(file) as archive:
+                    is_docx = 'word/document.xml' in archive.namelist()
+            except zipfile.BadZipFile:
+                is_docx = False
+            file.seek(0)
+            if is_docx:
+                return 'docx'
+            raise UnsupportedFormatError("Unsupported file format: zip archive is not a DOCX document")
+        
+        if b'\x00' not in head:
+            try:
+                codecs.getincrementaldecoder('utf-8')().decode(head)
+                return 'txt'
+            except UnicodeDecodeError:
+                pass
+        
+        raise UnsupportedFormatError("Unsupported file format: expected PDF, DOCX or UTF-8 text")
+    
+    def extract_text(self, file, max_chars=None):
+        """Extract text from a PDF, DOCX or TXT file, picking the backend from its magic bytes"""
+        text, _ = self._extract(file, self.detect_format(file), max_chars)
+        return text
     
-    def extract_text_from_pdf(self, file):
-        """Extract text from PDF file using PyMuPDF for better accuracy"""
+    def extract_text_from_pdf(self, file, max_chars=None):
+        """Extract text from PDF file using PyMuPDF for better accuracy
+        
+        Pages are read one at a time and extraction stops as soon as
+        max_chars of text have been collected.
+        """
         try:
-            # Read file content
-            file_content = file.read()
-            
-            # Use PyMuPDF for better text extraction
-            pdf_document = fitz.open(stream=file_content, filetype="pdf")
-            text = ""
-            
-            for page_num in range(len(pdf_document)):
-                page = pdf_document.load_page(page_num)
-                text += page.get_text()
-            
-            pdf_document.close()
-            return text.strip()
-            
+            text, _ = self._extract_with_pymupdf(file, max_chars)
+            return text
+        
         except Exception as e:
             # Fallback to PyPDF2
             try:
                 file.seek(0)  # Reset file pointer
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
-                text = ""
+                pdf_reader = PyPDF2.PdfReader(file)
+                parts = []
+                total = 0
                 for page in pdf_reader.pages:
-                    text += page.extract_text()
-                return text.strip()
+                    page_text = page.extract_text() or ""
+                    parts.append(page_text)
+                    total += len(page_text)
+                    if self._budget_reached(parts, total, max_chars):
+                        break
+                return "".join(parts).strip()
             except Exception as fallback_error:
                 raise Exception(f"Failed to extract PDF text: {str(e)}, Fallback error: {str(fallback_error)}")
     
+    def extract_lazily(self, path, max_chars):
+        """Extract at most max_chars from a stored document and return a LazyText handle"""
+        with open(path, 'rb') as f:
+            text, complete = self._extract(f, self.detect_format(f), max_chars)
+        return LazyText(text, complete, lambda: self.load_full_text(path))
+    
+    def load_full_text(self, path):
+        """Extract the whole text of a stored document"""
+        with open(path, 'rb') as f:
+            return self.extract_text(f)
+    
+    def extract_concurrently(self, jobs):
+        """Run several (extract_fn, file, max_chars) jobs at once and return their texts in order"""
+        futures = [self._thread_pool.submit(extract_fn, file, max_chars) for extract_fn, file, max_chars in jobs]
+        return [future.result() for future in futures]
+    
+    def _extract(self, file, fmt, max_chars):
+        """Run the backend for fmt and record its timing; returns (text, complete)
+        
+        With a text cache, repeat uploads of the same bytes skip parsing.
+        """
+        digest = None
+        if self.text_cache is not None:
+            digest = make_file_digest(file)
+            cached = self._get_cached_text(digest, max_chars)
+            if cached is not None:
+                return cached
+        
+        backends = {
+            'pdf': self._extract_with_pymupdf,
+            'docx': self._extract_docx,
+            'txt': self._extract_txt
+        }
+        start = time.perf_counter()
+        try:
+            text, complete = backends[fmt](file, max_chars)
+        except Exception:
+            self._record_backend_timing(fmt, start, failed=True)
+            raise
+        self._record_backend_timing(fmt, start, chars=len(text))
+        
+        # Only reached when the cache had nothing or too short a prefix
+        if digest is not None:
+            self.text_cache.set(digest, {'text': text, 'complete': complete})
+        return text, complete
+    
+    def _get_cached_text(self, digest, max_chars):
+        """Serve (text, complete) from the cache if the stored extraction covers the budget"""
+        entry = self.text_cache.get(digest)
+        if entry is None:
+            return None
+        
+        text, complete = entry['text'], entry['complete']
+        if max_chars is None:
+            return (text, True) if complete else None
+        if len(text) >= max_chars:
+            return text[:max_chars], complete and len(text) == max_chars
+        return (text, complete) if complete else None
+    
+    def _record_backend_timing(self, fmt, start, chars=0, failed=False):
+        """Accumulate per-backend call counts and latency"""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            stats = self._backend_stats.setdefault(fmt, {
+                'calls': 0, 'failures': 0, 'chars': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['calls'] += 1
+            stats['failures'] += 1 if failed else 0
+            stats['chars'] += chars
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+    
+    def get_stats(self):
+        """Return per-backend extraction timing"""
+        with self._stats_lock:
+            backends = {fmt: dict(stats) for fmt, stats in self._backend_stats.items()}
+        for stats in backends.values():
+            stats['avg_ms'] = round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0
+            stats['total_ms'] = round(stats['total_ms'], 1)
+            stats['max_ms'] = round(stats['max_ms'], 2)
+        return {'backends': backends}
+    
+    def iter_pdf_pages(self, pdf_document):
+        """Yield page texts one at a time so only the current page is held in memory"""
+        for page_num in range(len(pdf_document)):
+            page = pdf_document.load_page(page_num)
+            yield page.get_text()
+    
+    def _extract_with_pymupdf(self, file, max_chars):
+        """Page-by-page PyMuPDF extraction with early exit and a process pool for large documents
+        
+        Returns (text, complete) where complete is False if pages were left unread.
+        """
+        spooled_path = self._spool_if_large(file)
+        try:
+            if spooled_path:
+                pdf_document = fitz.open(spooled_path)
+            else:
+                pdf_document = fitz.open(stream=file.read(), filetype="pdf")
+            
+            try:
+                page_count = len(pdf_document)
+                
+                # Early exit makes parallelism pointless when a budget is set
+                if max_chars is None and page_count >= self.parallel_page_threshold:
+                    if not spooled_path:
+                        spooled_path = self._spool_bytes(pdf_document.tobytes())
+                    return self._extract_in_process_pool(spooled_path, page_count).strip(), True
+                
+                parts = []
+                total = 0
+                pages_read = 0
+                for page_text in self.iter_pdf_pages(pdf_document):
+                    parts.append(page_text)
+                    total += len(page_text)
+                    pages_read += 1
+                    if self._budget_reached(parts, total, max_chars):
+                        break
+                return "".join(parts).strip(), pages_read == page_count
+            finally:
+                pdf_document.close()
+        finally:
+            if spooled_path:
+                os.remove(spooled_path)
+    
+    def _budget_reached(self, parts, total, max_chars, separator=""):
+        """Check whether the collected text, joined with separator, already covers max_chars after stripping"""
+        if max_chars is None or total < max_chars:
+            return False
+        return len(separator.join(parts).strip()) >= max_chars
+    
+    def _extract_in_process_pool(self, pdf_path, page_count):
+        """Split a large PDF into page ranges and extract them in worker processes"""
+        ranges = [(start, min(start + self.pages_per_chunk, page_count))
+                  for start in range(0, page_count, self.pages_per_chunk)]
+        futures = [self._process_pool.submit(_extract_page_range, pdf_path, start, stop) for start, stop in ranges]
+        return "".join(future.result() for future in futures)
+    
+    def _spool_if_large(self, file):
+        """Copy large uploads to a temp file so PyMuPDF can page them from disk"""
+        try:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(0)
+        except Exception:
+            return None
+        
+        if size < self.spool_threshold_bytes:
+            return None
+        
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(file, f, length=1024 * 1024)
+        return path
+    
+    def _spool_bytes(self, content):
+        """Write in-memory PDF bytes to a temp file for the worker processes"""
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        return path
+    
     def extract_text_from_docx(self, file):
         """Extract text from DOCX file"""
         try:
-            doc = Document(file)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text.strip()
+            text, _ = self._extract_docx(file, None)
+            return text
         except Exception as e:
             raise Exception(f"Failed to extract DOCX text: {str(e)}")
     
     def extract_text_from_txt(self, file):
         """Extract text from TXT file"""
         try:
-            return file.read().decode('utf-8').strip()
+            text, _ = self._extract_txt(file, None)
+            return text
         except Exception as e:
             raise Exception(f"Failed to extract TXT text: {str(e)}")
+    
+    def _extract_docx(self, file, max_chars):
+        """Collect paragraph text with a single join, stopping at the budget"""
+        doc = Document(file)
+        parts = []
+        total = 0
+        paragraphs = doc.paragraphs
+        for paragraph in paragraphs:
+            parts.append(paragraph.text)
+            total += len(paragraph.text) + 1
+            if self._budget_reached(parts, total, max_chars, separator="\n"):
+                break
+        return "\n".join(parts).strip(), len(parts) == len(paragraphs)
+    
+    def _extract_txt(self, file, max_chars):
+        """Decode UTF-8 text, reading only as many bytes as the budget needs"""
+        if max_chars is None:
+            return file.read().decode('utf-8').strip(), True
+        
+        # UTF-8 is at most 4 bytes per character; the incremental decoder
+        # copes with a multi-byte sequence cut at the read boundary
+        data = file.read(max_chars * 4 + 1)
+        complete = len(data) <= max_chars * 4
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        return decoder.decode(data, final=complete).strip(), complete
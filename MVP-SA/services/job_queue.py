@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+    pass
+
+class JobQueue:
+    """Bounded worker pool with job ids, result lookup and backpressure"""
+    
+    def __init__(self, num_workers=4, max_queue_size=200, max_retained_jobs=5000, name="jobs"):
+        self.name = name
+        self.num_workers = num_workers
+        self.max_retained_jobs = max_retained_jobs
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._job_finished = threading.Condition(self._lock)
+        self._wait_ms = deque(maxlen=1000)
+        self._run_ms = deque(maxlen=1000)
+        self._busy_workers = 0
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0
+        }
+        
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{name}-worker-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+    
+    def submit(self, func, *args, tag=None, **kwargs):
+        """Enqueue a job and return its id; raises QueueFullError when saturated"""
+        job_id = str(uuid.uuid4())
+        job = {
+            'job_id': job_id,
+            'tag': tag,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_finished_jobs()
+        
+        try:
+            self._queue.put_nowait((job_id, func, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+                self._stats['rejected'] += 1
+            raise QueueFullError(f"{self.name} queue is full ({self._queue.maxsize} pending jobs)")
+        
+        with self._lock:
+            self._stats['submitted'] += 1
+        return job_id
+    
+    def get_job(self, job_id):
+        """Return a snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def wait_for_job(self, job_id, timeout=None):
+        """Block until a job finishes or the timeout expires; returns the job snapshot"""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._job_finished:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] in ('completed', 'failed'):
+                    return dict(job) if job else None
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return dict(job)
+                self._job_finished.wait(remaining)
+    
+    def wait_for_tag(self, tag, timeout=None):
+        """Block until every job submitted with the given tag has finished"""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._job_finished:
+            while True:
+                pending = [j for j in self._jobs.values()
+                           if j['tag'] == tag and j['status'] in ('queued', 'running')]
+                if not pending:
+                    return True
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._job_finished.wait(remaining)
+    
+    def _worker_loop(self):
+        """Pull jobs off the queue and run them"""
+        while True:
+            job_id, func, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job['status'] = 'running'
+                    job['started_at'] = time.time()
+                    self._wait_ms.append((job['started_at'] - job['submitted_at']) * 1000)
+                self._busy_workers += 1
+            
+            try:
+                result = func(*args, **kwargs)
+                error = None
+            except Exception as e:
+                print(f"Error in {self.name} job {job_id}: {str(e)}")
+                result = None
+                error = str(e)
+            
+            with self._job_finished:
+                self._busy_workers -= 1
+                if job is not None:
+                    job['finished_at'] = time.time()
+                    job['result'] = result
+                    job['error'] = error
+                    job['status'] = 'failed' if error else 'completed'
+                    self._run_ms.append((job['finished_at'] - job['started_at']) * 1000)
+                self._stats['failed' if error else 'completed'] += 1
+                self._job_finished.notify_all()
+            self._queue.task_done()
+    
+    def _evict_finished_jobs(self):
+        """Drop the oldest finished jobs once the retention limit is exceeded"""
+        if len(self._jobs) <= self.max_retained_jobs:
+            return
+        for job_id in list(self._jobs.keys()):
+            if len(self._jobs) <= self.max_retained_jobs:
+                break
+            if self._jobs[job_id]['status'] in ('completed', 'failed'):
+                del self._jobs[job_id]
+    
+    def get_stats(self):
+        """Return queue depth, worker utilization and job latency metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+            wait_ms = sorted(self._wait_ms)
+            run_ms = sorted(self._run_ms)
+            busy = self._busy_workers
+        
+        stats['queue_depth'] = self._queue.qsize()
+        stats['max_queue_size'] = self._queue.maxsize
+        stats['workers'] = self.num_workers
+        stats['busy_workers'] = busy
+        for label, values in (('wait_ms', wait_ms), ('run_ms', run_ms)):
+            stats[f'{label}_avg'] = round(sum(values) / len(values), 1) if values else 0
+            stats[f'{label}_p50'] = round(values[len(values) // 2], 1) if values else 0
+            stats[f'{label}_p99'] = round(values[min(len(values) - 1, int(len(values) * 0.99))], 1) if values else 0
+        return stats
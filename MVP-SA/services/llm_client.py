@@ -0,0 +1,389 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.rate_limiter import PriorityRateLimiter, PRIORITY_LIVE, PRIORITY_BATCH
+
+# 429 is rate limiting and 529 is API overload; the rest are transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS = {429, 529}
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+_priority = threading.local()
+
+@contextmanager
+def llm_priority(priority):
+    """Send the LLM calls made by this thread inside the block at the given priority"""
+    previous = getattr(_priority, 'value', PRIORITY_LIVE)
+    _priority.value = priority
+    try:
+        yield
+    finally:
+        _priority.value = previous
+
+def current_priority():
+    """Priority of LLM calls made by this thread; live unless set by llm_priority"""
+    return getattr(_priority, 'value', PRIORITY_LIVE)
+
+def _retry_after(response):
+    """Seconds the API asked us to wait, from a retry-after header in seconds or as a date"""
+    value = response.headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _used_tokens(usage):
+    """Input plus output tokens from a response's usage block"""
+    if not usage:
+        return None
+    return (usage.get('input_tokens') or 0) + (usage.get('output_tokens') or 0)
+
+def get_llm_client():
+    """Return the process-wide LLM client, creating it on first use"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
+
+class LLMClient:
+    """Pooled, keep-alive HTTP client shared by all services that call Claude
+    
+    Requests are admitted through a PriorityRateLimiter and retried on
+    429/529 and transient errors with jittered exponential backoff, or
+    after the API's retry-after when it sends one. Live calls give up
+    after max_wait seconds in total so the caller can fall back; batch
+    calls (see llm_priority) may wait up to batch_max_wait.
+    """
+    
+    def __init__(self, api_base_url="https://api.anthropic.com/v1/messages",
+                 pool_connections=4, pool_maxsize=16, connect_timeout=5.0,
+                 read_timeout=120.0, max_concurrent_per_host=16, acquire_timeout=30.0,
+                 requests_per_minute=None, tokens_per_minute=None, batch_reserve=0.2,
+                 max_retries=4, backoff_base=1.0, backoff_max=30.0, max_wait=60.0, batch_max_wait=600.0):
+        self.api_base_url = api_base_url
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrent_per_host = max_concurrent_per_host
+        self.acquire_timeout = acquire_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.batch_max_wait = batch_max_wait
+        self.rate_limiter = PriorityRateLimiter(requests_per_minute=requests_per_minute,
+                                                tokens_per_minute=tokens_per_minute,
+                                                batch_reserve=batch_reserve)
+        
+        # One session means one connection pool; keep-alive is the requests default
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   pool_block=True, max_retries=0)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+            'anthropic-version': '2023-06-01'
+        })
+        
+        self._lock = threading.Lock()
+        self._host_semaphores = {}
+        self._in_flight = {}
+        self._latencies_ms = deque(maxlen=1000)
+        self._first_token_ms = deque(maxlen=1000)
+        self._stats = {
+            'requests_total': 0,
+            'errors_total': 0,
+            'concurrency_rejections': 0,
+            'retries': 0,
+            'retries_exhausted': 0,
+            'latency_ms_total': 0.0,
+            'latency_ms_max': 0.0,
+            'peak_in_flight': 0
+        }
+    
+    def create_message(self, prompt, api_key, max_tokens, model='claude-3-5-sonnet-20241022'):
+        """Send a single-turn message to Claude and return the response text"""
+        payload = {
+            'model': model,
+            'max_tokens': max_tokens,
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ]
+        }
+        estimated_tokens = self._estimate_tokens(prompt, max_tokens)
+        response = self._send_with_retries(
+            lambda: self.post(self.api_base_url, payload, headers={'x-api-key': api_key}), estimated_tokens)
+        
+        if response.status_code != 200:
+            with self._lock:
+                self._stats['errors_total'] += 1
+            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
+        
+        body = response.json()
+        used_tokens = _used_tokens(body.get('usage'))
+        self.rate_limiter.settle(estimated_tokens, estimated_tokens if used_tokens is None else used_tokens)
+        return body['content'][0]['text']
+    
+    def _estimate_tokens(self, prompt, max_tokens):
+        """Tokens to reserve for a request: roughly four characters per input token plus the output limit"""
+        return len(prompt) // 4 + max_tokens
+    
+    def _backoff_delay(self, attempt, retry_after):
+        """Seconds to wait before a retry: the server's retry-after if given, else full-jitter exponential"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    def _send_with_retries(self, send, estimated_tokens):
+        """Send one request through the rate limiter, retrying throttled and transient failures
+        
+        send() makes a single attempt and returns the response. Returns the
+        first 200 response, or the last failed one once retries or the
+        wait budget run out; connection errors are re-raised in that case.
+        """
+        priority = current_priority()
+        deadline = time.monotonic() + (self.max_wait if priority <= PRIORITY_LIVE else self.batch_max_wait)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(priority, estimated_tokens, timeout=max(0.0, deadline - time.monotonic()))
+            response = error = retry_after = None
+            succeeded = False
+            try:
+                response = send()
+                succeeded = response.status_code == 200
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                reason = type(e).__name__
+            finally:
+                if not succeeded:
+                    # Failed and rejected requests, including ones raising other errors,
+                    # do not count against the token budget
+                    self.rate_limiter.settle(estimated_tokens, 0)
+            
+            if succeeded:
+                self.rate_limiter.record_success()
+                return response
+            if response is not None:
+                reason = f"status {response.status_code}"
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                retry_after = _retry_after(response)
+                if response.status_code in THROTTLE_STATUS:
+                    self.rate_limiter.throttle(retry_after)
+            
+            delay = self._backoff_delay(attempt, retry_after)
+            attempt += 1
+            if attempt > self.max_retries or time.monotonic() + delay > deadline:
+                with self._lock:
+                    self._stats['retries_exhausted'] += 1
+                print(f"LLM request failed ({reason}) after {attempt} attempts")
+                if error is not None:
+                    raise error
+                return response
+            
+            with self._lock:
+                self._stats['retries'] += 1
+            print(f"LLM request failed ({reason}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+    
+    def stream_message(self, prompt, api_key, max_tokens, model='claude-3-5-sonnet-20241022'):
+        """Send a single-turn message with streaming on and yield text deltas as they arrive
+        
+        The connection slot is held until the generator is exhausted or closed.
+        """
+        payload = {
+            'model': model,
+            'max_tokens': max_tokens,
+            'stream': True,
+            'messages': [
+                {
+                    'role': 'user',
+                    'content': prompt
+                }
+            ]
+        }
+        host = urlparse(self.api_base_url).hostname
+        estimated_tokens = self._estimate_tokens(prompt, max_tokens)
+        opened = {}
+        
+        def open_stream():
+            response, opened['semaphore'], opened['start'] = self._open_stream(host, payload, api_key)
+            return response
+        
+        response = self._send_with_retries(open_stream, estimated_tokens)
+        if response.status_code != 200:
+            with self._lock:
+                self._stats['errors_total'] += 1
+            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
+        
+        semaphore, start = opened['semaphore'], opened['start']
+        usage = {}
+        try:
+            response.encoding = 'utf-8'  # SSE is always UTF-8, whatever the headers say
+            first_token = True
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                event = json.loads(line[5:])
+                if event.get('type') == 'message_start':
+                    usage.update(event.get('message', {}).get('usage') or {})
+                elif event.get('type') == 'message_delta':
+                    usage.update(event.get('usage') or {})
+                elif event.get('type') == 'content_block_delta':
+                    text = event.get('delta', {}).get('text', '')
+                    if text:
+                        if first_token:
+                            first_token = False
+                            with self._lock:
+                                self._first_token_ms.append((time.perf_counter() - start) * 1000)
+                        yield text
+                elif event.get('type') == 'error':
+                    raise Exception(f"API stream error: {event.get('error')}")
+        except GeneratorExit:
+            raise
+        except Exception:
+            with self._lock:
+                self._stats['errors_total'] += 1
+            raise
+        finally:
+            response.close()
+            self._release_host_slot(host, semaphore, start)
+            used_tokens = _used_tokens(usage)
+            self.rate_limiter.settle(estimated_tokens, estimated_tokens if used_tokens is None else used_tokens)
+    
+    def _open_stream(self, host, payload, api_key):
+        """Start one streaming request; the host slot stays held only when the response is a 200"""
+        semaphore = self._acquire_host_slot(host)
+        
+        self._track_in_flight(host, 1)
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.api_base_url, json=payload, headers={'x-api-key': api_key},
+                                         timeout=self.timeout, stream=True)
+        except Exception:
+            with self._lock:
+                self._stats['errors_total'] += 1
+            self._release_host_slot(host, semaphore, start)
+            raise
+        
+        if response.status_code != 200:
+            response.content  # Read the error body before the connection goes back to the pool
+            response.close()
+            self._release_host_slot(host, semaphore, start)
+        return response, semaphore, start
+    
+    def _release_host_slot(self, host, semaphore, start):
+        """Free a host slot taken by _acquire_host_slot and record the request's latency"""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._track_in_flight(host, -1)
+        semaphore.release()
+        self._record_latency(elapsed_ms)
+    
+    def _acquire_host_slot(self, host):
+        """Wait for a free concurrency slot for a host and return its semaphore"""
+        semaphore = self._get_host_semaphore(host)
+        if not semaphore.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['concurrency_rejections'] += 1
+            raise Exception(f"Timed out waiting for a connection slot to {host}")
+        return semaphore
+    
+    def post(self, url, payload, headers=None):
+        """POST JSON through the pooled session, honouring the per-host concurrency limit"""
+        host = urlparse(url).hostname
+        semaphore = self._acquire_host_slot(host)
+        
+        self._track_in_flight(host, 1)
+        start = time.perf_counter()
+        try:
+            return self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self._stats['errors_total'] += 1
+            raise
+        finally:
+            self._release_host_slot(host, semaphore, start)
+    
+    def _get_host_semaphore(self, host):
+        """Get or create the concurrency limiter for a host"""
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.max_concurrent_per_host)
+                self._in_flight[host] = 0
+            return self._host_semaphores[host]
+    
+    def _track_in_flight(self, host, delta):
+        """Update the in-flight request count for a host"""
+        with self._lock:
+            self._in_flight[host] += delta
+            total = sum(self._in_flight.values())
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], total)
+    
+    def _record_latency(self, elapsed_ms):
+        """Record the latency of a completed request"""
+        with self._lock:
+            self._stats['requests_total'] += 1
+            self._stats['latency_ms_total'] += elapsed_ms
+            self._stats['latency_ms_max'] = max(self._stats['latency_ms_max'], elapsed_ms)
+            self._latencies_ms.append(elapsed_ms)
+    
+    def get_stats(self):
+        """Return latency and pool-utilization counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies_ms)
+            first_token = sorted(self._first_token_ms)
+            in_flight = dict(self._in_flight)
+        
+        count = stats['requests_total']
+        stats['latency_ms_avg'] = round(stats['latency_ms_total'] / count, 1) if count else 0
+        stats['latency_ms_p50'] = round(latencies[len(latencies) // 2], 1) if latencies else 0
+        stats['latency_ms_p99'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1) if latencies else 0
+        stats['first_token_ms_p50'] = round(first_token[len(first_token) // 2], 1) if first_token else 0
+        stats['latency_ms_total'] = round(stats['latency_ms_total'], 1)
+        stats['latency_ms_max'] = round(stats['latency_ms_max'], 1)
+        
+        # Connection pool utilization per host, read from urllib3's pools
+        pools = {}
+        for key in list(self.adapter.poolmanager.pools.keys()):
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            available = pool.pool.qsize() if pool.pool is not None else 0
+            pools[pool.host] = {
+                'connections_opened': pool.num_connections,
+                'requests_sent': pool.num_requests,
+                'available_slots': available,
+                'in_flight': in_flight.get(pool.host, 0),
+                'utilization': round(in_flight.get(pool.host, 0) / self.pool_maxsize, 2)
+            }
+        
+        stats['in_flight'] = sum(in_flight.values())
+        stats['pool_maxsize'] = self.pool_maxsize
+        stats['max_concurrent_per_host'] = self.max_concurrent_per_host
+        stats['pools'] = pools
+        stats['max_retries'] = self.max_retries
+        stats['rate_limiter'] = self.rate_limiter.get_stats()
+        return stats
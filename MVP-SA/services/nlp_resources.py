@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+# Local NLTK data for the app; warm_up() downloads whatever is missing at startup,
+# or populate it ahead of time with
+#   python -m services.nlp_resources
+NLTK_DATA_DIR = os.environ.get(
+    'NLTK_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nltk_data')
+)
+
+# Resource name -> path nltk.data.find resolves it by
+NLTK_RESOURCES = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'cmudict': 'corpora/cmudict'
+}
+
+_lock = threading.RLock()
+_state = {}
+_timings = {}
+
+def _nltk():
+    """Import nltk on first use with the local data directory searched first"""
+    if 'nltk' not in _state:
+        start = time.perf_counter()
+        import nltk
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        _timings['nltk_import_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        _state['nltk'] = nltk
+    return _state['nltk']
+
+def has_resource(name):
+    """Whether an NLTK resource is available locally; never downloads"""
+    key = f"has_{name}"
+    if key not in _state:
+        with _lock:
+            if key not in _state:
+                try:
+                    _nltk().data.find(NLTK_RESOURCES[name])
+                    _state[key] = True
+                except LookupError:
+                    print(f"Warning: NLTK resource '{name}' not found in {NLTK_DATA_DIR}")
+                    _state[key] = False
+    return _state[key]
+
+def get_sentiment_analyzer():
+    """The process-wide VADER analyzer, built on first use; None if the lexicon is missing"""
+    if 'analyzer' not in _state:
+        with _lock:
+            if 'analyzer' not in _state:
+                analyzer = None
+                start = time.perf_counter()
+                try:
+                    _nltk()
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    if has_resource('vader_lexicon'):
+                        analyzer = SentimentIntensityAnalyzer()
+                except Exception as e:
+                    print(f"Warning: Failed to load sentiment analyzer: {str(e)}")
+                _timings['analyzer_load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                _state['analyzer'] = analyzer
+    return _state['analyzer']
+
+def get_readability():
+    """(flesch_reading_ease, flesch_kincaid_grade) from textstat, or None without cmudict
+    
+    textstat downloads cmudict on every call when it is missing, so it is
+    only used once the corpus is known to be present locally.
+    """
+    if 'readability' not in _state:
+        with _lock:
+            if 'readability' not in _state:
+                readability = None
+                start = time.perf_counter()
+                try:
+                    _nltk()
+                    if has_resource('cmudict'):
+                        from textstat import flesch_reading_ease, flesch_kincaid_grade
+                        readability = (flesch_reading_ease, flesch_kincaid_grade)
+                except Exception as e:
+                    print(f"Warning: Failed to load readability metrics: {str(e)}")
+                if readability is None:
+                    print("Error: Readability metrics are unavailable; answers get no readability adjustment")
+                _timings['readability_load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                _state['readability'] = readability
+    return _state['readability']
+
+def warm_up(download=True):
+    """Load every NLP resource now so the first rating does not pay for it
+    
+    With download, resources missing from NLTK_DATA_DIR are fetched into
+    it first, as the app used to do on import.
+    """
+    start = time.perf_counter()
+    missing = [name for name in NLTK_RESOURCES if not has_resource(name)]
+    if missing and download:
+        try:
+            download_resources(names=missing)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+        with _lock:
+            # Look again, and rebuild whatever was loaded without them
+            for name in missing:
+                _state.pop(f"has_{name}", None)
+            _state.pop('analyzer', None)
+            _state.pop('readability', None)
+    analyzer = get_sentiment_analyzer()
+    readability = get_readability()
+    # The first calls build VADER's lookup tables and textstat's cmudict cache
+    if analyzer is not None:
+        analyzer.polarity_scores("Warm-up sentence for the sentiment analyzer.")
+    if readability is not None:
+        readability[0]("Warm-up sentence for the readability metrics.")
+    _timings['warmup_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    print(f"NLP resources warmed up in {_timings['warmup_ms']} ms")
+
+def get_stats():
+    """Return load timings and which resources are available"""
+    stats = dict(_timings)
+    stats['data_dir'] = NLTK_DATA_DIR
+    stats['sentiment_available'] = _state['analyzer'] is not None if 'analyzer' in _state else None
+    stats['readability_available'] = _state['readability'] is not None if 'readability' in _state else None
+    return stats
+
+def download_resources(data_dir=NLTK_DATA_DIR, names=None):
+    """Fetch NLTK resources (all of them by default) into the local data directory"""
+    import nltk
+    os.makedirs(data_dir, exist_ok=True)
+    for name in names or NLTK_RESOURCES:
+        print(f"Downloading {name} to {data_dir}")
+        if not nltk.download(name, download_dir=data_dir, quiet=True):
+            raise Exception(f"Failed to download NLTK resource '{name}'")
+
+if __name__ == '__main__':
+    download_resources()
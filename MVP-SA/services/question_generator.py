@@ -1,24 +1,177 @@
-import requests
+import copy
 import json
 import re
+from services.llm_client import get_llm_client
+from services.cache import make_cache_key
 
-class QuestionGenerator:
+FALLBACK_QUESTIONS = [
+    {
+        "question": "Tell me about yourself and your relevant experience for this role.",
+        "type": "behavioral",
+        "difficulty": "easy",
+        "category": "introduction",
+        "expected_points": ["Clear introduction", "Relevant experience", "Career goals"],
+        "time_limit": 180
+    },
+    {
+        "question": "Describe a challenging project you worked on and how you overcame obstacles.",
+        "type": "behavioral",
+        "difficulty": "medium",
+        "category": "problem-solving",
+        "expected_points": ["Problem identification", "Solution approach", "Results achieved"],
+        "time_limit": 240
+    },
+    {
+        "question": "How do you stay updated with the latest trends in your field?",
+        "type": "behavioral",
+        "difficulty": "easy",
+        "category": "learning",
+        "expected_points": ["Learning methods", "Continuous improvement", "Industry awareness"],
+        "time_limit": 120
+    }
+]
+
+class QuestionStreamParser:
+    """Incrementally pick complete question objects out of a streamed JSON array
+    
+    feed() scans only the newly arrived text, tracking brace depth and
+    string state, and returns every top-level object that closed in it.
+    """
+    
     def __init__(self):
-        self.api_base_url = "https://api.anthropic.com/v1/messages"
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+    
+    def feed(self, text):
+        """Consume a chunk of response text and return the questions it completed"""
+        self._buffer += text
+        questions = []
+        buffer = self._buffer
+        
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif not self._in_array:
+                self._in_array = char == '['
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = pos
+                self._depth += 1
+            elif char == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    question = self._decode(buffer[self._object_start:pos + 1])
+                    if question is not None:
+                        questions.append(question)
+                    self._object_start = None
+        
+        # Drop text that can no longer be part of an object
+        keep_from = self._object_start if self._object_start is not None else len(buffer)
+        self._buffer = buffer[keep_from:]
+        self._object_start = 0 if self._object_start is not None else None
+        self._pos = len(self._buffer)
+        return questions
+    
+    def _decode(self, text):
+        """Parse one question object, ignoring fragments that are not valid questions"""
+        try:
+            question = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(question, dict) or not question.get('question'):
+            return None
+        return question
+
+class QuestionGenerator:
+    # Prompt truncation budgets; extraction can stop once these are filled
+    RESUME_CHAR_LIMIT = 3000
+    JD_CHAR_LIMIT = 2000
+    
+    def __init__(self, llm_client=None, cache=None):
+        self.llm_client = llm_client or get_llm_client()
+        self.cache = cache
+        self.api_base_url = self.llm_client.api_base_url
+        self.model = 'claude-3-5-sonnet-20241022'
         # API key is hardcoded here
         self.api_key = "sk-ant-REDACTED"
     
     def generate_questions(self, resume_text, jd_text, num_questions=10):
         """Generate interview questions using Claude API - NO api_key parameter needed"""
         try:
+            cache_key = self._cache_key(resume_text, jd_text, num_questions)
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
             prompt = self._create_question_prompt(resume_text, jd_text, num_questions)
             response = self._call_claude_api(prompt)  # Use self.api_key internally
             questions = self._parse_questions(response)
+            
+            # Never cache the canned fallback set; a retry may do better
+            if self.cache is not None and questions != FALLBACK_QUESTIONS:
+                self.cache.set(cache_key, questions)
             return questions
         except Exception as e:
             print(f"Error in generate_questions: {str(e)}")  # Add debugging
             raise Exception(f"Failed to generate questions: {str(e)}")
     
+    def generate_questions_stream(self, resume_text, jd_text, num_questions=10):
+        """Yield questions one at a time as the streamed completion closes each object
+        
+        When nothing could be picked out of the stream, the full response
+        goes through _parse_questions so the usual fallbacks still apply.
+        """
+        cache_key = self._cache_key(resume_text, jd_text, num_questions)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                yield from cached
+                return
+        
+        prompt = self._create_question_prompt(resume_text, jd_text, num_questions)
+        parser = QuestionStreamParser()
+        chunks = []
+        questions = []
+        
+        try:
+            for chunk in self.llm_client.stream_message(prompt, api_key=self.api_key, max_tokens=4000, model=self.model):
+                chunks.append(chunk)
+                for question in parser.feed(chunk):
+                    questions.append(question)
+                    yield question
+        except Exception as e:
+            print(f"Error in generate_questions_stream: {str(e)}")
+            if not questions:
+                raise Exception(f"Failed to generate questions: {str(e)}")
+            # Keep the questions already delivered rather than failing the interview
+            return
+        
+        if not questions:
+            questions = self._parse_questions("".join(chunks))
+            yield from questions
+        
+        if self.cache is not None and questions != FALLBACK_QUESTIONS:
+            self.cache.set(cache_key, questions)
+    
+    def _cache_key(self, resume_text, jd_text, num_questions):
+        """Content-addressed key over exactly what the prompt uses"""
+        return make_cache_key(resume_text[:self.RESUME_CHAR_LIMIT], jd_text[:self.JD_CHAR_LIMIT],
+                              num_questions, self.model)
+    
     def _create_question_prompt(self, resume_text, jd_text, num_questions):
         """Create the prompt for question generation"""
         return f"""
@@ -26,10 +179,10 @@ class QuestionGenerator:
         Create a mix of technical, behavioral, and situational questions that are specific to the candidate's experience and the job requirements.
         
         RESUME:
-        {resume_text[:3000]}  # Limit to avoid token limits
+        {resume_text[:self.RESUME_CHAR_LIMIT]}  # Limit to avoid token limits
         
         JOB DESCRIPTION:
-        {jd_text[:2000]}
+        {jd_text[:self.JD_CHAR_LIMIT]}
         
         Please generate questions that cover:
         1. Technical skills and experience
@@ -58,36 +211,14 @@ class QuestionGenerator:
         """
     
     def _call_claude_api(self, prompt):
-        """Make API call to Claude using self.api_key"""
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': self.api_key,  # Use self.api_key
-            'anthropic-version': '2023-06-01'
-        }
-        
-        payload = {
-            'model': 'claude-3-5-sonnet-20241022',
-            'max_tokens': 4000,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': prompt
-                }
-            ]
-        }
-        
+        """Make API call to Claude through the shared pooled client"""
         print(f"Making API call to: {self.api_base_url}")  # Debug print
-        print(f"Using API key: {self.api_key[:20]}...")  # Debug print (partial key)
-        
-        response = requests.post(self.api_base_url, headers=headers, json=payload)
-        
-        print(f"API response status: {response.status_code}")  # Debug print
         
-        if response.status_code != 200:
-            print(f"API Error Response: {response.text}")  # Debug print
-            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-        
-        return response.json()['content'][0]['text']
+        try:
+            return self.llm_client.create_message(prompt, api_key=self.api_key, max_tokens=4000, model=self.model)
+        except Exception as e:
+            print(f"API Error Response: {str(e)}")  # Debug print
+            raise
     
     def _parse_questions(self, response):
         """Parse the API response to extract questions"""
@@ -131,29 +262,4 @@ class QuestionGenerator:
     def _get_fallback_questions(self):
         """Provide fallback questions if parsing fails"""
         print("Using fallback questions")  # Debug print
-        return [
-            {
-                "question": "Tell me about yourself and your relevant experience for this role.",
-                "type": "behavioral",
-                "difficulty": "easy",
-                "category": "introduction",
-                "expected_points": ["Clear introduction", "Relevant experience", "Career goals"],
-                "time_limit": 180
-            },
-            {
-                "question": "Describe a challenging project you worked on and how you overcame obstacles.",
-                "type": "behavioral",
-                "difficulty": "medium",
-                "category": "problem-solving",
-                "expected_points": ["Problem identification", "Solution approach", "Results achieved"],
-                "time_limit": 240
-            },
-            {
-                "question": "How do you stay updated with the latest trends in your field?",
-                "type": "behavioral",
-                "difficulty": "easy",
-                "category": "learning",
-                "expected_points": ["Learning methods", "Continuous improvement", "Industry awareness"],
-                "time_limit": 120
-            }
-        ]
\ No newline at end of file
+        return copy.deepcopy(FALLBACK_QUESTIONS)
\ No newline at end of file
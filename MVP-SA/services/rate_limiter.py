@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+# Lower numbers are admitted first
+PRIORITY_LIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_NAMES = {PRIORITY_LIVE: 'live', PRIORITY_BATCH: 'batch'}
+
+class TokenBucket:
+    """Bucket refilled continuously at per_minute, holding at most one minute's worth
+    
+    Not thread-safe on its own; PriorityRateLimiter guards it.
+    """
+    
+    def __init__(self, per_minute):
+        self.per_minute = float(per_minute)
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate_factor = 1.0
+        self._updated = time.monotonic()
+    
+    def _refill(self, now):
+        """Add the tokens earned since the last update"""
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_minute * self.rate_factor / 60.0)
+    
+    def wait_time(self, amount, now, reserve=0.0):
+        """Seconds until amount is available while leaving reserve (a fraction of capacity) untouched"""
+        self._refill(now)
+        level = min(self.capacity, min(amount, self.capacity) + reserve * self.capacity)
+        missing = level - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing * 60.0 / (self.per_minute * self.rate_factor)
+    
+    def take(self, amount):
+        """Remove tokens; requests larger than the bucket take all of it"""
+        self.tokens -= min(amount, self.capacity)
+    
+    def give_back(self, amount):
+        """Return tokens that were reserved but not used (negative amounts take more)"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+    
+    def drain(self):
+        """Empty the bucket so traffic resumes at the refill rate rather than in a burst"""
+        self.tokens = min(self.tokens, 0.0)
+
+class PriorityRateLimiter:
+    """Admits LLM requests in priority order within request and token budgets
+    
+    Waiting requests form a heap ordered by (priority, arrival) and only
+    the head may take from the buckets, so a live request that arrives
+    behind queued batch requests goes next. Batch requests also leave
+    batch_reserve of each bucket for live traffic. A 429 or 529 from the
+    API pauses admissions for its retry-after and halves the refill rate,
+    which recovers by recovery_step on each later success.
+    """
+    
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, batch_reserve=0.2,
+                 default_pause=1.0, min_rate_factor=0.1, recovery_step=0.05):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.batch_reserve = batch_reserve
+        self.default_pause = default_pause
+        self.min_rate_factor = min_rate_factor
+        self.recovery_step = recovery_step
+        
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, arrival sequence)
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._rate_factor = 1.0
+        self._wait_ms = {}
+        self._stats = {
+            'admitted': 0,
+            'timeouts': 0,
+            'throttled': 0,
+            'preemptions': 0
+        }
+    
+    def _buckets(self):
+        return [bucket for bucket in (self.request_bucket, self.token_bucket) if bucket is not None]
+    
+    def _admission_wait(self, ticket, tokens, now):
+        """Seconds until ticket may go (0 for now), or None while others are ahead of it"""
+        if self._waiting[0] != ticket:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        reserve = self.batch_reserve if ticket[0] > PRIORITY_LIVE else 0.0
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now, reserve))
+        if self.token_bucket is not None and tokens:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now, reserve))
+        return wait
+    
+    def acquire(self, priority=PRIORITY_LIVE, tokens=0, timeout=None):
+        """Block until a request of the given priority and estimated token count may be sent"""
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            if any(waiting[0] > priority for waiting in self._waiting):
+                self._stats['preemptions'] += 1
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._admission_wait(ticket, tokens, now)
+                    if wait == 0:
+                        break
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._stats['timeouts'] += 1
+                            raise Exception(f"Timed out after {timeout:.1f}s waiting for the LLM rate limit")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+                
+                if self.request_bucket is not None:
+                    self.request_bucket.take(1)
+                if self.token_bucket is not None and tokens:
+                    self.token_bucket.take(tokens)
+                self._stats['admitted'] += 1
+                waits = self._wait_ms.setdefault(priority, deque(maxlen=1000))
+                waits.append((time.monotonic() - start) * 1000)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+    
+    def settle(self, reserved_tokens, used_tokens):
+        """Correct the token bucket once a request's actual usage is known"""
+        if self.token_bucket is None or not reserved_tokens:
+            return
+        with self._cond:
+            self.token_bucket.give_back(min(reserved_tokens, self.token_bucket.capacity) - used_tokens)
+            self._cond.notify_all()
+    
+    def throttle(self, retry_after=None):
+        """Back off after the API rejected a request for rate or load reasons"""
+        pause = retry_after if retry_after is not None else self.default_pause
+        with self._cond:
+            self._stats['throttled'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._set_rate_factor(max(self.min_rate_factor, self._rate_factor * 0.5))
+            for bucket in self._buckets():
+                bucket.drain()
+            self._cond.notify_all()
+    
+    def record_success(self):
+        """Let the refill rate recover after throttling"""
+        if self._rate_factor >= 1.0:
+            return
+        with self._cond:
+            self._set_rate_factor(min(1.0, self._rate_factor + self.recovery_step))
+            self._cond.notify_all()
+    
+    def _set_rate_factor(self, factor):
+        """Scale every bucket's refill rate; call with the lock held"""
+        now = time.monotonic()
+        for bucket in self._buckets():
+            bucket._refill(now)  # Bank what was earned at the old rate first
+            bucket.rate_factor = factor
+        self._rate_factor = factor
+    
+    def get_stats(self):
+        """Return admission counters, queue depth and wait times per priority"""
+        with self._cond:
+            stats = dict(self._stats)
+            waiting = [ticket[0] for ticket in self._waiting]
+            wait_ms = {priority: sorted(waits) for priority, waits in self._wait_ms.items()}
+            stats['rate_factor'] = round(self._rate_factor, 2)
+            stats['paused_for_s'] = round(max(0.0, self._paused_until - time.monotonic()), 1)
+            stats['requests_per_minute'] = self.request_bucket.per_minute if self.request_bucket else None
+            stats['tokens_per_minute'] = self.token_bucket.per_minute if self.token_bucket else None
+            stats['requests_available'] = round(self.request_bucket.tokens, 1) if self.request_bucket else None
+            stats['tokens_available'] = round(self.token_bucket.tokens) if self.token_bucket else None
+        
+        stats['queued'] = len(waiting)
+        priorities = {}
+        for priority in sorted(set(waiting) | set(wait_ms)):
+            waits = wait_ms.get(priority, [])
+            priorities[PRIORITY_NAMES.get(priority, str(priority))] = {
+                'queued': waiting.count(priority),
+                'wait_ms_p50': round(waits[len(waits) // 2], 1) if waits else 0,
+                'wait_ms_p99': round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 1) if waits else 0
+            }
+        stats['priorities'] = priorities
+        return stats
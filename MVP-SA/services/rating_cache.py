@@ -0,0 +1,190 @@
+import copy
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+from services.cache import make_cache_key
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def normalize_answer(answer):
+    """Lowercase an answer and reduce it to its word tokens"""
+    return _TOKEN_PATTERN.findall((answer or "").lower())
+
+def answer_shingles(tokens, size=3):
+    """Word n-grams of a token list; short answers fall back to their tokens"""
+    if len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+class RatingCache:
+    """Cache of AI ratings keyed on a question plus a normalized answer
+    
+    Exact matches hit on the normalized text. Near-duplicates are found
+    with MinHash signatures over word shingles, bucketed per question by
+    locality-sensitive hashing, and accepted when the Jaccard similarity
+    of the shingle sets reaches similarity_threshold. Entries are evicted
+    least recently used beyond max_entries and expire after ttl_seconds.
+    """
+    
+    def __init__(self, max_entries=2000, similarity_threshold=0.8, ttl_seconds=None,
+                 num_perm=64, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise Exception(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        
+        rng = np.random.RandomState(seed)
+        self._perm_a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._perm_b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+        
+        self._entries = OrderedDict()  # exact key -> entry, least recently used first
+        self._buckets = {}  # (question key, band, band hash) -> set of exact keys
+        self._lock = threading.Lock()
+        self._similarities = []
+        self._stats = {
+            'exact_hits': 0,
+            'near_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'candidates_checked': 0
+        }
+    
+    def _question_key(self, question):
+        """Text that identifies a question, whether given as a dict or a string"""
+        text = question.get('question', '') if isinstance(question, dict) else str(question)
+        return make_cache_key(" ".join(text.lower().split()))
+    
+    def _signature(self, shingles):
+        """MinHash signature of a shingle set, computed for all permutations at once"""
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # 32-bit hashes times 31-bit coefficients stay below 2**63, so nothing wraps
+        permuted = (np.outer(hashes, self._perm_a) + self._perm_b) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=0)
+    
+    def _band_keys(self, question_key, signature):
+        """LSH bucket keys of a signature, scoped to its question"""
+        rows = self.num_perm // self.bands
+        return [(question_key, band, signature[band * rows:(band + 1) * rows].tobytes())
+                for band in range(self.bands)]
+    
+    def get(self, question, answer):
+        """Return (ai_rating, match) where match is 'exact' or 'near', or (None, None) on a miss"""
+        question_key = self._question_key(question)
+        tokens = normalize_answer(answer)
+        key = make_cache_key(question_key, " ".join(tokens))
+        now = time.time()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+                return copy.deepcopy(entry['rating']), 'exact'
+        
+        shingles = answer_shingles(tokens, self.shingle_size)
+        if not shingles:
+            with self._lock:
+                self._stats['misses'] += 1
+            return None, None
+        band_keys = self._band_keys(question_key, self._signature(shingles))
+        
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                candidates.update(self._buckets.get(band_key, ()))
+            
+            best_key, best_similarity = None, 0.0
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                if self._is_expired(entry, now):
+                    continue
+                self._stats['candidates_checked'] += 1
+                other = entry['shingles']
+                similarity = len(shingles & other) / len(shingles | other)
+                if similarity > best_similarity:
+                    best_key, best_similarity = candidate, similarity
+            
+            if best_key is None or best_similarity < self.similarity_threshold:
+                self._stats['misses'] += 1
+                return None, None
+            
+            self._entries.move_to_end(best_key)
+            self._stats['near_hits'] += 1
+            self._similarities.append(best_similarity)
+            if len(self._similarities) > 1000:
+                del self._similarities[:500]
+            return copy.deepcopy(self._entries[best_key]['rating']), 'near'
+    
+    def set(self, question, answer, ai_rating):
+        """Store the AI rating for an answer and index it for near-duplicate lookups"""
+        question_key = self._question_key(question)
+        tokens = normalize_answer(answer)
+        if not tokens:
+            return
+        key = make_cache_key(question_key, " ".join(tokens))
+        shingles = answer_shingles(tokens, self.shingle_size)
+        band_keys = self._band_keys(question_key, self._signature(shingles))
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'rating': copy.deepcopy(ai_rating),
+                'shingles': shingles,
+                'band_keys': band_keys,
+                'stored_at': time.time()
+            }
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            self._stats['writes'] += 1
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+    
+    def _remove(self, key):
+        """Drop an entry and unlink it from its LSH buckets; call with the lock held"""
+        entry = self._entries.pop(key)
+        for band_key in entry['band_keys']:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+    
+    def _is_expired(self, entry, now):
+        """Check an entry's age against the TTL"""
+        return self.ttl_seconds is not None and now - entry['stored_at'] > self.ttl_seconds
+    
+    def get_stats(self):
+        """Return hit/miss statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['buckets'] = len(self._buckets)
+            similarities = list(self._similarities)
+        
+        hits = stats['exact_hits'] + stats['near_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = round(hits / lookups, 3) if lookups else 0
+        stats['near_similarity_avg'] = round(sum(similarities) / len(similarities), 3) if similarities else 0
+        stats['max_entries'] = self.max_entries
+        stats['similarity_threshold'] = self.similarity_threshold
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
@@ -0,0 +1,145 @@
+import copy
+import numpy as np
+
+# Weights _combine_ratings applies on top of the AI's overall score
+DEFAULT_COMBINER_CONFIG = {
+    # [max word count, adjustment] in ascending order; longer answers get word_count_over_adjustment
+    'word_count_adjustments': [[19, -1.0], [49, -0.5], [200, 0.0], [300, -0.2]],
+    'word_count_over_adjustment': -0.5,
+    'readability_range': [30, 70],
+    'readability_bonus': 0.2,
+    'confidence_center': 0.5,
+    'confidence_weight': 0.5,
+    'score_range': [1, 10]
+}
+
+# Strengths every AnswerRater._get_fallback_rating carries; identifies fallback ratings stored untagged
+FALLBACK_STRENGTHS = ["Answer provided", "Appropriate length"]
+
+def rating_source(rating):
+    """Where a stored rating's score came from: 'local', 'fallback' or 'ai'
+    
+    Only 'ai' ratings were produced by the combiner; the others keep
+    their stored score when re-scored.
+    """
+    source = rating.get('rating_source')
+    if source:
+        return source
+    if rating.get('strengths') == FALLBACK_STRENGTHS:
+        return 'fallback'
+    return 'ai'
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _check_setting(key, value):
+    """Raise if a combiner setting does not have the shape of its default"""
+    if key == 'word_count_adjustments':
+        if not isinstance(value, list) or not all(
+                isinstance(pair, list) and len(pair) == 2 and all(_is_number(v) for v in pair) for pair in value):
+            raise Exception(f"Combiner setting {key} must be a list of [max words, adjustment] pairs")
+        limits = [pair[0] for pair in value]
+        if limits != sorted(limits):
+            raise Exception(f"Combiner setting {key} must be in ascending order of max words")
+    elif key in ('readability_range', 'score_range'):
+        if not isinstance(value, list) or len(value) != 2 or not all(_is_number(v) for v in value) \
+                or value[0] > value[1]:
+            raise Exception(f"Combiner setting {key} must be a [low, high] pair of numbers")
+    elif not _is_number(value):
+        raise Exception(f"Combiner setting {key} must be a number")
+
+def make_combiner_config(overrides=None):
+    """Defaults with the given keys replaced; unknown keys and malformed values are rejected"""
+    if overrides is not None and not isinstance(overrides, dict):
+        raise Exception("Combiner settings must be a JSON object")
+    config = copy.deepcopy(DEFAULT_COMBINER_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key not in config:
+            raise Exception(f"Unknown combiner setting: {key}")
+        _check_setting(key, value)
+        config[key] = value
+    return config
+
+def combine_score(config, base_score, word_count, readability, confidence_score):
+    """Final score and adjustments for one answer"""
+    word_count_adjustment = config['word_count_over_adjustment']
+    for max_words, adjustment in config['word_count_adjustments']:
+        if word_count <= max_words:
+            word_count_adjustment = adjustment
+            break
+    
+    # Readability is None when it could not be measured
+    low, high = config['readability_range']
+    readability_adjustment = config['readability_bonus'] \
+        if readability is not None and low <= readability <= high else 0.0
+    
+    confidence_adjustment = (confidence_score - config['confidence_center']) * config['confidence_weight']
+    
+    final_score = base_score + word_count_adjustment + readability_adjustment + confidence_adjustment
+    final_score = max(config['score_range'][0], min(config['score_range'][1], final_score))
+    return final_score, word_count_adjustment, readability_adjustment, confidence_adjustment
+
+def ratings_to_columns(ratings):
+    """Gather the combiner inputs of stored ratings into numpy columns
+    
+    Ratings that were not produced by the combiner (local pre-scores,
+    fallback ratings, or ones missing metrics) are masked out with
+    combinable=False.
+    """
+    count = len(ratings)
+    base = np.zeros(count)
+    word_count = np.zeros(count)
+    readability = np.zeros(count)
+    confidence = np.zeros(count)
+    final = np.zeros(count)
+    combinable = np.zeros(count, dtype=np.bool_)
+    
+    for i, rating in enumerate(ratings):
+        if not rating or 'final_score' not in rating:
+            continue
+        final[i] = rating['final_score']
+        linguistic = rating.get('linguistic_metrics') or {}
+        sentiment = rating.get('sentiment_metrics') or {}
+        if rating_source(rating) != 'ai' or 'overall_score' not in rating or \
+                'word_count' not in linguistic or 'readability_score' not in linguistic or \
+                'confidence_score' not in sentiment:
+            continue
+        base[i] = rating['overall_score']
+        word_count[i] = linguistic['word_count']
+        readability[i] = np.nan if linguistic['readability_score'] is None else linguistic['readability_score']
+        confidence[i] = sentiment['confidence_score']
+        combinable[i] = True
+    
+    return {
+        'base_score': base,
+        'word_count': word_count,
+        'readability': readability,
+        'confidence_score': confidence,
+        'final_score': final,
+        'combinable': combinable
+    }
+
+def combine_columns(config, columns):
+    """Vectorized combine_score over columns from ratings_to_columns
+    
+    Returns new final scores (unchanged where not combinable) and the
+    three adjustment columns. The arithmetic matches combine_score
+    operation for operation, so results are bit-identical before rounding.
+    """
+    limits = np.array([max_words for max_words, _ in config['word_count_adjustments']], dtype=np.float64)
+    adjustments = np.array([adjustment for _, adjustment in config['word_count_adjustments']] +
+                           [config['word_count_over_adjustment']], dtype=np.float64)
+    word_count_adjustment = adjustments[np.searchsorted(limits, columns['word_count'], side='left')]
+    
+    # NaN (readability not measured) compares false, so gets no bonus
+    low, high = config['readability_range']
+    readability = columns['readability']
+    readability_adjustment = np.where((readability >= low) & (readability <= high),
+                                      float(config['readability_bonus']), 0.0)
+    
+    confidence_adjustment = (columns['confidence_score'] - config['confidence_center']) * config['confidence_weight']
+    
+    final = columns['base_score'] + word_count_adjustment + readability_adjustment + confidence_adjustment
+    final = np.clip(final, config['score_range'][0], config['score_range'][1])
+    final = np.where(columns['combinable'], final, columns['final_score'])
+    return final, word_count_adjustment, readability_adjustment, confidence_adjustment
@@ -0,0 +1,353 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class InMemorySessionStore:
+    """Process-local session store, optionally persisted through a SessionWriter
+    
+    Reads return the stored dict itself, so in-place edits are visible at
+    once; assigning a session back queues its changes with the writer.
+    
+    Residency is bounded: sessions idle for longer than idle_ttl are
+    expired, and the least recently used ones are evicted beyond
+    max_sessions or, when size_fn is given, max_bytes. A session that is
+    not resident is transparently rehydrated through loader on access.
+    on_evict(session_id, reason) is called outside the lock with reason
+    'idle' or 'capacity' so callers can release per-session resources.
+    """
+    
+    backend = 'memory'
+    
+    def __init__(self, writer=None, loader=None, max_sessions=None, max_bytes=None, size_fn=None,
+                 idle_ttl=None, sweep_interval=30.0, on_evict=None):
+        self.writer = writer
+        self.loader = loader
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()  # session_id -> {'session', 'last_access', 'size'}, oldest access first
+        self._bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._lock = threading.RLock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'rehydrations': 0,
+            'capacity_evictions': 0,
+            'idle_expirations': 0
+        }
+    
+    def __getitem__(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+    
+    def __setitem__(self, session_id, session):
+        with self._lock:
+            evicted = self._put(session_id, session)
+        self._release(evicted)
+    
+    def __delitem__(self, session_id):
+        with self._lock:
+            self._remove(session_id)
+    
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+    
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._sessions))
+    
+    def get(self, session_id, default=None):
+        """Return a session, rehydrating it from disk if it is not resident"""
+        session, evicted = self._get(session_id)
+        self._release(evicted)
+        return default if session is None else session
+    
+    def _get(self, session_id):
+        """Look up or rehydrate a session; returns it with the entries evicted meanwhile"""
+        evicted = self._sweep_if_due()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._touch(session_id, entry)
+                self._stats['hits'] += 1
+                session = entry['session']
+        
+        if entry is None:
+            # Disk reads happen outside the lock so other sessions stay available
+            session = self.loader(session_id) if self.loader is not None else None
+            with self._lock:
+                self._stats['misses'] += 1
+                entry = self._sessions.get(session_id)
+                if entry is not None:
+                    # Another thread rehydrated or stored it meanwhile
+                    session = entry['session']
+                elif session is not None:
+                    self._stats['rehydrations'] += 1
+                    self._store(session_id, session)
+                    evicted += self._evict_over_capacity()
+        
+        return session, evicted
+    
+    def update(self, session_id, mutate):
+        """Apply mutate(session) and store the result atomically; returns the session"""
+        evicted = []
+        try:
+            with self._lock:
+                session, evicted = self._get(session_id)
+                if session is None:
+                    raise KeyError(session_id)
+                mutate(session)
+                evicted += self._put(session_id, session)
+                return session
+        finally:
+            # Evicted sessions are released once the store-wide lock is dropped
+            self._release(evicted)
+    
+    def session_ids(self, status=None):
+        """Ids of resident sessions, optionally only those with the given status"""
+        with self._lock:
+            return [session_id for session_id, entry in self._sessions.items()
+                    if status is None or entry['session'].get('status') == status]
+    
+    def _put(self, session_id, session):
+        """Save and store a session; call with the lock held and release what it returns after"""
+        if self.writer is not None:
+            self.writer.save(session)
+        self._store(session_id, session)
+        return self._evict_over_capacity()
+    
+    def _store(self, session_id, session):
+        """Insert or refresh a resident entry; call with the lock held"""
+        size = self.size_fn(session) if self.size_fn else 0
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self._bytes -= entry['size']
+        self._sessions[session_id] = {'session': session, 'last_access': time.monotonic(), 'size': size}
+        self._sessions.move_to_end(session_id)
+        self._bytes += size
+    
+    def _touch(self, session_id, entry):
+        """Mark a resident entry as just used; call with the lock held"""
+        entry['last_access'] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+    
+    def _remove(self, session_id):
+        """Drop a resident entry and release its size; call with the lock held"""
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry['size']
+    
+    def _evict_over_capacity(self):
+        """Evict least recently used sessions beyond the limits; call with the lock held"""
+        evicted = []
+        while len(self._sessions) > 1 and (
+                (self.max_sessions is not None and len(self._sessions) > self.max_sessions) or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            session_id = next(iter(self._sessions))
+            self._remove(session_id)
+            self._stats['capacity_evictions'] += 1
+            evicted.append((session_id, 'capacity'))
+        return evicted
+    
+    def _sweep_if_due(self):
+        """Expire idle sessions at most once per sweep_interval"""
+        now = time.monotonic()
+        if self.idle_ttl is None or now < self._next_sweep:
+            return []
+        evicted = []
+        with self._lock:
+            self._next_sweep = now + self.sweep_interval
+            # Entries are in access order, so the idle ones are all at the front
+            for session_id, entry in list(self._sessions.items()):
+                if now - entry['last_access'] <= self.idle_ttl:
+                    break
+                self._remove(session_id)
+                self._stats['idle_expirations'] += 1
+                evicted.append((session_id, 'idle'))
+        return evicted
+    
+    def _release(self, evicted):
+        """Write out evicted sessions and notify on_evict, outside the lock"""
+        for session_id, reason in evicted:
+            if self.writer is not None:
+                self.writer.forget(session_id)
+            if self.on_evict is not None:
+                try:
+                    self.on_evict(session_id, reason)
+                except Exception as e:
+                    print(f"Error releasing session {session_id}: {str(e)}")
+    
+    def get_stats(self):
+        """Return the backend, residency and session counts by status"""
+        evicted = self._sweep_if_due()
+        self._release(evicted)
+        with self._lock:
+            statuses = [entry['session'].get('status') for entry in self._sessions.values()]
+            stats = dict(self._stats)
+            stats['resident_bytes'] = self._bytes
+        by_status = {}
+        for status in statuses:
+            by_status[status] = by_status.get(status, 0) + 1
+        stats.update({
+            'backend': self.backend,
+            'sessions': len(statuses),
+            'resident_sessions': len(statuses),
+            'by_status': by_status,
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'idle_ttl': self.idle_ttl
+        })
+        return stats
+
+class SQLiteSessionStore:
+    """Session store in an embedded SQLite database shared by every worker process
+    
+    The database runs in WAL mode so readers never block the writer.
+    status and created_at are kept in indexed columns next to the JSON
+    document. Reads return a fresh copy of the session, so changes must
+    be assigned back, or made through update() when several processes may
+    touch the same session.
+    """
+    
+    backend = 'sqlite'
+    
+    def __init__(self, db_path, busy_timeout_ms=5000):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {'reads': 0, 'writes': 0, 'write_ms_total': 0.0}
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                status TEXT,
+                created_at TEXT,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (created_at);
+        """)
+    
+    def _connection(self):
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            # WAL with synchronous=NORMAL only fsyncs on checkpoints, yet stays crash-consistent
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+    
+    def _read(self, conn, session_id):
+        """Fetch and decode one session, or None"""
+        row = conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        with self._stats_lock:
+            self._stats['reads'] += 1
+        return json.loads(row[0]) if row else None
+    
+    def _write(self, conn, session_id, session):
+        """Upsert one session row"""
+        start = time.perf_counter()
+        conn.execute(
+            """INSERT INTO sessions (session_id, status, created_at, updated_at, data)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(session_id) DO UPDATE SET
+                   status = excluded.status,
+                   updated_at = excluded.updated_at,
+                   data = excluded.data""",
+            (session_id, session.get('status'), session.get('created_at'), time.time(),
+             json.dumps(session, default=str))
+        )
+        with self._stats_lock:
+            self._stats['writes'] += 1
+            self._stats['write_ms_total'] += (time.perf_counter() - start) * 1000
+    
+    def __getitem__(self, session_id):
+        session = self._read(self._connection(), session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+    
+    def __setitem__(self, session_id, session):
+        self._write(self._connection(), session_id, session)
+    
+    def __delitem__(self, session_id):
+        cursor = self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(session_id)
+    
+    def __contains__(self, session_id):
+        row = self._connection().execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None
+    
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    
+    def __iter__(self):
+        return iter(self.session_ids())
+    
+    def get(self, session_id, default=None):
+        session = self._read(self._connection(), session_id)
+        return default if session is None else session
+    
+    def update(self, session_id, mutate):
+        """Read, mutate(session) and write back in one transaction that locks out other processes"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            session = self._read(conn, session_id)
+            if session is None:
+                raise KeyError(session_id)
+            mutate(session)
+            self._write(conn, session_id, session)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return session
+    
+    def session_ids(self, status=None):
+        """Ids of stored sessions, oldest first, optionally only those with the given status"""
+        conn = self._connection()
+        if status is None:
+            rows = conn.execute("SELECT session_id FROM sessions ORDER BY created_at")
+        else:
+            rows = conn.execute("SELECT session_id FROM sessions WHERE status = ? ORDER BY created_at", (status,))
+        return [row[0] for row in rows]
+    
+    def get_stats(self):
+        """Return the backend, session counts by status and write latency"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM sessions GROUP BY status").fetchall()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['write_ms_avg'] = round(stats['write_ms_total'] / stats['writes'], 2) if stats['writes'] else 0
+        stats['write_ms_total'] = round(stats['write_ms_total'], 1)
+        stats.update({
+            'backend': self.backend,
+            'db_path': self.db_path,
+            'sessions': sum(count for _, count in rows),
+            'by_status': {status: count for status, count in rows}
+        })
+        return stats
@@ -0,0 +1,235 @@
+import copy
+import json
+import threading
+import time
+from collections import deque, OrderedDict
+
+_MISSING = object()
+
+class SessionWriter:
+    """Write-behind session persistence that journals only what changed
+    
+    save() diffs a session's top-level fields against what was last queued
+    and serializes only the changes: new answers are appended, other
+    changed fields are replaced. Nested objects are compared one level
+    deep, so deeper edits must replace the nested value. A background
+    worker coalesces queued changes per session and hands them to the
+    DataManager journal, writing a full snapshot on a session's first
+    flush and every compact_after journal records.
+    """
+    
+    def __init__(self, data_manager, flush_interval=0.5, compact_after=50, name="session writer"):
+        self.data_manager = data_manager
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.name = name
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()  # Keeps journal records in sequence order
+        self._tracked = {}
+        self._pending = OrderedDict()
+        self._flush_ms = deque(maxlen=1000)
+        self._stats = {
+            'saves': 0,
+            'unchanged_saves': 0,
+            'coalesced_updates': 0,
+            'journal_appends': 0,
+            'snapshots': 0,
+            'bytes_written': 0,
+            'failures': 0
+        }
+        
+        self._worker = threading.Thread(target=self._worker_loop, name="session-writer")
+        self._worker.daemon = True
+        self._worker.start()
+    
+    def save(self, session):
+        """Queue whatever changed in a session since the last save; never touches disk"""
+        session_id = session['session_id']
+        with self._lock:
+            self._stats['saves'] += 1
+            tracked = self._tracked.get(session_id)
+            if tracked is None:
+                tracked = self._tracked[session_id] = {
+                    'refs': {}, 'fields': {}, 'answers': [], 'seq': 0,
+                    'journal_records': 0, 'snapshotted': False
+                }
+            
+            changed, new_answers, removed = self._diff(tracked['refs'], session)
+            if not changed and not new_answers and not removed:
+                self._stats['unchanged_saves'] += 1
+                return
+            
+            pending = self._pending.get(session_id)
+            if pending is None:
+                pending = self._pending[session_id] = {'set': {}, 'unset': set(), 'answers': [], 'since': time.monotonic()}
+            else:
+                self._stats['coalesced_updates'] += 1
+            
+            for key, value in changed.items():
+                tracked['refs'][key] = copy.copy(value)
+                pending['unset'].discard(key)
+                if key == 'answers':
+                    # Replaced wholesale rather than appended to
+                    tracked['answers'] = [json.dumps(answer, default=str) for answer in value]
+                    pending['answers'] = []
+                    pending['set'][key] = "[" + ",".join(tracked['answers']) + "]"
+                else:
+                    tracked['fields'][key] = pending['set'][key] = json.dumps(value, default=str)
+            
+            if new_answers:
+                tracked['refs']['answers'] = list(session['answers'])
+                answer_json = [json.dumps(answer, default=str) for answer in new_answers]
+                tracked['answers'].extend(answer_json)
+                if 'answers' in pending['set']:
+                    pending['set']['answers'] = "[" + ",".join(tracked['answers']) + "]"
+                else:
+                    pending['answers'].extend(answer_json)
+            
+            for key in removed:
+                del tracked['refs'][key]
+                tracked['fields'].pop(key, None)
+                pending['set'].pop(key, None)
+                pending['unset'].add(key)
+            
+            self._wakeup.notify()
+    
+    def _diff(self, refs, session):
+        """Return (changed fields, appended answers, removed keys) relative to refs"""
+        changed = {}
+        new_answers = []
+        for key, value in session.items():
+            old = refs.get(key, _MISSING)
+            if key == 'answers' and isinstance(value, list) and isinstance(old, list) and \
+                    len(value) >= len(old) and all(a is b for a, b in zip(old, value)):
+                new_answers = value[len(old):]
+            elif old is _MISSING or (value is not old and value != old):
+                changed[key] = value
+        removed = [key for key in refs if key not in session]
+        return changed, new_answers, removed
+    
+    def flush(self, session_id=None):
+        """Write queued changes now, for one session or all of them"""
+        with self._io_lock:
+            with self._lock:
+                if session_id is None:
+                    session_ids = list(self._pending)
+                else:
+                    session_ids = [session_id] if session_id in self._pending else []
+                writes = [self._prepare_write(sid, self._pending.pop(sid)) for sid in session_ids]
+            
+            for sid, kind, payload in writes:
+                self._write(sid, kind, payload)
+    
+    def _prepare_write(self, session_id, pending):
+        """Turn a coalesced change set into a journal record or a full snapshot; call with the lock held"""
+        tracked = self._tracked[session_id]
+        tracked['seq'] += 1
+        seq = tracked['seq']
+        
+        if not tracked['snapshotted'] or tracked['journal_records'] >= self.compact_after:
+            tracked['snapshotted'] = True
+            tracked['journal_records'] = 0
+            parts = [f"{json.dumps(key)}:{value}" for key, value in tracked['fields'].items()]
+            parts.append('"answers":[' + ",".join(tracked['answers']) + "]")
+            parts.append(f'"_journal_seq":{seq}')
+            return session_id, 'snapshot', ("{" + ",".join(parts) + "}").encode('utf-8')
+        
+        tracked['journal_records'] += 1
+        sets = ",".join(f"{json.dumps(key)}:{value}" for key, value in pending['set'].items())
+        record = (f'{{"seq":{seq},"set":{{{sets}}},"unset":{json.dumps(sorted(pending["unset"]))},'
+                  f'"answers":[{",".join(pending["answers"])}]}}\n')
+        return session_id, 'journal', record.encode('utf-8')
+    
+    def _write(self, session_id, kind, payload):
+        """Hand one prepared write to the DataManager and record its latency"""
+        start = time.perf_counter()
+        try:
+            if kind == 'snapshot':
+                self.data_manager.write_session_snapshot(session_id, payload)
+            else:
+                self.data_manager.append_session_journal(session_id, payload)
+        except Exception as e:
+            print(f"Error in {self.name} for session {session_id}: {str(e)}")
+            with self._lock:
+                self._stats['failures'] += 1
+                # The in-memory state is complete, so a snapshot on the next flush repairs the loss
+                self._tracked[session_id]['snapshotted'] = False
+                self._pending.setdefault(session_id, {'set': {}, 'unset': set(), 'answers': [], 'since': time.monotonic()})
+            return
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._flush_ms.append(elapsed_ms)
+            self._stats['snapshots' if kind == 'snapshot' else 'journal_appends'] += 1
+            self._stats['bytes_written'] += len(payload)
+    
+    def serialized_size(self, session_id):
+        """Bytes of JSON last serialized for a session, or 0 if it is not tracked"""
+        with self._lock:
+            tracked = self._tracked.get(session_id)
+            if tracked is None:
+                return 0
+            return sum(len(value) for value in tracked['fields'].values()) + \
+                sum(len(answer) for answer in tracked['answers'])
+    
+    def load(self, session_id):
+        """Load a session from disk after writing out anything still queued for it
+        
+        The loaded state becomes the baseline later saves are diffed
+        against. Its next flush writes a full snapshot, since the sequence
+        numbers already in the on-disk journal are not known here.
+        """
+        if not self.data_manager.is_valid_session_id(session_id):
+            return None
+        self.flush(session_id)
+        session = self.data_manager.load_session(session_id)
+        if session is not None:
+            with self._lock:
+                if session_id not in self._pending:
+                    self._tracked[session_id] = {
+                        'refs': {key: copy.copy(value) for key, value in session.items()},
+                        'fields': {key: json.dumps(value, default=str)
+                                   for key, value in session.items() if key != 'answers'},
+                        'answers': [json.dumps(answer, default=str) for answer in session.get('answers', [])],
+                        'seq': 0, 'journal_records': 0, 'snapshotted': False
+                    }
+        return session
+    
+    def forget(self, session_id):
+        """Flush a session and stop tracking its state"""
+        self.flush(session_id)
+        with self._lock:
+            # A save that raced in after the flush still needs its baseline
+            if session_id not in self._pending:
+                self._tracked.pop(session_id, None)
+    
+    def _worker_loop(self):
+        """Wait for queued changes, give rapid updates time to coalesce, then flush"""
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    self._wakeup.wait()
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error in {self.name}: {str(e)}")
+    
+    def get_stats(self):
+        """Return write counts and flush latency"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            flush_ms = sorted(self._flush_ms)
+            stats['pending_sessions'] = len(self._pending)
+            stats['oldest_pending_ms'] = round(max(
+                ((now - pending['since']) * 1000 for pending in self._pending.values()), default=0), 1)
+            stats['tracked_sessions'] = len(self._tracked)
+        
+        stats['flush_ms_avg'] = round(sum(flush_ms) / len(flush_ms), 2) if flush_ms else 0
+        stats['flush_ms_p50'] = round(flush_ms[len(flush_ms) // 2], 2) if flush_ms else 0
+        stats['flush_ms_p99'] = round(flush_ms[min(len(flush_ms) - 1, int(len(flush_ms) * 0.99))], 2) if flush_ms else 0
+        stats['flush_ms_max'] = round(flush_ms[-1], 2) if flush_ms else 0
+        stats['flush_interval'] = self.flush_interval
+        return stats
@@ -0,0 +1,151 @@
+import numpy as np
+
+# Column name -> dtype for one tracking sample
+TRACKING_COLUMNS = {
+    'timestamp': np.float64,
+    'eye_contact': np.float32,
+    'face_visibility': np.float32,
+    'yaw': np.float32,
+    'pitch': np.float32,
+    'blink': np.bool_
+}
+
+# Binary ingestion frame: one packed little-endian record per sample (25 bytes)
+TRACKING_FRAME_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('eye_contact', '<f4'),
+    ('face_visibility', '<f4'),
+    ('yaw', '<f4'),
+    ('pitch', '<f4'),
+    ('blink', 'u1')
+])
+
+def decode_frame(payload):
+    """Decode a binary tracking frame into columns without per-sample Python work"""
+    if len(payload) % TRACKING_FRAME_DTYPE.itemsize:
+        raise ValueError(f"Tracking frame size must be a multiple of {TRACKING_FRAME_DTYPE.itemsize} bytes")
+    records = np.frombuffer(payload, dtype=TRACKING_FRAME_DTYPE)
+    return {name: records[name].astype(dtype) for name, dtype in TRACKING_COLUMNS.items()}
+
+def columns_from_rows(rows):
+    """Convert compact [timestamp, eye_contact, face_visibility, yaw, pitch, blink] rows to columns"""
+    array = np.asarray(rows, dtype=np.float64).reshape(-1, len(TRACKING_COLUMNS))
+    return {name: array[:, i].astype(dtype) for i, (name, dtype) in enumerate(TRACKING_COLUMNS.items())}
+
+class TrackingRingBuffer:
+    """Fixed-capacity columnar ring buffer of tracking samples
+    
+    Every sample is written twice, at i and i + capacity, so any run of
+    up to capacity consecutive samples is one contiguous slice. tail()
+    and window() can then return numpy views without copying. A view
+    stays valid until later appends wrap around onto its slots.
+    """
+    
+    COLUMN_NAMES = tuple(TRACKING_COLUMNS)
+    
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._columns = {name: np.zeros(capacity * 2, dtype=dtype) for name, dtype in TRACKING_COLUMNS.items()}
+        self._next = 0  # Slot for the next append, in [0, capacity)
+        self._size = 0
+    
+    def __len__(self):
+        return self._size
+    
+    @property
+    def nbytes(self):
+        """Memory held by the column arrays"""
+        return sum(column.nbytes for column in self._columns.values())
+    
+    def append(self, timestamp, eye_contact, face_visibility, yaw, pitch, blink):
+        """Add one sample in O(1), overwriting the oldest when full"""
+        values = (timestamp, eye_contact, face_visibility, yaw, pitch, blink)
+        for column, value in zip(self._columns.values(), values):
+            column[self._next] = value
+            column[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+    
+    def extend(self, columns):
+        """Add a batch of samples given as columns, keeping only the newest capacity of them"""
+        count = len(columns['timestamp'])
+        if count > self.capacity:
+            columns = {name: values[-self.capacity:] for name, values in columns.items()}
+            count = self.capacity
+        if count == 0:
+            return
+        
+        # Fill up to the end of the ring, then wrap to the start
+        first = min(count, self.capacity - self._next)
+        for name, column in self._columns.items():
+            values = columns[name]
+            for base in (0, self.capacity):
+                column[base + self._next:base + self._next + first] = values[:first]
+                column[base:base + count - first] = values[first:]
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+    
+    @property
+    def last_timestamp(self):
+        """Timestamp of the newest sample, or None when empty"""
+        if self._size == 0:
+            return None
+        return float(self._columns['timestamp'][(self._next - 1) % self.capacity])
+    
+    def append_sample(self, sample):
+        """Add one sample given in the nested dict format used by the API"""
+        head_pose = sample.get('head_pose') or {}
+        self.append(
+            sample.get('timestamp', 0),
+            sample.get('eye_contact_score', 0),
+            sample.get('face_visibility', 0),
+            head_pose.get('yaw', 0),
+            head_pose.get('pitch', 0),
+            sample.get('blink_detected', False)
+        )
+    
+    def _view(self, start, stop):
+        """Zero-copy views over logical positions [start, stop), 0 being the oldest sample"""
+        offset = (self._next - self._size) % self.capacity
+        return {name: column[offset + start:offset + stop] for name, column in self._columns.items()}
+    
+    def columns(self):
+        """Views over every buffered sample, oldest first"""
+        return self._view(0, self._size)
+    
+    def tail(self, n):
+        """Views over the newest n samples"""
+        n = min(n, self._size)
+        return self._view(self._size - n, self._size)
+    
+    def window(self, start_time, end_time=None):
+        """Views over samples with start_time <= timestamp <= end_time, found by binary search"""
+        timestamps = self._view(0, self._size)['timestamp']
+        start = int(np.searchsorted(timestamps, start_time, side='left'))
+        stop = self._size if end_time is None else int(np.searchsorted(timestamps, end_time, side='right'))
+        return self._view(start, max(start, stop))
+    
+    @staticmethod
+    def to_records(columns):
+        """Materialize column views as the nested sample dicts returned by the API"""
+        records = []
+        for timestamp, eye_contact, face_visibility, yaw, pitch, blink in zip(
+                columns['timestamp'].tolist(), columns['eye_contact'].tolist(),
+                columns['face_visibility'].tolist(), columns['yaw'].tolist(),
+                columns['pitch'].tolist(), columns['blink'].tolist()):
+            records.append({
+                'eye_contact_score': round(eye_contact, 1),
+                'face_visibility': round(face_visibility, 1),
+                'head_pose': {
+                    'yaw': round(yaw, 1),
+                    'pitch': round(pitch, 1),
+                    'roll': 0.0
+                },
+                'blink_detected': blink,
+                'gaze_direction': {
+                    'x': yaw / 30.0,  # Normalize to -1 to 1 range
+                    'y': pitch / 30.0
+                },
+                'timestamp': timestamp
+            })
+        return records
@@ -0,0 +1,87 @@
+import numpy as np
+
+MOMENT_KEYS = ('count', 'duration_seconds', 'eye_contact_sum', 'face_visibility_sum', 'blinks', 'head_pose_count',
+               'yaw_sum', 'yaw_sq_sum', 'pitch_sum', 'pitch_sq_sum')
+
+def columns_from_records(records):
+    """Convert nested tracking sample dicts to numpy columns"""
+    head_poses = [sample.get('head_pose') or {} for sample in records]
+    return {
+        'timestamp': np.array([sample.get('timestamp', np.nan) for sample in records], dtype=np.float64),
+        'eye_contact': np.array([sample.get('eye_contact_score', 0) for sample in records], dtype=np.float64),
+        'face_visibility': np.array([sample.get('face_visibility', 0) for sample in records], dtype=np.float64),
+        'blink': np.array([bool(sample.get('blink_detected', False)) for sample in records], dtype=np.bool_),
+        'yaw': np.array([pose.get('yaw', 0) for pose in head_poses], dtype=np.float64),
+        'pitch': np.array([pose.get('pitch', 0) for pose in head_poses], dtype=np.float64),
+        'has_head_pose': np.array([bool(pose) for pose in head_poses], dtype=np.bool_)
+    }
+
+def compute_moments(columns):
+    """Reduce tracking columns to mergeable sums in one vectorized pass
+    
+    columns is either the output of columns_from_records or a set of
+    TrackingRingBuffer views, which carry no has_head_pose mask because
+    every buffered sample has a head pose.
+    """
+    mask = columns.get('has_head_pose')
+    yaw = columns['yaw'].astype(np.float64, copy=False)
+    pitch = columns['pitch'].astype(np.float64, copy=False)
+    if mask is not None and not mask.all():
+        yaw = yaw[mask]
+        pitch = pitch[mask]
+    
+    # Time covered by the samples, from the first to the last timestamp
+    duration = 0.0
+    timestamps = columns.get('timestamp')
+    if timestamps is not None and len(timestamps) and not np.isnan(timestamps).all():
+        duration = float(np.nanmax(timestamps) - np.nanmin(timestamps))
+    
+    return {
+        'count': int(len(columns['eye_contact'])),
+        'duration_seconds': duration,
+        'eye_contact_sum': float(np.sum(columns['eye_contact'], dtype=np.float64)),
+        'face_visibility_sum': float(np.sum(columns['face_visibility'], dtype=np.float64)),
+        'blinks': int(np.count_nonzero(columns['blink'])),
+        'head_pose_count': int(len(yaw)),
+        'yaw_sum': float(yaw.sum()),
+        'yaw_sq_sum': float(np.dot(yaw, yaw)),
+        'pitch_sum': float(pitch.sum()),
+        'pitch_sq_sum': float(np.dot(pitch, pitch))
+    }
+
+def merge_moments(moments_list):
+    """Combine per-answer moments into interview-wide moments"""
+    merged = dict.fromkeys(MOMENT_KEYS, 0)
+    for moments in moments_list:
+        for key in MOMENT_KEYS:
+            merged[key] += moments.get(key, 0)
+    return merged
+
+def summarize_moments(moments):
+    """Derive means, variance and standard deviations from moments"""
+    count = moments['count']
+    pose_count = moments['head_pose_count']
+    if pose_count:
+        yaw_mean = moments['yaw_sum'] / pose_count
+        pitch_mean = moments['pitch_sum'] / pose_count
+        # Clamp tiny negative values from floating point cancellation
+        yaw_var = max(moments['yaw_sq_sum'] / pose_count - yaw_mean * yaw_mean, 0.0)
+        pitch_var = max(moments['pitch_sq_sum'] / pose_count - pitch_mean * pitch_mean, 0.0)
+    else:
+        yaw_var = pitch_var = 0.0
+    
+    return {
+        'count': count,
+        'duration_seconds': moments.get('duration_seconds', 0.0),
+        'eye_contact_mean': moments['eye_contact_sum'] / count if count else 0.0,
+        'face_visibility_mean': moments['face_visibility_sum'] / count if count else 0.0,
+        'blinks': moments['blinks'],
+        'head_pose_count': pose_count,
+        'yaw_var': yaw_var,
+        'yaw_std': yaw_var ** 0.5,
+        'pitch_std': pitch_var ** 0.5
+    }
+
+def summarize_tracking(columns):
+    """Compute the statistics every tracking summary is built from"""
+    return summarize_moments(compute_moments(columns))
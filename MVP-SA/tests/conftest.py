@@ -0,0 +1,56 @@
+import importlib
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import pytest
+
+# Let tests import the services package the way app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app_workdir(tmp_path_factory):
+    return tmp_path_factory.mktemp('app')
+
+@pytest.fixture(scope='session')
+def app_module(app_workdir):
+    """The Flask app, imported once with its data directories in a temporary directory"""
+    previous = os.getcwd()
+    os.chdir(app_workdir)  # DataManager and the caches use paths relative to the working directory
+    os.environ.update({'NLP_WARMUP': 'off', 'QUESTION_CACHE_DISK': 'false', 'TEXT_CACHE_DISK': 'false',
+                       'SESSION_STORE': 'memory', 'ASYNC_SCORING': 'false', 'DEFERRED_SCORING': 'false'})
+    try:
+        module = importlib.import_module('app')
+    finally:
+        os.chdir(previous)
+    # Background writers flush whatever the working directory is at the time
+    module.data_manager.base_dir = str(app_workdir / 'interview_data')
+    module.data_manager.exports_dir = str(app_workdir / 'exports')
+    module.batch_rescorer.sessions_dir = str(app_workdir / 'interview_data' / 'sessions')
+    module.batch_rescorer.checkpoint_dir = str(app_workdir / 'interview_data' / 'rescore')
+    return module
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def make_session(app_module):
+    """Store a session in the app's session store and return its id"""
+    def make(**fields):
+        session_id = str(uuid.uuid4())
+        session = {
+            'session_id': session_id,
+            'resume_text': 'Python developer',
+            'jd_text': 'Backend engineer',
+            'created_at': datetime.now().isoformat(),
+            'questions': [],
+            'answers': [],
+            'tracking_data': [],
+            'status': 'files_uploaded'
+        }
+        session.update(fields)
+        app_module.active_sessions[session_id] = session
+        return session_id
+    return make
@@ -0,0 +1,71 @@
+import pytest
+
+from services.answer_rater import AnswerRater
+
+QUESTION = {'question': 'How do you debug a memory leak?', 'type': 'technical'}
+
+class StubLLMClient:
+    """Stands in for LLMClient; the tests stub out the methods that would call it"""
+    api_base_url = 'http://localhost/v1/messages'
+
+def answer(n):
+    return f"I would take heap snapshots {n} times under load, diff them and trace the growing allocations back to their owners."
+
+@pytest.fixture
+def rater():
+    return AnswerRater(llm_client=StubLLMClient(), rerate_timeout=5)
+
+@pytest.mark.parametrize('text, reason', [
+    ('', 'empty'),
+    ("I don't know the answer", 'non_answer'),
+    ('Use a profiler', 'too_short'),
+    (' '.join(['leak'] * 12), 'repetitive'),
+    ('42 17 99 3.5 +++ 8', 'no_words')
+])
+def test_degenerate_answers_are_rated_locally(rater, text, reason):
+    def no_api(question, answer):
+        raise AssertionError('the API should not be called')
+    rater._get_ai_rating = no_api
+    
+    rating = rater.rate_answer(QUESTION, text)
+    
+    assert rating['rating_source'] == 'local'
+    assert rating['local_reason'] == reason
+    assert rating['final_score'] <= 2
+    assert rater._stats['reasons'] == {reason: 1}
+
+def test_substantive_answers_are_rated_through_the_api(rater):
+    rater._get_ai_rating = lambda question, text: {'overall_score': 8}
+    
+    rating = rater.rate_answer(QUESTION, answer(1))
+    
+    assert rating['overall_score'] == 8
+    assert 'adjustments' in rating
+    assert rater._stats['short_circuited'] == 0
+
+def test_failed_api_calls_get_the_fallback_rating(rater):
+    def unavailable(question, text):
+        raise Exception('API request failed with status 529')
+    rater._get_ai_rating = unavailable
+    
+    assert rater.rate_answer(QUESTION, answer(1))['rating_source'] == 'fallback'
+
+def test_batched_ratings_keep_order_and_fill_gaps(rater):
+    batches = []
+    def request_ai_ratings(batch):
+        texts = [text for _, text in batch]
+        batches.append(texts)
+        if answer(3) in texts:
+            return None  # The call failed after its retries
+        return [{'overall_score': 7}, None]  # The response left the second answer out
+    rater._request_ai_ratings = request_ai_ratings
+    rater._get_ai_rating = lambda question, text: {'overall_score': 5}
+    
+    items = [(QUESTION, answer(1)), (QUESTION, 'Pass'), (QUESTION, answer(2)), (QUESTION, answer(3))]
+    ratings = rater.rate_answers(items, batch_size=2)
+    
+    assert sorted(batches) == [[answer(1), answer(2)], [answer(3)]]
+    assert ratings[0]['overall_score'] == 7
+    assert ratings[1]['rating_source'] == 'local'
+    assert ratings[2]['overall_score'] == 5  # Re-rated on its own
+    assert ratings[3]['rating_source'] == 'fallback'
@@ -0,0 +1,163 @@
+import json
+import threading
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from services.answer_rater import AnswerRater
+from services.batch_rescorer import BatchRescorer
+from services.data_manager import DataManager
+
+class StubLLMClient:
+    """Stands in for LLMClient; rescoring without rerate_ai never calls the API"""
+    api_base_url = 'http://localhost/v1/messages'
+
+@pytest.fixture
+def data_manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DataManager writes under relative directories
+    return DataManager()
+
+@pytest.fixture
+def rescorer(data_manager):
+    return BatchRescorer(data_manager, AnswerRater(llm_client=StubLLMClient()), workers=1, max_in_flight=2)
+
+def store_session(data_manager, answers):
+    session_id = str(uuid.uuid4())
+    data_manager.save_session({
+        'session_id': session_id,
+        'status': 'interview_completed',
+        'questions': [{'question': 'Describe a project'}],
+        'answers': answers
+    })
+    return session_id
+
+def ai_answer(score=7):
+    text = "I designed and built the billing service, migrating it from cron jobs to a queue."
+    return {'question_index': 0, 'answer': text,
+            'rating': {'overall_score': score, 'final_score': score, 'feedback': 'Good'}}
+
+def run_with_timeout(target, timeout=60):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=target()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "rescore run did not finish"
+    return result['value']
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+def test_failed_submission_releases_its_slot(rescorer, data_manager):
+    session_ids = [store_session(data_manager, [ai_answer()]) for _ in range(3)]
+    rescorer._runs['run'] = {'sessions_failed': 0, 'sessions_skipped': 0}
+    in_flight = threading.BoundedSemaphore(rescorer.max_in_flight)
+    
+    rescorer._submit_sessions('run', set(), session_ids, None, None, BrokenPool(), None, None, in_flight)
+    
+    assert rescorer._runs['run']['sessions_failed'] == 3
+    for _ in range(rescorer.max_in_flight):
+        assert in_flight.acquire(timeout=1)
+
+def test_run_finishes_when_a_session_cannot_be_submitted(rescorer, data_manager, monkeypatch):
+    good = store_session(data_manager, [ai_answer()])
+    bad = store_session(data_manager, [ai_answer()])
+    question_for = rescorer._question_for
+    
+    def failing_question_for(session, answer):
+        if session['session_id'] == bad:
+            raise KeyError('questions')
+        return question_for(session, answer)
+    
+    monkeypatch.setattr(rescorer, '_question_for', failing_question_for)
+    result = run_with_timeout(lambda: rescorer.run('partial', session_ids=[good, bad]))
+    
+    assert result['state'] == 'finished'
+    assert result['sessions_rescored'] == 1
+    assert result['sessions_failed'] == 1
+    assert rescorer._load_checkpoint('partial') == {good}
+
+def test_sessions_without_answers_are_skipped(rescorer, data_manager):
+    empty = store_session(data_manager, [])
+    result = run_with_timeout(lambda: rescorer.run('empty', session_ids=[empty, str(uuid.uuid4())]))
+    assert result['sessions_skipped'] == 2
+    assert result['sessions_failed'] == 0
+
+def test_ai_per_minute_uses_the_shared_limiter(data_manager):
+    rescorer = BatchRescorer(data_manager, AnswerRater(llm_client=StubLLMClient()), ai_per_minute=30)
+    assert rescorer.rate_limiter.request_bucket.per_minute == 30
+    unlimited = BatchRescorer(data_manager, AnswerRater(llm_client=StubLLMClient()), ai_per_minute=None)
+    unlimited.rate_limiter.acquire(timeout=0)
+
+def test_fallback_ratings_keep_their_stored_score(rescorer, data_manager):
+    fallback = rescorer.answer_rater._get_fallback_rating({'question': 'Describe a project'}, ai_answer()['answer'])
+    assert fallback['rating_source'] == 'fallback'
+    legacy = {key: value for key, value in fallback.items() if key != 'rating_source'}
+    answers = [dict(ai_answer(), rating=fallback), dict(ai_answer(), rating=legacy), ai_answer()]
+    session_id = store_session(data_manager, answers)
+    
+    result = run_with_timeout(lambda: rescorer.run('fallback', session_ids=[session_id]))
+    
+    assert result['answers_rescored'] == 1
+    assert result['answers_unchanged'] == 2
+    with open(rescorer._rescored_path(session_id)) as f:
+        rescored = json.load(f)['answers']
+    assert rescored[0]['rating'] == fallback
+    assert rescored[1]['rating'] == legacy
+    assert 'adjustments' in rescored[2]['rating']
+
+def test_failed_ai_rerating_leaves_the_session_for_a_resume(rescorer, data_manager, monkeypatch):
+    session_id = store_session(data_manager, [ai_answer()])
+    
+    def unavailable(items):
+        raise Exception("API request failed with status 529")
+    monkeypatch.setattr(rescorer.answer_rater, '_get_ai_ratings', unavailable)
+    result = run_with_timeout(lambda: rescorer.run('outage', rerate_ai=True, session_ids=[session_id]))
+    
+    assert result['state'] == 'finished'
+    assert result['sessions_failed'] == 1
+    assert rescorer._load_checkpoint('outage') == set()
+    
+    monkeypatch.setattr(rescorer.answer_rater, '_get_ai_ratings', lambda items: [None] * len(items))
+    result = run_with_timeout(lambda: rescorer.run('outage', rerate_ai=True, session_ids=[session_id]))
+    
+    assert result['resumed_from'] == 0
+    assert result['sessions_rescored'] == 1
+    assert rescorer._load_checkpoint('outage') == {session_id}
+
+def test_resumed_run_skips_finished_sessions(rescorer, data_manager):
+    first = store_session(data_manager, [ai_answer()])
+    run_with_timeout(lambda: rescorer.run('resume', session_ids=[first]))
+    second = store_session(data_manager, [ai_answer()])
+    
+    result = run_with_timeout(lambda: rescorer.run('resume', session_ids=[first, second]))
+    
+    assert result['resumed_from'] == 1
+    assert result['sessions_skipped'] == 1
+    assert result['sessions_rescored'] == 1
+    assert rescorer._load_checkpoint('resume') == {first, second}
+
+def test_unreadable_sessions_are_skipped(rescorer, data_manager, monkeypatch):
+    session_id = store_session(data_manager, [ai_answer()])
+    
+    def unreadable(session_id):
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+    monkeypatch.setattr(data_manager, 'load_session', unreadable)
+    result = run_with_timeout(lambda: rescorer.run('unreadable', session_ids=[session_id]))
+    
+    assert result['state'] == 'finished'
+    assert result['sessions_skipped'] == 1
+    assert result['sessions_failed'] == 0
+
+def test_run_is_marked_failed_when_sessions_cannot_be_listed(rescorer, monkeypatch):
+    def missing_directory(status=None):
+        raise FileNotFoundError(rescorer.sessions_dir)
+        yield
+    monkeypatch.setattr(rescorer, 'iter_session_ids', missing_directory)
+    
+    result = run_with_timeout(lambda: rescorer.run('unlisted'))
+    
+    assert result['state'] == 'failed'
+    assert rescorer.get_progress('unlisted')['state'] == 'failed'
+    assert rescorer.get_progress('never-started') is None
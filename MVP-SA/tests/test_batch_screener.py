@@ -0,0 +1,40 @@
+import io
+
+from services.batch_screener import BatchScreener
+from services.llm_client import PRIORITY_BATCH, current_priority
+
+class StubFileProcessor:
+    def extract_text(self, file, max_chars=None):
+        text = file.read().decode('utf-8')
+        if not text:
+            raise Exception('Failed to extract text: empty upload')
+        return text[:max_chars]
+
+class StubQuestionGenerator:
+    RESUME_CHAR_LIMIT = 20
+    
+    def __init__(self):
+        self.priorities = []
+    
+    def generate_questions(self, resume_text, jd_text, num_questions=10):
+        self.priorities.append(current_priority())
+        if 'fail' in resume_text:
+            raise Exception('Failed to generate questions: overloaded')
+        return [{'question': f"{resume_text} vs {jd_text}"}] * num_questions
+
+def test_every_resume_gets_a_result_or_an_error():
+    generator = StubQuestionGenerator()
+    screener = BatchScreener(StubFileProcessor(), generator, extract_workers=2, generate_workers=2)
+    resumes = [('a.txt', io.BytesIO(b'Alice, Python' + b' padding' * 10)), ('b.txt', io.BytesIO(b'')),
+               ('c.txt', io.BytesIO(b'Carol will fail'))]
+    
+    results = {result['index']: result for result in screener.screen('Backend', resumes, num_questions=2)}
+    
+    assert sorted(results) == [0, 1, 2]
+    assert results[0]['error'] is None
+    assert results[0]['resume_text'] == 'Alice, Python paddin'  # Extraction stops at the prompt budget
+    assert results[0]['questions'] == [{'question': 'Alice, Python paddin vs Backend'}] * 2
+    assert 'empty upload' in results[1]['error']
+    assert 'overloaded' in results[2]['error']
+    assert results[2]['filename'] == 'c.txt'
+    assert generator.priorities == [PRIORITY_BATCH, PRIORITY_BATCH]
@@ -0,0 +1,69 @@
+import io
+import os
+import time
+
+from services.cache import LRUCache, make_cache_key, make_file_digest
+
+def test_cache_keys_separate_their_parts():
+    assert make_cache_key('ab', 'c') != make_cache_key('a', 'bc')
+    assert make_cache_key('a', 1) == make_cache_key('a', '1')
+
+def test_file_digest_leaves_the_file_at_the_start():
+    file = io.BytesIO(b'resume')
+    file.read(3)
+    digest = make_file_digest(file, chunk_size=2)
+    assert file.tell() == 0
+    assert digest == make_file_digest(io.BytesIO(b'resume'))
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.get_stats()['evictions'] == 1
+
+def test_memory_tier_is_bounded_by_size():
+    cache = LRUCache(max_entries=10, max_bytes=10, size_fn=len)
+    cache.set('a', 'x' * 6)
+    cache.set('b', 'y' * 6)
+    assert cache.get('a') is None
+    assert cache.get_stats()['memory_bytes'] == 6
+
+def test_values_are_copied_in_and_out():
+    cache = LRUCache()
+    value = {'questions': [1]}
+    cache.set('key', value)
+    value['questions'].append(2)
+    cache.get('key')['questions'].append(3)
+    assert cache.get('key') == {'questions': [1]}
+
+def test_expired_entries_are_misses():
+    cache = LRUCache(ttl_seconds=0.01)
+    cache.set('key', 'value')
+    time.sleep(0.02)
+    assert cache.get('key') is None
+    assert cache.get_stats()['expirations'] == 1
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    LRUCache(disk_dir=str(tmp_path), compress=True).set('key', {'text': 'cached'})
+    
+    cache = LRUCache(disk_dir=str(tmp_path), compress=True)
+    
+    assert cache.get('key') == {'text': 'cached'}
+    assert cache.get_stats()['disk_hits'] == 1
+
+def test_disk_tier_removes_least_recently_used_files(tmp_path):
+    cache = LRUCache(max_entries=10, disk_dir=str(tmp_path), max_disk_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+    
+    assert sorted(os.listdir(tmp_path)) == ['b.json', 'c.json']
+    assert cache.get_stats()['disk_evictions'] == 1
+    
+    # The sweep on startup applies the limit to files left by a larger cache
+    LRUCache(disk_dir=str(tmp_path), max_disk_entries=1)
+    assert os.listdir(tmp_path) == ['c.json']
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from services.data_manager import DataManager
+
+SESSION_ID = '7f1c6f4e-2b7a-4d47-9a51-3c0d8c9e5b21'
+
+@pytest.fixture
+def data_manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DataManager writes under relative directories
+    return DataManager(tracking_fsync_interval=3600)
+
+def samples(start, count):
+    return [{'timestamp': float(t), 'eye_contact_score': 80.0} for t in range(start, start + count)]
+
+def test_tracking_samples_are_appended_and_read_back_in_order(data_manager):
+    data_manager.save_tracking_data(SESSION_ID, samples(0, 3))
+    data_manager.save_tracking_data(SESSION_ID, samples(3, 2))
+    data_manager.save_tracking_data(SESSION_ID, [])
+    data_manager.close_tracking_log(SESSION_ID)
+    
+    assert data_manager.load_tracking_data(SESSION_ID) == samples(0, 5)
+
+def test_a_line_torn_by_a_crash_is_skipped(data_manager):
+    data_manager.save_tracking_data(SESSION_ID, samples(0, 2))
+    with open(data_manager._tracking_log_path(SESSION_ID), 'ab') as f:
+        f.write(b'{"timestamp": 2.0, "eye_con')
+    assert data_manager.load_tracking_data(SESSION_ID) == samples(0, 2)
+    
+    # A restarted writer terminates the torn line before appending
+    restarted = DataManager()
+    restarted.save_tracking_data(SESSION_ID, samples(3, 1))
+    assert restarted.load_tracking_data(SESSION_ID) == samples(0, 2) + samples(3, 1)
+
+def test_legacy_tracking_arrays_are_read_first(data_manager):
+    legacy_path = os.path.join(data_manager.base_dir, 'tracking_data', f"{SESSION_ID}_tracking.json")
+    with open(legacy_path, 'w') as f:
+        json.dump(samples(0, 2), f)
+    data_manager.save_tracking_data(SESSION_ID, samples(2, 1))
+    
+    assert data_manager.load_tracking_data(SESSION_ID) == samples(0, 3)
+
+def test_sessions_without_tracking_data_load_empty(data_manager):
+    assert data_manager.load_tracking_data(SESSION_ID) == []
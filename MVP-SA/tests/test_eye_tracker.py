@@ -0,0 +1,110 @@
+import numpy as np
+
+from services.eye_tracker import EyeTracker
+from services.tracking_buffer import columns_from_rows
+from services.tracking_stats import columns_from_records, compute_moments, merge_moments
+
+def make_rows(count, rate, blink_every):
+    """count samples taken rate times per second, blinking every blink_every samples"""
+    return [[i / rate, 80.0, 95.0, 0.0, 0.0, i % blink_every == 0] for i in range(count)]
+
+def test_blink_rate_uses_the_time_the_samples_span():
+    tracker = EyeTracker()
+    # Two minutes at 30 Hz with 24 blinks: 12 per minute, whatever the sample rate
+    columns = columns_from_rows(make_rows(3601, 30, 150))
+    
+    moments = compute_moments(columns)
+    summary = tracker.summary_from_moments(moments)
+    
+    assert moments['duration_seconds'] == 120.0
+    assert summary['blink_rate'] == 12.5  # 25 blinks, counting the one at t=0
+
+def test_records_and_columns_give_the_same_duration():
+    columns = columns_from_rows(make_rows(11, 2, 5))
+    records = [{'timestamp': float(t), 'eye_contact_score': 80.0} for t in columns['timestamp']]
+    
+    assert compute_moments(columns_from_records(records))['duration_seconds'] == 5.0
+    assert compute_moments(columns)['duration_seconds'] == 5.0
+
+def test_records_without_timestamps_have_no_duration():
+    moments = compute_moments(columns_from_records([{'eye_contact_score': 80.0}] * 3))
+    
+    assert moments['duration_seconds'] == 0.0
+    assert EyeTracker().summary_from_moments(moments)['blink_rate'] == 0
+
+def test_merged_moments_add_up_answer_durations():
+    first = compute_moments(columns_from_rows(make_rows(61, 1, 10)))
+    second = compute_moments(columns_from_rows(make_rows(31, 1, 10)))
+    legacy = dict(first)
+    del legacy['duration_seconds']  # Stored before durations were recorded
+    
+    assert merge_moments([first, second])['duration_seconds'] == 90.0
+    assert merge_moments([legacy, second])['duration_seconds'] == 30.0
+
+def test_tracking_samples_are_refused_unless_the_interview_is_active(app_module, client, make_session):
+    samples = {'samples': make_rows(5, 1, 2)}
+    
+    ended = make_session(status='completed')
+    response = client.post(f'/api/tracking-samples/{ended}', json=samples)
+    assert response.status_code == 409
+    assert ended not in app_module.eye_tracker.tracking_sessions
+    
+    active = make_session(status='interview_active')
+    try:
+        response = client.post(f'/api/tracking-samples/{active}', json=samples)
+        assert response.status_code == 200
+        assert response.get_json()['accepted'] == 5
+    finally:
+        app_module.eye_tracker.stop_tracking(active)
+
+def test_tracking_samples_for_unknown_sessions_are_rejected(client):
+    response = client.post('/api/tracking-samples/not-a-session', json={'samples': []})
+    assert response.status_code == 404
+
+def test_one_scheduler_thread_ticks_every_simulated_session():
+    tracker = EyeTracker(tick_interval=3600)
+    for session_id in ('a', 'b', 'c'):
+        tracker.start_tracking(session_id)
+    tracker.ingest_samples('c', columns_from_rows(make_rows(3, 1, 2)))
+    before = {session_id: len(session['data']) for session_id, session in tracker.tracking_sessions.items()}
+    
+    tracker._tick_all_sessions()
+    
+    assert tracker.get_stats()['scheduler_threads'] == 1
+    assert len(tracker.tracking_sessions['a']['data']) == before['a'] + 1
+    assert len(tracker.tracking_sessions['c']['data']) == before['c']  # Client-fed sessions are not simulated
+
+def test_client_samples_are_persisted_in_batches_and_retried():
+    persisted = []
+    failing = [True]
+    def persist(session_id, records):
+        if failing[0]:
+            raise OSError('disk full')
+        persisted.extend(records)
+    closed = []
+    tracker = EyeTracker(tick_interval=3600, persist_fn=persist, persist_batch_size=4, close_fn=closed.append)
+    
+    tracker.ingest_samples('s', columns_from_rows(make_rows(3, 1, 2)), start=True)
+    tracker.flush_pending()
+    assert tracker.get_stats()['pending_samples'] == 3  # Below the batch size
+    
+    tracker.ingest_samples('s', columns_from_rows([[10.0, 80.0, 95.0, 0.0, 0.0, 0]]))
+    tracker.flush_pending()
+    assert tracker.get_stats()['persist_failures'] == 1
+    assert tracker.get_stats()['pending_samples'] == 4
+    
+    failing[0] = False
+    tracker.stop_tracking('s')
+    assert len(persisted) == 4
+    assert closed == ['s']
+
+def test_idle_sessions_are_stopped():
+    closed = []
+    tracker = EyeTracker(tick_interval=3600, idle_timeout=0, close_fn=closed.append)
+    tracker.start_tracking('idle')
+    
+    tracker._stop_idle_sessions()
+    
+    assert closed == ['idle']
+    assert tracker.get_stats()['idle_stops'] == 1
+    assert tracker.ingest_samples('idle', columns_from_rows(make_rows(2, 1, 2))) is None
@@ -0,0 +1,122 @@
+import io
+
+import fitz
+import pytest
+from docx import Document
+
+from services.cache import LRUCache
+from services.file_processor import FileProcessor, UnsupportedFormatError
+
+@pytest.fixture(scope='module')
+def processor():
+    return FileProcessor(max_process_workers=1, max_thread_workers=1)
+
+def make_docx(paragraphs):
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def make_pdf(pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    content = document.tobytes()
+    document.close()
+    return io.BytesIO(content)
+
+PAGES = [f"Page {i} of the resume" for i in range(5)]
+
+def test_detect_format_sniffs_magic_bytes(processor):
+    assert processor.detect_format(io.BytesIO(b'%PDF-1.7\n')) == 'pdf'
+    assert processor.detect_format(make_docx(['Hello'])) == 'docx'
+    assert processor.detect_format(io.BytesIO('Résumé'.encode('utf-8'))) == 'txt'
+
+@pytest.mark.parametrize('content', [b'\x00\x01binary', b'PK\x03\x04not really a zip', b'\xff\xfe\xfa'])
+def test_detect_format_rejects_unsupported_uploads(processor, content):
+    with pytest.raises(UnsupportedFormatError):
+        processor.detect_format(io.BytesIO(content))
+
+def test_docx_budget_counts_the_paragraph_separators(processor):
+    text, complete = processor._extract_docx(make_docx(['abc', 'def', 'ghi', 'jkl']), 7)
+    
+    assert text == 'abc\ndef'
+    assert not complete
+    assert processor._extract_docx(make_docx(['abc', 'def']), None) == ('abc\ndef', True)
+
+def test_upload_of_an_unsupported_file_is_a_bad_request(app_module, client):
+    sessions_before = len(app_module.active_sessions)
+    response = client.post('/api/upload-files', data={
+        'resume': (io.BytesIO(b'\x00\x01\x02 not a document'), 'resume.bin'),
+        'job_description': (io.BytesIO(b'Backend engineer'), 'jd.txt')
+    }, content_type='multipart/form-data')
+    
+    assert response.status_code == 400
+    assert 'Unsupported file format' in response.get_json()['error']
+    assert len(app_module.active_sessions) == sessions_before
+
+def test_batch_upload_with_an_unsupported_job_description_is_a_bad_request(client):
+    response = client.post('/api/batch-generate-questions', data={
+        'resumes': [(io.BytesIO(b'Python developer'), 'resume.txt')],
+        'job_description': (io.BytesIO(b'\x00\x01\x02'), 'jd.bin')
+    }, content_type='multipart/form-data')
+    
+    assert response.status_code == 400
+    assert 'Unsupported file format' in response.get_json()['error']
+
+def test_pdf_extraction_stops_at_the_budget(processor):
+    text, complete = processor._extract_with_pymupdf(make_pdf(PAGES), 30)
+    
+    assert text.split() == ' '.join(PAGES[:2]).split()
+    assert not complete
+    full_text, complete = processor._extract_with_pymupdf(make_pdf(PAGES), None)
+    assert complete
+    assert full_text.split() == ' '.join(PAGES).split()
+
+def test_large_pdfs_are_split_across_worker_processes():
+    parallel = FileProcessor(parallel_page_threshold=3, pages_per_chunk=2, max_process_workers=1)
+    
+    text, complete = parallel._extract_with_pymupdf(make_pdf(PAGES), None)
+    
+    assert complete
+    assert text.split() == ' '.join(PAGES).split()
+
+def test_extract_text_picks_the_backend_from_the_content(processor):
+    assert processor.extract_text(make_pdf(PAGES[:1])).split() == PAGES[0].split()
+    assert processor.extract_text(make_docx(['First', 'Second'])) == 'First\nSecond'
+    assert processor.extract_text(io.BytesIO(b'  Plain text  ')) == 'Plain text'
+
+def test_txt_budget_keeps_characters_cut_at_the_read_boundary(processor):
+    # 13 bytes are read: six two-byte characters and the first byte of the seventh
+    text, complete = processor._extract_txt(io.BytesIO(('é' * 10 + 'x' * 40).encode('utf-8')), 3)
+    
+    assert text == 'é' * 6
+    assert not complete
+
+def test_lazy_text_extracts_the_full_document_once(processor, tmp_path):
+    path = tmp_path / 'resume.pdf'
+    path.write_bytes(make_pdf(PAGES).getvalue())
+    calls = []
+    load_full_text = processor.load_full_text
+    processor.load_full_text = lambda path: calls.append(path) or load_full_text(path)
+    try:
+        document = processor.extract_lazily(str(path), 30)
+        
+        assert not document.complete
+        assert len(document) == len(document.text) < len(document.full_text())
+        document.full_text()
+        assert len(calls) == 1
+    finally:
+        del processor.load_full_text
+
+def test_text_cache_serves_repeat_uploads_without_parsing():
+    cached = FileProcessor(text_cache=LRUCache(), max_process_workers=1)
+    upload = make_pdf(PAGES).getvalue()
+    
+    full_text = cached.extract_text(io.BytesIO(upload))
+    assert cached.extract_text(io.BytesIO(upload), max_chars=10) == full_text[:10]
+    assert cached.extract_text(io.BytesIO(upload)) == full_text
+    assert cached.get_stats()['backends']['pdf']['calls'] == 1
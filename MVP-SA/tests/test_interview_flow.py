@@ -0,0 +1,88 @@
+import pytest
+
+from services.job_queue import QueueFullError
+
+QUESTIONS = [
+    {'question': 'Describe a service you scaled.', 'category': 'technical'},
+    {'question': 'How do you handle disagreements?', 'category': 'behavioral'}
+]
+
+@pytest.fixture
+def interview(app_module, client, make_session):
+    """A session whose interview has been started; tracking is stopped afterwards"""
+    session_id = make_session(status='questions_generated', questions=list(QUESTIONS))
+    response = client.post('/api/start-interview', json={'session_id': session_id})
+    assert response.status_code == 200
+    yield session_id
+    app_module.eye_tracker.stop_tracking(session_id)
+
+def submit(client, session_id, question_index, answer_text, **options):
+    return client.post('/api/submit-answer', json=dict(
+        session_id=session_id, question_index=question_index, answer_text=answer_text, **options))
+
+def test_interview_moves_from_active_to_completed(app_module, client, interview):
+    session = app_module.active_sessions[interview]
+    assert session['status'] == 'interview_active'
+    assert interview in app_module.eye_tracker.tracking_sessions
+    
+    # Answers this short are rated locally, without an API call
+    response = submit(client, interview, 0, "I don't know")
+    assert response.status_code == 200
+    assert response.get_json()['rating']['rating_source'] == 'local'
+    
+    response = client.post('/api/end-interview', json={'session_id': interview})
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'interview_completed'
+    
+    session = app_module.active_sessions[interview]
+    assert session['status'] == 'interview_completed'
+    assert len(session['answers']) == 1
+    assert 'final_results' in session
+    assert interview not in app_module.eye_tracker.tracking_sessions
+    
+    # Late tracking batches neither revive tracking nor reopen the interview
+    response = client.post(f'/api/tracking-samples/{interview}', json={'samples': [[0, 80, 90, 0, 0, 0]]})
+    assert response.status_code == 409
+    assert interview not in app_module.eye_tracker.tracking_sessions
+
+def test_asynchronous_ratings_land_before_the_interview_is_scored(app_module, client, interview):
+    response = submit(client, interview, 0, 'No idea', **{'async': True})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    
+    response = client.post('/api/end-interview', json={'session_id': interview})
+    assert response.status_code == 200
+    assert len(app_module.active_sessions[interview]['answers']) == 1
+    
+    result = client.get(f'/api/rating-result/{job_id}').get_json()
+    assert result['status'] == 'success'
+    assert result['rating']['local_reason'] == 'non_answer'
+
+def test_full_rating_queue_is_reported_as_unavailable(app_module, client, interview, monkeypatch):
+    def reject(*args, **kwargs):
+        raise QueueFullError('ratings queue is full (0 pending jobs)')
+    monkeypatch.setattr(app_module.rating_queue, 'submit', reject)
+    
+    response = submit(client, interview, 0, 'No idea', **{'async': True})
+    
+    assert response.status_code == 503
+    assert app_module.active_sessions[interview]['answers'] == []
+
+def test_deferred_answers_are_rated_when_the_interview_ends(app_module, client, interview):
+    for index, answer in enumerate(['Not sure', 'Pass']):
+        response = submit(client, interview, index, answer, deferred=True)
+        assert response.get_json()['status'] == 'deferred'
+    assert [answer['rating'] for answer in app_module.active_sessions[interview]['answers']] == [None, None]
+    
+    response = client.post('/api/end-interview', json={'session_id': interview})
+    assert response.status_code == 200
+    
+    answers = app_module.active_sessions[interview]['answers']
+    assert [answer['rating_status'] for answer in answers] == ['rated', 'rated']
+    assert all(answer['rating']['rating_source'] == 'local' for answer in answers)
+
+def test_unknown_job_ids_are_not_found(client):
+    assert client.get('/api/rating-result/missing').status_code == 404
+
+def test_answers_to_questions_out_of_range_are_rejected(client, interview):
+    assert submit(client, interview, len(QUESTIONS), 'An answer').status_code == 400
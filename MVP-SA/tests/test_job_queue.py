@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from services.job_queue import JobQueue, QueueFullError
+
+def test_jobs_complete_with_their_result():
+    jobs = JobQueue(num_workers=2, name='test')
+    job_id = jobs.submit(lambda a, b=0: a + b, 2, b=3)
+    
+    job = jobs.wait_for_job(job_id, timeout=5)
+    
+    assert job['status'] == 'completed'
+    assert job['result'] == 5
+    assert job['error'] is None
+    assert jobs.get_stats()['completed'] == 1
+
+def test_failing_jobs_record_their_error():
+    jobs = JobQueue(num_workers=1, name='test')
+    
+    def fail():
+        raise ValueError('bad answer')
+    job = jobs.wait_for_job(jobs.submit(fail), timeout=5)
+    
+    assert job['status'] == 'failed'
+    assert job['error'] == 'bad answer'
+    assert jobs.get_stats()['failed'] == 1
+
+def test_full_queue_rejects_new_jobs():
+    jobs = JobQueue(num_workers=1, max_queue_size=1, name='test')
+    release = threading.Event()
+    started = threading.Event()
+    
+    def block():
+        started.set()
+        release.wait(5)
+    running = jobs.submit(block)
+    started.wait(5)
+    queued = jobs.submit(block)  # Fills the only queue slot
+    
+    with pytest.raises(QueueFullError):
+        jobs.submit(block)
+    assert jobs.get_stats()['rejected'] == 1
+    
+    release.set()
+    assert jobs.wait_for_job(running, timeout=5)['status'] == 'completed'
+    assert jobs.wait_for_job(queued, timeout=5)['status'] == 'completed'
+
+def test_wait_for_tag_waits_for_every_job_of_the_tag():
+    jobs = JobQueue(num_workers=2, name='test')
+    release = threading.Event()
+    jobs.submit(release.wait, 5, tag='session-a')
+    jobs.submit(lambda: None, tag='session-b')
+    
+    assert jobs.wait_for_tag('session-b', timeout=5)
+    assert not jobs.wait_for_tag('session-a', timeout=0.05)
+    release.set()
+    assert jobs.wait_for_tag('session-a', timeout=5)
+
+def test_unknown_jobs_are_none():
+    jobs = JobQueue(num_workers=1, name='test')
+    assert jobs.get_job('missing') is None
+    assert jobs.wait_for_job('missing', timeout=0) is None
+
+def test_only_finished_jobs_are_evicted_beyond_retention():
+    jobs = JobQueue(num_workers=1, max_retained_jobs=2, name='test')
+    finished = [jobs.submit(lambda: None) for _ in range(2)]
+    for job_id in finished:
+        jobs.wait_for_job(job_id, timeout=5)
+    
+    latest = jobs.submit(lambda: None)
+    
+    assert jobs.get_job(finished[0]) is None
+    assert jobs.get_job(latest) is not None
@@ -0,0 +1,86 @@
+import pytest
+import requests
+
+from services.llm_client import LLMClient, _retry_after
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.text = str(body)
+    
+    def json(self):
+        return self.body
+
+def ok(text='Hello'):
+    return FakeResponse(200, {'content': [{'text': text}], 'usage': {'input_tokens': 3, 'output_tokens': 2}})
+
+def fake_post(client, monkeypatch, outcomes):
+    """Answer each post with the next outcome, raising it if it is an exception"""
+    calls = []
+    def post(url, payload, headers=None):
+        calls.append(payload)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(client, 'post', post)
+    return calls
+
+@pytest.fixture
+def client():
+    return LLMClient(backoff_base=0, max_retries=2)
+
+def test_throttled_and_transient_failures_are_retried(client, monkeypatch):
+    calls = fake_post(client, monkeypatch, [FakeResponse(529), requests.ConnectionError('reset'), ok()])
+    
+    assert client.create_message('prompt', api_key='key', max_tokens=10) == 'Hello'
+    assert len(calls) == 3
+    assert client.get_stats()['retries'] == 2
+
+def test_client_errors_are_not_retried(client, monkeypatch):
+    calls = fake_post(client, monkeypatch, [FakeResponse(400, {'error': 'bad request'})])
+    
+    with pytest.raises(Exception, match='status 400'):
+        client.create_message('prompt', api_key='key', max_tokens=10)
+    assert len(calls) == 1
+
+def test_retries_give_up_after_max_retries(client, monkeypatch):
+    calls = fake_post(client, monkeypatch, [FakeResponse(503)] * 3)
+    
+    with pytest.raises(Exception, match='status 503'):
+        client.create_message('prompt', api_key='key', max_tokens=10)
+    assert len(calls) == 3
+    assert client.get_stats()['retries_exhausted'] == 1
+
+def test_connection_errors_are_raised_once_retries_run_out(client, monkeypatch):
+    fake_post(client, monkeypatch, [requests.Timeout('read timed out')] * 3)
+    with pytest.raises(requests.Timeout):
+        client.create_message('prompt', api_key='key', max_tokens=10)
+
+def test_retries_stop_at_the_wait_budget(monkeypatch):
+    client = LLMClient(max_retries=5, max_wait=1.0)
+    calls = fake_post(client, monkeypatch, [FakeResponse(429, headers={'retry-after': '30'})] * 6)
+    
+    response = client._send_with_retries(lambda: client.post(client.api_base_url, {}), 10)
+    
+    assert response.status_code == 429
+    assert len(calls) == 1
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert _retry_after(FakeResponse(429, headers={'retry-after': '2.5'})) == 2.5
+    assert _retry_after(FakeResponse(429, headers={'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+    assert _retry_after(FakeResponse(429, headers={'retry-after': 'soon'})) is None
+    assert _retry_after(FakeResponse(429)) is None
+
+def test_host_slots_are_limited_and_released():
+    client = LLMClient(max_concurrent_per_host=1, acquire_timeout=0.01)
+    semaphore = client._acquire_host_slot('api.example.com')
+    
+    with pytest.raises(Exception, match='connection slot'):
+        client._acquire_host_slot('api.example.com')
+    assert client.get_stats()['concurrency_rejections'] == 1
+    
+    semaphore.release()
+    client._acquire_host_slot('api.example.com').release()
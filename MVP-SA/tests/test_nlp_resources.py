@@ -0,0 +1,63 @@
+import pytest
+
+from services import nlp_resources
+from services.answer_rater import AnswerRater
+from services.rating_combiner import DEFAULT_COMBINER_CONFIG, combine_columns, combine_score, ratings_to_columns
+
+class StubLLMClient:
+    api_base_url = 'http://localhost/v1/messages'
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(nlp_resources, '_state', {})
+    monkeypatch.setattr(nlp_resources, '_timings', {})
+
+def test_warm_up_downloads_only_missing_resources(fresh_state, monkeypatch):
+    available = {'vader_lexicon'}
+    requested = []
+    
+    def download_resources(data_dir=nlp_resources.NLTK_DATA_DIR, names=None):
+        requested.append(list(names))
+        available.update(names)
+    
+    monkeypatch.setattr(nlp_resources, 'has_resource', lambda name: name in available)
+    monkeypatch.setattr(nlp_resources, 'download_resources', download_resources)
+    monkeypatch.setattr(nlp_resources, 'get_sentiment_analyzer', lambda: None)
+    monkeypatch.setattr(nlp_resources, 'get_readability', lambda: None)
+    nlp_resources.warm_up()
+    
+    assert requested == [['cmudict']]
+
+def test_failed_download_leaves_readability_unmeasured(fresh_state, monkeypatch, capsys):
+    def download_resources(data_dir=nlp_resources.NLTK_DATA_DIR, names=None):
+        raise Exception("Failed to download NLTK resource 'cmudict'")
+    
+    monkeypatch.setattr(nlp_resources, 'has_resource', lambda name: name != 'cmudict')
+    monkeypatch.setattr(nlp_resources, 'download_resources', download_resources)
+    monkeypatch.setattr(nlp_resources, 'get_sentiment_analyzer', lambda: None)
+    nlp_resources.warm_up()
+    
+    assert nlp_resources.get_readability() is None
+    assert "Readability metrics are unavailable" in capsys.readouterr().out
+    
+    no_download = []
+    monkeypatch.setattr(nlp_resources, 'download_resources', lambda **kwargs: no_download.append(kwargs))
+    nlp_resources.warm_up(download=False)
+    assert no_download == []
+
+def test_unmeasured_readability_gets_no_bonus(monkeypatch):
+    monkeypatch.setattr(nlp_resources, 'get_readability', lambda: None)
+    rater = AnswerRater(llm_client=StubLLMClient())
+    answer = " ".join(["word"] * 120) + "."
+    linguistic, sentiment = rater._calculate_metrics(answer)
+    assert linguistic['readability_score'] is None
+    assert linguistic['grade_level'] is None
+    
+    rating = rater._combine_ratings({'overall_score': 7}, linguistic, sentiment)
+    assert rating['adjustments']['readability'] == 0.0
+    
+    columns = ratings_to_columns([rating])
+    assert columns['combinable'].tolist() == [True]
+    final, _, readability_adjustment, _ = combine_columns(DEFAULT_COMBINER_CONFIG, columns)
+    assert readability_adjustment.tolist() == [0.0]
+    assert final[0] == combine_score(DEFAULT_COMBINER_CONFIG, 7, 120, None, sentiment['confidence_score'])[0]
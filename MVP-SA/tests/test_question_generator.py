@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from services.cache import LRUCache
+from services.question_generator import FALLBACK_QUESTIONS, QuestionGenerator, QuestionStreamParser
+
+QUESTIONS = [{'question': 'How would you shard a "users" table?', 'type': 'technical'},
+             {'question': 'Tell me about a {tricky} outage.', 'type': 'behavioral'}]
+
+class StubLLMClient:
+    api_base_url = 'http://localhost/v1/messages'
+    
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+    
+    def create_message(self, prompt, api_key, max_tokens, model):
+        self.calls += 1
+        return self.response
+    
+    def stream_message(self, prompt, api_key, max_tokens, model):
+        self.calls += 1
+        # Chunk boundaries fall inside strings and objects
+        for i in range(0, len(self.response), 7):
+            yield self.response[i:i + 7]
+
+@pytest.fixture
+def response():
+    return "Here are the questions:\n" + json.dumps(QUESTIONS, indent=2)
+
+def test_repeat_requests_are_served_from_the_cache(response):
+    llm_client = StubLLMClient(response)
+    generator = QuestionGenerator(llm_client=llm_client, cache=LRUCache())
+    
+    assert generator.generate_questions('resume', 'jd', 2) == QUESTIONS
+    assert generator.generate_questions('resume', 'jd', 2) == QUESTIONS
+    assert llm_client.calls == 1
+    
+    generator.generate_questions('resume', 'jd', 3)
+    assert llm_client.calls == 2
+
+def test_text_past_the_prompt_budget_does_not_change_the_key(response):
+    llm_client = StubLLMClient(response)
+    generator = QuestionGenerator(llm_client=llm_client, cache=LRUCache())
+    resume = 'r' * QuestionGenerator.RESUME_CHAR_LIMIT
+    
+    generator.generate_questions(resume + 'first tail', 'jd', 2)
+    generator.generate_questions(resume + 'second tail', 'jd', 2)
+    
+    assert llm_client.calls == 1
+
+def test_fallback_questions_are_not_cached():
+    llm_client = StubLLMClient('')
+    generator = QuestionGenerator(llm_client=llm_client, cache=LRUCache())
+    
+    assert generator.generate_questions('resume', 'jd') == FALLBACK_QUESTIONS
+    generator.generate_questions('resume', 'jd')
+    assert llm_client.calls == 2
+
+def test_streamed_questions_are_yielded_and_cached(response):
+    llm_client = StubLLMClient(response)
+    generator = QuestionGenerator(llm_client=llm_client, cache=LRUCache())
+    
+    assert list(generator.generate_questions_stream('resume', 'jd', 2)) == QUESTIONS
+    assert generator.generate_questions('resume', 'jd', 2) == QUESTIONS
+    assert llm_client.calls == 1
+
+def test_stream_parser_skips_fragments_that_are_not_questions():
+    parser = QuestionStreamParser()
+    text = 'Intro {"ignored": true} [{"question": "Why \\"Go\\"?"}, {"note": "x"}, {"question": "Next {}"}]'
+    
+    questions = [question for char in text for question in parser.feed(char)]
+    
+    assert questions == [{'question': 'Why "Go"?'}, {'question': 'Next {}'}]
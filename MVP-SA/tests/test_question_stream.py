@@ -0,0 +1,81 @@
+import json
+
+QUESTIONS = [{'question': f"Question {i}", 'type': 'technical'} for i in range(3)]
+
+def read_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        name, data = block.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+def fake_stream(calls, questions=QUESTIONS, on_question=None):
+    def generate_questions_stream(resume_text, jd_text, num_questions=10):
+        calls.append(resume_text)
+        for i, question in enumerate(questions):
+            yield question
+            if on_question:
+                on_question(i)
+    return generate_questions_stream
+
+def test_post_starts_generation_and_stream_delivers_questions(app_module, client, make_session, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.question_generator, 'generate_questions_stream', fake_stream(calls))
+    session_id = make_session(questions=[{'question': 'Old'}], status='questions_generated')
+    
+    response = client.post('/api/generate-questions', json={'session_id': session_id, 'stream': True})
+    assert response.status_code == 202
+    session = app_module.active_sessions[session_id]
+    assert session['questions'] == []
+    assert session['status'] == 'generating_questions'
+    
+    events = read_events(client.get(f"/api/generate-questions/{session_id}/stream"))
+    assert events == [('question', {'index': i, 'question': q}) for i, q in enumerate(QUESTIONS)] + \
+        [('done', {'total_questions': 3, 'status': 'success'})]
+    session = app_module.active_sessions[session_id]
+    assert session['questions'] == QUESTIONS
+    assert session['status'] == 'questions_generated'
+    assert session['questions_pending'] is False
+    assert len(calls) == 1
+
+def test_interview_started_during_the_stream_stays_active(app_module, client, make_session, monkeypatch):
+    session_id = make_session()
+    
+    def start_interview(index):
+        if index == 0:
+            assert client.post('/api/start-interview', json={'session_id': session_id}).status_code == 200
+    
+    monkeypatch.setattr(app_module.question_generator, 'generate_questions_stream',
+                        fake_stream([], on_question=start_interview))
+    client.post('/api/generate-questions', json={'session_id': session_id, 'stream': True})
+    read_events(client.get(f"/api/generate-questions/{session_id}/stream"))
+    
+    session = app_module.active_sessions[session_id]
+    assert session['status'] == 'interview_active'
+    assert session['questions'] == QUESTIONS
+    app_module.eye_tracker.stop_tracking(session_id)
+
+def test_reconnect_after_completion_replays_without_regenerating(app_module, client, make_session, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.question_generator, 'generate_questions_stream', fake_stream(calls))
+    session_id = make_session()
+    client.post('/api/generate-questions', json={'session_id': session_id, 'stream': True})
+    first = read_events(client.get(f"/api/generate-questions/{session_id}/stream"))
+    
+    again = read_events(client.get(f"/api/generate-questions/{session_id}/stream"))
+    assert again == first
+    assert len(calls) == 1
+    assert app_module.active_sessions[session_id]['questions'] == QUESTIONS
+
+def test_reconnect_mid_stream_sends_only_missing_questions(app_module, client, make_session, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module.question_generator, 'generate_questions_stream', fake_stream(calls))
+    session_id = make_session(questions=QUESTIONS[:2], questions_pending=True, status='generating_questions')
+    
+    events = read_events(client.get(f"/api/generate-questions/{session_id}/stream"))
+    assert [data['index'] for name, data in events if name == 'question'] == [0, 1, 2]
+    assert app_module.active_sessions[session_id]['questions'] == QUESTIONS
+
+def test_stream_for_unknown_sessions(client):
+    assert client.get('/api/generate-questions/../stream').status_code == 404
+    assert client.get('/api/generate-questions/00000000-0000-4000-8000-000000000000/stream').status_code == 400
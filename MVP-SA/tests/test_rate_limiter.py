@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from services.rate_limiter import PRIORITY_BATCH, PRIORITY_LIVE, PriorityRateLimiter
+
+def test_acquire_takes_the_estimate_and_settle_corrects_it():
+    limiter = PriorityRateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+    limiter.acquire(tokens=300)
+    assert limiter.request_bucket.tokens == pytest.approx(59, abs=0.01)
+    assert limiter.token_bucket.tokens == pytest.approx(700, abs=1)
+    
+    limiter.settle(300, 120)  # Used less than reserved: the difference is returned
+    assert limiter.token_bucket.tokens == pytest.approx(880, abs=1)
+    
+    limiter.acquire(tokens=200)
+    limiter.settle(200, 500)  # Used more than reserved: the overrun is taken too
+    assert limiter.token_bucket.tokens == pytest.approx(380, abs=1)
+
+def test_failed_request_settled_with_no_usage_returns_everything():
+    limiter = PriorityRateLimiter(tokens_per_minute=1000)
+    limiter.acquire(tokens=400)
+    limiter.settle(400, 0)
+    assert limiter.token_bucket.tokens == pytest.approx(1000, abs=1)
+
+def test_settle_never_overfills_the_bucket():
+    limiter = PriorityRateLimiter(tokens_per_minute=1000)
+    limiter.acquire(tokens=5000)  # Larger than the bucket: takes all of it
+    assert limiter.token_bucket.tokens == pytest.approx(0, abs=1)
+    limiter.settle(5000, 0)
+    assert limiter.token_bucket.tokens == pytest.approx(1000, abs=1)
+
+def test_settle_without_a_token_budget_is_a_no_op():
+    limiter = PriorityRateLimiter(requests_per_minute=60)
+    limiter.acquire(tokens=300)
+    before = limiter.get_stats()
+    limiter.settle(300, 100)
+    after = limiter.get_stats()
+    
+    assert after['requests_available'] == pytest.approx(before['requests_available'], abs=0.1)
+    assert after['admitted'] == before['admitted']
+    assert after['rate_factor'] == before['rate_factor']
+    # The next request is admitted at once and takes one request as usual
+    limiter.acquire(tokens=300, timeout=0)
+    assert limiter.request_bucket.tokens == pytest.approx(before['requests_available'] - 1, abs=0.1)
+
+def test_batch_requests_leave_the_reserve_for_live_traffic():
+    limiter = PriorityRateLimiter(tokens_per_minute=1000, batch_reserve=0.2)
+    limiter.acquire(priority=PRIORITY_BATCH, tokens=700)
+    
+    with pytest.raises(Exception):
+        limiter.acquire(priority=PRIORITY_BATCH, tokens=200, timeout=0.05)
+    limiter.acquire(priority=PRIORITY_LIVE, tokens=200, timeout=0.05)
+    
+    stats = limiter.get_stats()
+    assert stats['admitted'] == 2
+    assert stats['timeouts'] == 1
+    assert stats['queued'] == 0
+
+def test_live_request_goes_ahead_of_a_waiting_batch_request():
+    limiter = PriorityRateLimiter(requests_per_minute=120, batch_reserve=0.0)
+    limiter.request_bucket.drain()  # Next request refills in 0.5s
+    order = []
+    
+    def acquire(name, priority):
+        limiter.acquire(priority=priority, timeout=5)
+        order.append(name)
+    
+    batch = threading.Thread(target=acquire, args=('batch', PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.1)
+    live = threading.Thread(target=acquire, args=('live', PRIORITY_LIVE))
+    live.start()
+    batch.join()
+    live.join()
+    
+    assert order == ['live', 'batch']
+    assert limiter.get_stats()['preemptions'] == 1
+
+def test_throttle_pauses_admissions_and_halves_the_refill_rate():
+    limiter = PriorityRateLimiter(requests_per_minute=6000)
+    limiter.throttle(retry_after=0.2)
+    assert limiter.get_stats()['rate_factor'] == 0.5
+    
+    start = time.monotonic()
+    limiter.acquire(timeout=2)
+    assert time.monotonic() - start >= 0.2
+    
+    limiter.record_success()
+    assert limiter.get_stats()['rate_factor'] == 0.55
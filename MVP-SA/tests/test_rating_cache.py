@@ -0,0 +1,45 @@
+from services.rating_cache import RatingCache
+
+QUESTION = {'question': 'How would you design a rate limiter?'}
+ANSWER = ("I would use a token bucket per client, stored in Redis, refilled at a fixed rate "
+          "and checked atomically with a Lua script so concurrent requests cannot overspend it.")
+
+def test_normalized_answers_hit_exactly():
+    cache = RatingCache()
+    cache.set(QUESTION, ANSWER, {'overall_score': 8})
+    
+    rating, match = cache.get({'question': '  how would you DESIGN a rate limiter? '}, ANSWER.upper() + '!!')
+    
+    assert (rating, match) == ({'overall_score': 8}, 'exact')
+
+def test_near_duplicate_answers_hit_the_same_rating():
+    cache = RatingCache()
+    cache.set(QUESTION, ANSWER, {'overall_score': 8})
+    
+    rating, match = cache.get(QUESTION, ANSWER.replace('fixed rate', 'fixed rate basically'))
+    
+    assert (rating, match) == ({'overall_score': 8}, 'near')
+    assert cache.get_stats()['near_hits'] == 1
+
+def test_other_questions_and_unrelated_answers_miss():
+    cache = RatingCache()
+    cache.set(QUESTION, ANSWER, {'overall_score': 8})
+    
+    assert cache.get({'question': 'Describe a caching strategy'}, ANSWER) == (None, None)
+    assert cache.get(QUESTION, 'I have never built one, but I would read about sliding windows first.') == (None, None)
+
+def test_cached_ratings_are_copies():
+    cache = RatingCache()
+    cache.set(QUESTION, ANSWER, {'overall_score': 8})
+    cache.get(QUESTION, ANSWER)[0]['cache_match'] = 'exact'
+    assert cache.get(QUESTION, ANSWER)[0] == {'overall_score': 8}
+
+def test_least_recently_used_entries_are_evicted_with_their_buckets():
+    cache = RatingCache(max_entries=1)
+    cache.set(QUESTION, ANSWER, {'overall_score': 8})
+    cache.set(QUESTION, 'A fixed window counter per user in memory, reset every minute by a timer.', {'overall_score': 5})
+    
+    assert cache.get(QUESTION, ANSWER) == (None, None)
+    stats = cache.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['buckets'] == cache.bands
@@ -0,0 +1,100 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.rating_combiner import (DEFAULT_COMBINER_CONFIG, FALLBACK_STRENGTHS, combine_columns, combine_score,
+                                      make_combiner_config, ratings_to_columns)
+
+def make_rating(base_score, word_count, readability, confidence_score):
+    final_score = combine_score(DEFAULT_COMBINER_CONFIG, base_score, word_count, readability, confidence_score)[0]
+    return {
+        'overall_score': base_score,
+        'final_score': round(final_score, 1),
+        'linguistic_metrics': {'word_count': word_count, 'readability_score': readability},
+        'sentiment_metrics': {'confidence_score': confidence_score}
+    }
+
+def random_ratings(count, seed=0):
+    rng = random.Random(seed)
+    # Word counts and readability scores around every threshold, plus random ones
+    word_counts = [0, 19, 20, 49, 50, 200, 201, 300, 301, 1000]
+    readabilities = [29.9, 30, 50, 70, 70.1, -20, 120]
+    ratings = []
+    for i in range(count):
+        ratings.append(make_rating(
+            rng.choice([rng.uniform(1, 10), rng.randint(1, 10)]),
+            word_counts[i % len(word_counts)] if i % 2 else rng.randint(0, 400),
+            readabilities[i % len(readabilities)] if i % 3 else rng.uniform(-50, 120),
+            rng.random()
+        ))
+    return ratings
+
+CONFIGS = [
+    DEFAULT_COMBINER_CONFIG,
+    make_combiner_config({
+        'word_count_adjustments': [[10, -2.0], [100, 0.5]],
+        'word_count_over_adjustment': 1.0,
+        'readability_range': [40, 60],
+        'readability_bonus': 1,
+        'confidence_weight': 2,
+        'score_range': [0, 5]
+    })
+]
+
+@pytest.mark.parametrize('config', CONFIGS)
+def test_combine_columns_matches_combine_score(config):
+    ratings = random_ratings(500)
+    columns = ratings_to_columns(ratings)
+    final, word_count_adj, readability_adj, confidence_adj = combine_columns(config, columns)
+    
+    for i, rating in enumerate(ratings):
+        expected = combine_score(config, rating['overall_score'], rating['linguistic_metrics']['word_count'],
+                                 rating['linguistic_metrics']['readability_score'],
+                                 rating['sentiment_metrics']['confidence_score'])
+        # Same operations in the same order, so exact equality rather than approx
+        assert (final[i], word_count_adj[i], readability_adj[i], confidence_adj[i]) == expected
+
+def test_ratings_that_cannot_be_recombined_keep_their_final_score():
+    local = {'final_score': 1.0, 'rating_source': 'local', 'overall_score': 1,
+             'linguistic_metrics': {'word_count': 0, 'readability_score': 0},
+             'sentiment_metrics': {'confidence_score': 0}}
+    no_metrics = {'final_score': 6.5, 'overall_score': 6}
+    fallback = dict(make_rating(7, 120, 50, 0.9), final_score=7, rating_source='fallback')
+    untagged_fallback = dict(make_rating(5, 30, 50, 0.5), final_score=5, strengths=FALLBACK_STRENGTHS)
+    partial_metrics = dict(make_rating(8, 120, 50, 0.9), final_score=4.0, linguistic_metrics={'word_count': 120})
+    ratings = [local, None, no_metrics, fallback, untagged_fallback, partial_metrics, make_rating(8, 120, 50, 0.9)]
+    
+    columns = ratings_to_columns(ratings)
+    final = combine_columns(CONFIGS[1], columns)[0]
+    
+    assert columns['combinable'].tolist() == [False] * 6 + [True]
+    assert final[:6].tolist() == [1.0, 0.0, 6.5, 7.0, 5.0, 4.0]
+    assert final[6] == combine_score(CONFIGS[1], 8, 120, 50, 0.9)[0]
+
+def test_empty_ratings():
+    final = combine_columns(DEFAULT_COMBINER_CONFIG, ratings_to_columns([]))[0]
+    assert isinstance(final, np.ndarray)
+    assert len(final) == 0
+
+def test_make_combiner_config_keeps_defaults_and_copies():
+    config = make_combiner_config({'readability_bonus': 0.5})
+    assert config['readability_bonus'] == 0.5
+    assert config['score_range'] == DEFAULT_COMBINER_CONFIG['score_range']
+    config['score_range'][0] = 5
+    assert DEFAULT_COMBINER_CONFIG['score_range'][0] == 1
+
+@pytest.mark.parametrize('overrides', [
+    ['readability_bonus'],
+    {'unknown_setting': 1},
+    {'readability_bonus': '0.5'},
+    {'confidence_weight': True},
+    {'score_range': [10, 1]},
+    {'score_range': [1]},
+    {'word_count_adjustments': [[50, 0.0], [20, -1.0]]},
+    {'word_count_adjustments': [[50, 0.0, 1.0]]},
+    {'word_count_adjustments': 'short'}
+])
+def test_make_combiner_config_rejects_malformed_settings(overrides):
+    with pytest.raises(Exception):
+        make_combiner_config(overrides)
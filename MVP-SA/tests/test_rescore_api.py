@@ -0,0 +1,65 @@
+import json
+import time
+import uuid
+
+class FakeResponse:
+    status_code = 200
+    
+    def __init__(self, body):
+        self._body = body
+    
+    def json(self):
+        return self._body
+
+def archive_session(app_module):
+    session_id = str(uuid.uuid4())
+    text = "I designed and built the billing service, migrating it from cron jobs to a queue."
+    app_module.data_manager.save_session({
+        'session_id': session_id,
+        'status': 'interview_completed',
+        'questions': [{'question': 'Describe a project'}],
+        'answers': [{'question_index': 0, 'answer': text,
+                     'rating': {'overall_score': 5, 'final_score': 5}}]
+    })
+    return session_id
+
+def wait_for_run(client, run_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        progress = client.get(f"/api/rescore/{run_id}").get_json()
+        if progress.get('process') == 'exited':
+            return progress
+        time.sleep(0.1)
+    raise AssertionError(f"rescore run {run_id} did not finish")
+
+def test_rerate_runs_share_the_server_rate_limiter(app_module, client, monkeypatch):
+    requests_sent = []
+    
+    def post(url, payload, headers=None):
+        requests_sent.append(payload)
+        text = json.dumps([{'answer_number': 1, 'overall_score': 9, 'feedback': 'Clear'}])
+        return FakeResponse({'content': [{'text': text}], 'usage': {'input_tokens': 10, 'output_tokens': 10}})
+    
+    monkeypatch.setattr(app_module.llm_client, 'post', post)
+    session_id = archive_session(app_module)
+    admitted = app_module.llm_client.rate_limiter.get_stats()['admitted']
+    
+    response = client.post('/api/rescore', json={'run_id': 'rerate-shared', 'rerate_ai': True,
+                                                 'session_ids': [session_id], 'workers': 1})
+    assert response.status_code == 202
+    progress = wait_for_run(client, 'rerate-shared')
+    
+    assert progress['state'] == 'finished'
+    assert progress['ai_calls'] == 1
+    assert progress['sessions_rescored'] == 1
+    assert len(requests_sent) == 1
+    stats = app_module.llm_client.rate_limiter.get_stats()
+    assert stats['admitted'] == admitted + 1
+    assert 'batch' in stats['priorities']
+    assert 'rerate-shared' not in app_module.rescore_processes
+
+def test_rescore_rejects_bad_options(client):
+    response = client.post('/api/rescore', json={'rerate_ai': True, 'workers': 'many'})
+    assert response.status_code == 400
+    response = client.post('/api/rescore', json={'config': {'readability_bonus': 'high'}})
+    assert response.status_code == 400
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+def lock_is_free(store):
+    """Whether another thread could take the store-wide lock right now"""
+    result = []
+    def probe():
+        acquired = store._lock.acquire(timeout=1)
+        if acquired:
+            store._lock.release()
+        result.append(acquired)
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_capacity_evicts_the_least_recently_used_session():
+    evictions = []
+    store = InMemorySessionStore(max_sessions=2, on_evict=lambda session_id, reason: evictions.append((session_id, reason)))
+    store['a'] = {'status': 'active'}
+    store['b'] = {'status': 'active'}
+    store.get('a')  # b is now the least recently used
+    store['c'] = {'status': 'active'}
+    
+    assert sorted(store) == ['a', 'c']
+    assert evictions == [('b', 'capacity')]
+    assert store.get_stats()['capacity_evictions'] == 1
+
+def test_idle_sessions_expire_and_rehydrate_through_the_loader():
+    archived = {'old': {'status': 'completed'}}
+    evictions = []
+    store = InMemorySessionStore(loader=archived.get, idle_ttl=0.01, sweep_interval=0,
+                                 on_evict=lambda session_id, reason: evictions.append((session_id, reason)))
+    store['old'] = archived['old']
+    time.sleep(0.02)
+    
+    assert store.session_ids() == ['old']
+    assert store.get('missing') is None  # The lookup sweeps the idle session out
+    assert evictions == [('old', 'idle')]
+    assert store.session_ids() == []
+    
+    assert store['old'] == {'status': 'completed'}
+    assert store.get_stats()['rehydrations'] == 1
+
+def test_update_releases_evicted_sessions_after_dropping_the_lock():
+    released = []
+    
+    class Writer:
+        def save(self, session):
+            pass
+        
+        def forget(self, session_id):
+            released.append(('forget', session_id, lock_is_free(store)))
+    
+    store = InMemorySessionStore(writer=Writer(), max_sessions=1,
+                                 on_evict=lambda session_id, reason: released.append(('evict', session_id, lock_is_free(store))))
+    store['a'] = {'status': 'active'}
+    with store._lock:
+        store._store('b', {'status': 'active'})  # Over capacity until the next write
+    
+    session = store.update('b', lambda session: session.update(status='done'))
+    
+    assert session == {'status': 'done'}
+    assert released == [('forget', 'a', True), ('evict', 'a', True)]
+
+def test_update_of_a_missing_session_raises_key_error():
+    store = InMemorySessionStore()
+    with pytest.raises(KeyError):
+        store.update('missing', lambda session: None)
+
+def test_sqlite_store_round_trips_sessions_by_status(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'db' / 'sessions.db'))
+    store['b'] = {'session_id': 'b', 'status': 'interview_active', 'created_at': '2024-01-02'}
+    store['a'] = {'session_id': 'a', 'status': 'interview_active', 'created_at': '2024-01-01'}
+    store['c'] = {'session_id': 'c', 'status': 'interview_completed', 'created_at': '2024-01-03'}
+    
+    assert store['a']['status'] == 'interview_active'
+    assert store.session_ids(status='interview_active') == ['a', 'b']
+    assert list(store) == ['a', 'b', 'c']
+    assert store.get_stats()['by_status'] == {'interview_active': 2, 'interview_completed': 1}
+    
+    del store['c']
+    assert 'c' not in store and len(store) == 2
+    with pytest.raises(KeyError):
+        del store['c']
+
+def test_sqlite_reads_are_copies_until_assigned_back(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    store['a'] = {'answers': []}
+    
+    store['a']['answers'].append('lost')
+    assert store['a'] == {'answers': []}
+    
+    store.update('a', lambda session: session['answers'].append('kept'))
+    assert store['a'] == {'answers': ['kept']}
+
+def test_sqlite_update_rolls_back_a_failed_mutation(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    store['a'] = {'status': 'interview_active'}
+    
+    def fail(session):
+        session['status'] = 'interview_completed'
+        raise ValueError('scoring failed')
+    with pytest.raises(ValueError):
+        store.update('a', fail)
+    with pytest.raises(KeyError):
+        store.update('missing', lambda session: None)
+    
+    assert store['a'] == {'status': 'interview_active'}
+
+def test_sqlite_sessions_are_shared_across_threads_and_stores(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    store = SQLiteSessionStore(path)
+    store['a'] = {'count': 0}
+    
+    def increment():
+        for _ in range(20):
+            SQLiteSessionStore(path).update('a', lambda session: session.update(count=session['count'] + 1))
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert store['a'] == {'count': 80}
@@ -0,0 +1,137 @@
+import os
+import uuid
+
+import pytest
+
+from services.data_manager import DataManager
+from services.session_writer import SessionWriter
+
+@pytest.fixture
+def data_manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # DataManager writes under relative directories
+    return DataManager()
+
+def make_writer(data_manager, **kwargs):
+    # A long interval keeps the background worker out of the way; tests flush explicitly
+    return SessionWriter(data_manager, flush_interval=60, **kwargs)
+
+def make_session():
+    return {'session_id': str(uuid.uuid4()), 'status': 'interview_active', 'answers': [], 'settings': {'mode': 'live'}}
+
+def session_files(data_manager, session_id):
+    return os.path.exists(data_manager._session_path(session_id)), os.path.exists(data_manager._session_journal_path(session_id))
+
+def test_save_does_not_write_until_flush(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    writer.save(session)
+    assert session_files(data_manager, session['session_id']) == (False, False)
+    
+    writer.flush()
+    assert session_files(data_manager, session['session_id']) == (True, False)
+    assert data_manager.load_session(session['session_id']) == session
+
+def test_unchanged_save_is_skipped(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    writer.save(session)
+    writer.flush()
+    writer.save(session)
+    
+    stats = writer.get_stats()
+    assert stats['unchanged_saves'] == 1
+    assert stats['pending_sessions'] == 0
+
+def test_changes_after_first_flush_are_journaled_and_replayed(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    writer.save(session)
+    writer.flush()
+    
+    session['answers'].append({'question_index': 0, 'answer_text': 'First'})
+    session['status'] = 'completed'
+    session['extra'] = 1
+    writer.save(session)
+    del session['extra']
+    session['answers'].append({'question_index': 1, 'answer_text': 'Second'})
+    writer.save(session)
+    writer.flush()
+    
+    assert session_files(data_manager, session['session_id']) == (True, True)
+    assert writer.get_stats()['journal_appends'] == 1
+    assert writer.get_stats()['coalesced_updates'] == 1
+    assert data_manager.load_session(session['session_id']) == session
+
+def test_replaced_answers_are_written_whole(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    session['answers'].append({'question_index': 0, 'answer_text': 'First'})
+    writer.save(session)
+    writer.flush()
+    
+    session['answers'] = [{'question_index': 0, 'answer_text': 'Rescored', 'rating': {'final_score': 7}}]
+    writer.save(session)
+    session['answers'].append({'question_index': 1, 'answer_text': 'Second'})
+    writer.save(session)
+    writer.flush()
+    
+    assert data_manager.load_session(session['session_id']) == session
+
+def test_journal_is_compacted_into_a_snapshot(data_manager):
+    writer = make_writer(data_manager, compact_after=2)
+    session = make_session()
+    writer.save(session)
+    writer.flush()
+    
+    for i in range(3):
+        session['answers'].append({'question_index': i})
+        writer.save(session)
+        writer.flush()
+    
+    stats = writer.get_stats()
+    assert stats['snapshots'] == 2
+    assert stats['journal_appends'] == 2
+    assert session_files(data_manager, session['session_id']) == (True, False)
+    assert data_manager.load_session(session['session_id']) == session
+
+def test_replay_stops_at_a_torn_journal_record(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    writer.save(session)
+    writer.flush()
+    session['status'] = 'completed'
+    writer.save(session)
+    writer.flush()
+    
+    with open(data_manager._session_journal_path(session['session_id']), 'ab') as f:
+        f.write(b'{"seq":3,"set":{"status":"torn"')
+    assert data_manager.load_session(session['session_id'])['status'] == 'completed'
+
+def test_load_flushes_pending_changes_and_becomes_the_baseline(data_manager):
+    writer = make_writer(data_manager)
+    session = make_session()
+    writer.save(session)
+    session['status'] = 'completed'
+    writer.save(session)
+    
+    # A second writer, as after a restart, starts from what is on disk
+    loaded = writer.load(session['session_id'])
+    assert loaded == session
+    
+    restarted = make_writer(data_manager)
+    loaded = restarted.load(session['session_id'])
+    restarted.save(loaded)
+    assert restarted.get_stats()['unchanged_saves'] == 1
+    
+    loaded['answers'].append({'question_index': 0})
+    restarted.save(loaded)
+    restarted.flush()
+    # Journal sequence numbers on disk are unknown to the new writer, so it snapshots
+    assert restarted.get_stats()['snapshots'] == 1
+    assert data_manager.load_session(session['session_id']) == loaded
+
+def test_load_rejects_malformed_session_ids(data_manager):
+    writer = make_writer(data_manager)
+    assert writer.load('../../etc/passwd') is None
+    assert writer.load('missing') is None
+    assert writer.load(str(uuid.uuid4())) is None
@@ -0,0 +1,72 @@
+import numpy as np
+
+from services.tracking_buffer import TrackingRingBuffer, columns_from_rows
+
+def make_rows(start, count):
+    return [[float(t), t % 100, 90.0, t % 7 - 3, t % 5 - 2, t % 3 == 0] for t in range(start, start + count)]
+
+def append_rows(buffer, rows):
+    for row in rows:
+        buffer.append(*row)
+
+def assert_same_columns(actual, expected):
+    assert set(actual) == set(expected)
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name])
+
+def test_extend_matches_appending_one_at_a_time_across_the_wrap():
+    extended = TrackingRingBuffer(capacity=8)
+    appended = TrackingRingBuffer(capacity=8)
+    
+    start = 0
+    for count in (5, 6, 1, 7, 8, 3):  # Batches land on both sides of the wrap point
+        rows = make_rows(start, count)
+        extended.extend(columns_from_rows(rows))
+        append_rows(appended, rows)
+        start += count
+        
+        assert len(extended) == len(appended)
+        assert extended.last_timestamp == appended.last_timestamp == start - 1
+        assert_same_columns(extended.columns(), appended.columns())
+
+def test_extend_keeps_only_the_newest_capacity_samples():
+    buffer = TrackingRingBuffer(capacity=8)
+    buffer.extend(columns_from_rows(make_rows(0, 3)))
+    buffer.extend(columns_from_rows(make_rows(3, 20)))
+    
+    assert len(buffer) == 8
+    np.testing.assert_array_equal(buffer.columns()['timestamp'], np.arange(15, 23, dtype=np.float64))
+    assert_same_columns(buffer.columns(), columns_from_rows(make_rows(15, 8)))
+
+def test_extend_with_no_samples_changes_nothing():
+    buffer = TrackingRingBuffer(capacity=8)
+    buffer.extend(columns_from_rows(make_rows(0, 5)))
+    buffer.extend(columns_from_rows([]))
+    
+    assert len(buffer) == 5
+    assert buffer.last_timestamp == 4
+
+def test_window_across_the_wrap_is_a_contiguous_view():
+    buffer = TrackingRingBuffer(capacity=8)
+    buffer.extend(columns_from_rows(make_rows(0, 13)))  # Oldest sample now sits at slot 5
+    
+    window = buffer.window(6, 10)
+    np.testing.assert_array_equal(window['timestamp'], [6.0, 7.0, 8.0, 9.0, 10.0])
+    assert_same_columns(window, columns_from_rows(make_rows(6, 5)))
+    assert np.shares_memory(window['timestamp'], buffer._columns['timestamp'])
+
+def test_window_bounds():
+    buffer = TrackingRingBuffer(capacity=8)
+    buffer.extend(columns_from_rows(make_rows(0, 13)))
+    
+    np.testing.assert_array_equal(buffer.window(7.5)['timestamp'], np.arange(8, 13, dtype=np.float64))
+    np.testing.assert_array_equal(buffer.window(0, 6)['timestamp'], [5.0, 6.0])
+    assert len(buffer.window(20)['timestamp']) == 0
+    assert len(buffer.window(9, 8)['timestamp']) == 0
+
+def test_tail_across_the_wrap():
+    buffer = TrackingRingBuffer(capacity=8)
+    buffer.extend(columns_from_rows(make_rows(0, 11)))
+    
+    np.testing.assert_array_equal(buffer.tail(4)['timestamp'], [7.0, 8.0, 9.0, 10.0])
+    np.testing.assert_array_equal(buffer.tail(100)['timestamp'], np.arange(3, 11, dtype=np.float64))
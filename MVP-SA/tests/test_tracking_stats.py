@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from services.tracking_buffer import TrackingRingBuffer, columns_from_rows
+from services.tracking_stats import columns_from_records, compute_moments, merge_moments, summarize_moments
+
+def make_rows(start, count):
+    return [[float(t), t % 100, 90.0 - t % 10, t % 7 - 3, t % 5 - 2, t % 4 == 0] for t in range(start, start + count)]
+
+def test_merged_moments_summarize_like_one_pass_over_all_samples():
+    parts = [columns_from_rows(make_rows(start, 50)) for start in (0, 50, 100)]
+    whole = columns_from_rows(make_rows(0, 150))
+    
+    merged = summarize_moments(merge_moments([compute_moments(part) for part in parts]))
+    direct = summarize_moments(compute_moments(whole))
+    
+    for key in ('count', 'blinks', 'head_pose_count'):
+        assert merged[key] == direct[key]
+    for key in ('eye_contact_mean', 'face_visibility_mean', 'yaw_var', 'pitch_std'):
+        assert merged[key] == pytest.approx(direct[key])
+    assert direct['yaw_var'] == pytest.approx(np.var(whole['yaw'].astype(np.float64)))
+
+def test_records_and_ring_buffer_views_give_the_same_summary():
+    buffer = TrackingRingBuffer(capacity=64)
+    buffer.extend(columns_from_rows(make_rows(0, 40)))
+    view = buffer.tail(40)
+    
+    from_records = summarize_moments(compute_moments(columns_from_records(TrackingRingBuffer.to_records(view))))
+    from_view = summarize_moments(compute_moments(view))
+    
+    assert from_records['count'] == from_view['count'] == 40
+    assert from_records['blinks'] == from_view['blinks']
+    assert from_records['eye_contact_mean'] == pytest.approx(from_view['eye_contact_mean'], abs=0.05)
+
+def test_samples_without_head_pose_are_left_out_of_pose_statistics():
+    records = [{'eye_contact_score': 80, 'head_pose': {'yaw': 10, 'pitch': 0}},
+               {'eye_contact_score': 60}]
+    
+    stats = summarize_moments(compute_moments(columns_from_records(records)))
+    
+    assert stats['count'] == 2
+    assert stats['head_pose_count'] == 1
+    assert stats['yaw_var'] == 0.0
+    assert stats['eye_contact_mean'] == 70
+
+def test_empty_moments_summarize_to_zero():
+    stats = summarize_moments(merge_moments([]))
+    assert stats['count'] == 0
+    assert stats['eye_contact_mean'] == 0.0